@@ -0,0 +1,116 @@
+"""
+Minimal Redis-protocol stand-in for local multi-worker runs and tests.
+Supports just what RedisBackend uses: PING, AUTH, SELECT, SET [NX] [EX],
+GET, DEL, EXPIRE, PUBLISH, SUBSCRIBE, UNSUBSCRIBE.
+
+    python -m backend.broker --port 6379
+    LOBBY_BACKEND=redis uvicorn backend.main:app --workers 4
+"""
+import argparse
+import asyncio
+import time
+from typing import Dict, Optional, Set, Tuple
+
+from .state_backend import encode_command, read_reply
+
+class Broker:
+    def __init__(self):
+        self._keys: Dict[bytes, Tuple[bytes, Optional[float]]] = {}
+        self._channels: Dict[bytes, Set[asyncio.StreamWriter]] = {}
+
+    def _get(self, key: bytes) -> Optional[bytes]:
+        entry = self._keys.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._keys[key]
+            return None
+        return value
+
+    def _execute(self, args: list, writer: asyncio.StreamWriter, subscribed: Set[bytes]) -> bytes:
+        cmd = args[0].upper()
+        if cmd == b"PING":
+            return b"+PONG\r\n"
+        if cmd in (b"AUTH", b"SELECT"):
+            return b"+OK\r\n"
+        if cmd == b"GET":
+            value = self._get(args[1])
+            return b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value)
+        if cmd == b"SET":
+            key, value = args[1], args[2]
+            options = [a.upper() for a in args[3:]]
+            if b"NX" in options and self._get(key) is not None:
+                return b"$-1\r\n"
+            expires_at = None
+            if b"EX" in options:
+                expires_at = time.monotonic() + int(args[3 + options.index(b"EX") + 1])
+            self._keys[key] = (value, expires_at)
+            return b"+OK\r\n"
+        if cmd == b"DEL":
+            removed = sum(1 for key in args[1:] if self._keys.pop(key, None) is not None)
+            return b":%d\r\n" % removed
+        if cmd == b"EXPIRE":
+            value = self._get(args[1])
+            if value is None:
+                return b":0\r\n"
+            self._keys[args[1]] = (value, time.monotonic() + int(args[2]))
+            return b":1\r\n"
+        if cmd == b"PUBLISH":
+            receivers = self._channels.get(args[1], ())
+            push = encode_command(b"message", args[1], args[2])
+            for receiver in receivers:
+                receiver.write(push)
+            return b":%d\r\n" % len(receivers)
+        if cmd == b"SUBSCRIBE":
+            out = []
+            for channel in args[1:]:
+                self._channels.setdefault(channel, set()).add(writer)
+                subscribed.add(channel)
+                out.append(b"*3\r\n$9\r\nsubscribe\r\n$%d\r\n%s\r\n:%d\r\n" % (len(channel), channel, len(subscribed)))
+            return b"".join(out)
+        if cmd == b"UNSUBSCRIBE":
+            out = []
+            for channel in args[1:]:
+                self._unsubscribe(channel, writer)
+                subscribed.discard(channel)
+                out.append(b"*3\r\n$11\r\nunsubscribe\r\n$%d\r\n%s\r\n:%d\r\n" % (len(channel), channel, len(subscribed)))
+            return b"".join(out)
+        return b"-ERR unknown command '%s'\r\n" % cmd
+
+    def _unsubscribe(self, channel: bytes, writer: asyncio.StreamWriter):
+        receivers = self._channels.get(channel)
+        if receivers:
+            receivers.discard(writer)
+            if not receivers:
+                del self._channels[channel]
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        subscribed: Set[bytes] = set()
+        try:
+            while True:
+                args = await read_reply(reader)
+                if not isinstance(args, list) or not args:
+                    writer.write(b"-ERR protocol error\r\n")
+                    continue
+                writer.write(self._execute(args, writer, subscribed))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            for channel in subscribed:
+                self._unsubscribe(channel, writer)
+            writer.close()
+
+async def serve(host: str, port: int):
+    broker = Broker()
+    server = await asyncio.start_server(broker.handle_client, host, port)
+    async with server:
+        await server.serve_forever()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="EDU PARTY lobby state broker")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6379)
+    args = parser.parse_args()
+    asyncio.run(serve(args.host, args.port))
@@ -0,0 +1,65 @@
+"""
+Client -> server command schema.
+
+Every inbound frame is validated into one of the models below before any
+handler sees it. The union is discriminated on "command", so pydantic-core
+picks the model with a single dict lookup and validates only that model's
+fields: adding a command adds a table entry, not another branch. Unknown or
+malformed commands raise ProtocolError, which callers answer with REJECTED
+while keeping the connection open.
+"""
+from typing import Annotated, Literal, Optional, Union
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter, ValidationError
+from .protocol import ProtocolError
+
+USERNAME_MAX = 32
+INPUT_MAX = 256
+
+class _Command(BaseModel):
+    # Unknown keys are ignored (older clients send extras); numbers are
+    # accepted where text is expected (lobby codes, answers)
+    model_config = ConfigDict(extra="ignore", frozen=True, coerce_numbers_to_str=True)
+
+class Create(_Command):
+    command: Literal["CREATE"]
+    username: Optional[str] = Field(None, max_length=USERNAME_MAX)
+
+class Join(_Command):
+    command: Literal["JOIN"]
+    code: str = Field(max_length=16)
+    username: Optional[str] = Field(None, max_length=USERNAME_MAX)
+
+class Resume(_Command):
+    command: Literal["RESUME"]
+    token: str = Field(max_length=128)
+    last_seq: Optional[int] = None
+
+class Spectate(_Command):
+    command: Literal["SPECTATE"]
+    code: str = Field(max_length=16)
+
+class StartGame(_Command):
+    command: Literal["START_GAME"]
+
+class GameInput(_Command):
+    command: Literal["GAME_INPUT"]
+    input: str = Field(max_length=INPUT_MAX)
+
+class Pong(_Command):
+    command: Literal["PONG"]
+    seq: int
+
+Command = Annotated[
+    Union[Create, Join, Resume, Spectate, StartGame, GameInput, Pong],
+    Field(discriminator="command"),
+]
+_adapter = TypeAdapter(Command) # Built once at import; validation runs in pydantic-core
+
+def parse_command(message: dict) -> Command:
+    """Validate a decoded frame; raises ProtocolError with a short reason."""
+    try:
+        return _adapter.validate_python(message)
+    except ValidationError as exc:
+        error = exc.errors(include_url=False, include_input=False)[0]
+        where = ".".join(str(part) for part in error["loc"])
+        raise ProtocolError(f"{where}: {error['msg']}" if where else error["msg"]) from None
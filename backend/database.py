@@ -1,6 +1,13 @@
+from sqlalchemy import event, exc
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 import os
+import time
+from .metrics import db_query_seconds
+
+def _env_flag(name: str, default: str = "false") -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
 
 # Get DB URL from env, default to logic for dev (User must set ENV)
 # For asyncpg, the driver is postgresql+asyncpg://
@@ -10,11 +17,81 @@ if not "asyncpg" in DATABASE_URL:
     # Auto-fix to ensure async driver if user creates URL without it
     DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://")
 
+# SQL logging is off unless asked for: echo logs every statement synchronously.
+# (Setting the "sqlalchemy.engine" logger to INFO works too.)
+DB_ECHO = _env_flag("DB_ECHO")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10")) # Seconds to wait for a free connection
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800")) # Replace connections older than this
+DB_POOL_PRE_PING = _env_flag("DB_POOL_PRE_PING", "true")
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "500")) # asyncpg prepared statements
+
+class PoolMetrics:
+    """How long requests wait for a pooled connection, and how often they give up."""
+    def __init__(self):
+        self.acquired = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, wait: float):
+        self.acquired += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+
+    @property
+    def avg_wait(self) -> float:
+        return self.total_wait / self.acquired if self.acquired else 0.0
+
+pool_metrics = PoolMetrics()
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """The default async pool, timing each checkout into pool_metrics."""
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            pool_metrics.timeouts += 1
+            raise
+        pool_metrics.record(time.perf_counter() - started)
+        return connection
+
+def _engine_options(url: str) -> dict:
+    options = {"echo": DB_ECHO}
+    if ":memory:" in url or url.endswith("://"):
+        return options # In-memory SQLite is a single shared connection; no pool to size
+    options.update(
+        poolclass=TimedQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+    )
+    if "+asyncpg" in url:
+        options["connect_args"] = {"prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE}
+    return options
+
 # Create Async Engine
-engine = create_async_engine(
-    DATABASE_URL,
-    echo=True, # Log SQL for debug
-)
+engine = create_async_engine(DATABASE_URL, **_engine_options(DATABASE_URL))
+
+# Statement timing for /metrics (the SQLAlchemy cursor-execute recipe)
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _query_started(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+@event.listens_for(engine.sync_engine, "after_cursor_execute")
+def _query_finished(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    db_query_seconds.observe(elapsed, statement.lstrip().split(None, 1)[0].upper())
+
+@event.listens_for(engine.sync_engine, "handle_error")
+def _query_failed(context):
+    started = context.connection.info.get("query_started") if context.connection is not None else None
+    if started:
+        started.pop() # after_cursor_execute won't run for this statement
 
 # Async Session Factory
 AsyncSessionLocal = async_sessionmaker(
@@ -30,3 +107,21 @@ class Base(DeclarativeBase):
 async def get_db():
     async with AsyncSessionLocal() as session:
         yield session
+
+def pool_stats() -> dict:
+    """Connection pool occupancy and checkout wait times for monitoring."""
+    pool = engine.pool
+    stats = {
+        "acquired": pool_metrics.acquired,
+        "timeouts": pool_metrics.timeouts,
+        "avg_wait": pool_metrics.avg_wait,
+        "max_wait": pool_metrics.max_wait,
+    }
+    if isinstance(pool, AsyncAdaptedQueuePool):
+        stats.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=pool.overflow(),
+        )
+    return stats
@@ -1,7 +1,29 @@
 import asyncio
-from typing import List, Optional
+import time
+from typing import Dict, List, Optional, Set, Tuple
 from .lobby_system import Player, Lobby
+from .metrics import Counter, input_latency_seconds, round_seconds
 from .minigames.base import BaseGame
+from .minigames.question_bank import Deck, question_bank
+from .minigames.registry import minigame_registry
+from .protocol import EncodedMessage
+from .results_writer import MatchResult, results_writer
+from .timing import RoundClock
+
+ROUND_DURATION = 30 # Seconds before a round ends regardless of answers
+SUDDEN_DEATH_ROUND = 4
+INPUT_BATCH_WINDOW = 0.05 # Seconds of inputs collected before scoring them together
+INPUT_BATCH_CHUNK = 256 # Answers scored between event-loop yields
+BASE_POINTS = 100 # For any correct answer
+SPEED_POINTS = 100 # Extra for an instant answer, falling linearly to 0 at the deadline
+STANDINGS_TOP = 10 # Leaders included with every ANSWER_BATCH
+
+# Payload-free messages are encoded once per process and reused everywhere
+GAME_START = EncodedMessage({"type": "GAME_START"})
+ROUND_END = EncodedMessage({"type": "ROUND_END"})
+ELIMINATED = EncodedMessage({"type": "ELIMINATED"})
+
+inputs_coalesced = Counter("eduparty_inputs_coalesced_total", "GAME_INPUTs replaced by a newer one in the same batch.")
 
 class GameSession:
     """
@@ -10,30 +32,73 @@ class GameSession:
     def __init__(self, lobby: Lobby):
         self._lobby = lobby
         self._current_round = 0
+        self._rounds_done = 0 # Rounds whose elimination (or winner) has been applied
         self._max_rounds = 4
         self._active_minigame: Optional[BaseGame] = None
+        self._resumed_round: Optional[Tuple[BaseGame, Set[int]]] = None # Replayed first after a restore
+        self._deck = Deck(question_bank) # No repeated questions within this lobby
         self._is_running = False
+        self._eliminations: List[List[Player]] = [] # One group per logic check, in order
+
+        # Round completion: set when everyone alive answered, on the first
+        # correct answer in sudden death, or when the session stops.
+        self._round_over = asyncio.Event()
+        self._answered: Set[int] = set()
+
+        # Inputs waiting for the next batch flush; a player's latest input in a window wins
+        self._pending_inputs: Dict[int, Tuple[Player, str, int]] = {} # user_id -> (player, input, received ns)
+        self._flush_task: Optional[asyncio.Task] = None
+        self._batch_window_open = False
+        self._clock: Optional[RoundClock] = None
 
     @property
     def round_number(self) -> int:
         return self._current_round
 
+    @property
+    def instruction(self) -> Optional[str]:
+        return self._active_minigame.get_instructions() if self._active_minigame else None
+
+    @property
+    def is_sudden_death(self) -> bool:
+        return self._current_round >= SUDDEN_DEATH_ROUND
+
+    def stop(self):
+        """Abort the game; wakes the round wait immediately."""
+        self._is_running = False
+        self._round_over.set()
+
     async def start_game(self):
         """Main Game Loop."""
         self._is_running = True
         self._current_round = 0
+        self._rounds_done = 0
         
         # Reset scores
         for p in self._lobby.players:
             p.set_score(0)
             
-        await self._lobby.broadcast({"type": "GAME_START"})
-        
+        await self._lobby.broadcast(GAME_START)
+        await self._run_rounds()
+
+    async def resume_game(self, wait: float):
+        """Continue a restored game once its players have had `wait` seconds to reconnect."""
+        self._is_running = True
+        deadline = time.monotonic() + wait
+        while (self._is_running and time.monotonic() < deadline
+               and any(p.suspended for p in self._lobby.players)):
+            await asyncio.sleep(0.5)
+        await self._run_rounds()
+
+    async def _run_rounds(self):
         while self._current_round < self._max_rounds and self._is_running:
             self._current_round += 1
             await self._play_round()
             
-            if self._current_round < 4:
+            if not self._is_running:
+                break
+            self._rounds_done = self._current_round # Set before any await: snapshots never see half a check
+            if self._current_round < SUDDEN_DEATH_ROUND:
                 await self._logic_check_elimination()
             else:
                 await self._declare_winner()
@@ -42,48 +107,177 @@ class GameSession:
 
     async def _play_round(self):
         """Round execution logic."""
-        # 1. Select Minigame (Random placeholder for now)
-        from .minigames.math_game import MathGame
-        self._active_minigame = MathGame(difficulty=self._current_round)
+        resumed, self._resumed_round = self._resumed_round, None
+        if resumed:
+            # Interrupted by a restart: same question, and who already scored keeps it
+            self._active_minigame, self._answered = resumed
+        else:
+            # 1. Select Minigame (weighted by the registry for this difficulty)
+            game_cls = minigame_registry.pick(self._current_round)
+            self._active_minigame = game_cls(difficulty=self._current_round, deck=self._deck)
+            self._answered = set()
+        self._pending_inputs = {} # Nothing from an earlier round is scored against this question
+        self._round_over.clear()
+        self._clock = RoundClock(p.user_id for p in self._lobby.players)
         
         await self._lobby.broadcast({
             "type": "ROUND_START", 
             "round": self._current_round,
             "instruction": self._active_minigame.get_instructions()
-        })
+        }, on_sent=lambda p, clock=self._clock: clock.mark_sent(p.user_id))
+        for p in self._lobby.players:
+            p.send_ping() # Fresh RTT sample for this round's compensation
         
-        # Simulating round time for prototype (30s)
-        # Real logic: Wait for timer OR all finished
-        for i in range(30):
-            if not self._is_running: break
-            await asyncio.sleep(1)
+        # Wait for timer OR all finished
+        try:
+            await asyncio.wait_for(self._round_over.wait(), timeout=ROUND_DURATION)
+        except asyncio.TimeoutError:
+            pass
+        self._round_over.set() # Late answers are ignored from here on
+        await self._finish_pending_inputs()
+        round_seconds.observe((time.monotonic_ns() - self._clock.started_ns) / 1e9)
         
-        await self._lobby.broadcast({"type": "ROUND_END"})
+        await self._lobby.broadcast(ROUND_END)
+
+    def snapshot(self) -> Optional[dict]:
+        """Round state for the lobby snapshot log; None once the game is decided."""
+        if not self._is_running or self._rounds_done >= self._max_rounds:
+            return None
+        state = {
+            "round": self._current_round,
+            "done": self._rounds_done,
+            "eliminations": [[p.user_id for p in group] for group in self._eliminations],
+            "deck": self._deck.cursors(),
+        }
+        minigame = self._active_minigame
+        if self._current_round > self._rounds_done and minigame is not None:
+            state["minigame"] = [minigame_registry.name_of(type(minigame)), minigame.snapshot()]
+            state["answered"] = list(self._answered)
+        return state
+
+    @classmethod
+    def restore(cls, lobby: Lobby, state: dict) -> "GameSession":
+        """Rebuild a session from snapshot(); start it with resume_game()."""
+        session = cls(lobby)
+        session._current_round = session._rounds_done = state["done"]
+        session._eliminations = [
+            [p for p in map(lobby.players.get, group) if p is not None] for group in state["eliminations"]
+        ]
+        if "minigame" in state:
+            name, minigame_state = state["minigame"]
+            minigame = minigame_registry.get(name)(difficulty=state["round"], deck=session._deck)
+            minigame.restore(minigame_state)
+            session._resumed_round = (minigame, set(state["answered"]))
+        session._deck.restore_cursors(state["deck"]) # After the minigame's own draw
+        return session
+
+    def _check_round_complete(self):
+        """End the round early once every alive player has answered."""
+        if len(self._answered) >= self._lobby.players.alive_count:
+            self._round_over.set()
+
+    def player_left(self, player: Player):
+        """Called by the lobby so a leaver can't hold the round open (or close it early)."""
+        # Compared against the alive count, which no longer includes them
+        self._answered.discard(player.user_id)
+        self._pending_inputs.pop(player.user_id, None)
+        if not self._lobby.players:
+            self.stop() # Nobody left to play for
+        elif self._active_minigame and not self._round_over.is_set():
+            self._check_round_complete()
 
     async def handle_input(self, player: Player, input_data: str):
-        if not self._active_minigame:
+        if not self._active_minigame or self._round_over.is_set():
+            return
+        if not player.is_alive or player.user_id in self._answered:
             return
 
-        is_correct = self._active_minigame.process_input(player.user_id, input_data)
-        if is_correct:
-            # First to score logic? Or Accumulate?
-            # User said: "First to score" in Q2.
-            # Let's give points = Speed? Or flat 100?
-            player.add_score(100)
-            await player.websocket.send_json({"type": "gamestate", "msg": "Correct!"})
-        else:
-             await player.websocket.send_json({"type": "gamestate", "msg": "Wrong!"})
+        # Scored with everything else that arrives in this window
+        if self._pending_inputs.pop(player.user_id, None) is not None:
+            inputs_coalesced.inc() # Re-queued at the back: batch order stays arrival order
+        self._pending_inputs[player.user_id] = (player, input_data, time.monotonic_ns())
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_after_window())
+
+    async def _flush_after_window(self):
+        self._batch_window_open = True
+        try:
+            await asyncio.sleep(INPUT_BATCH_WINDOW)
+        except asyncio.CancelledError:
+            pass # Round ended: score what we have right away
+        finally:
+            self._batch_window_open = False
+        try:
+            await self._score_pending_inputs()
+        finally:
+            self._flush_task = None
+            # Inputs that arrived while a large batch yielded between chunks
+            if self._pending_inputs and not self._round_over.is_set():
+                self._flush_task = asyncio.create_task(self._flush_after_window())
+
+    async def _finish_pending_inputs(self):
+        """Score inputs that arrived before the round ended."""
+        while (task := self._flush_task) is not None:
+            if self._batch_window_open:
+                task.cancel()
+            await task
+        if self._pending_inputs:
+            await self._score_pending_inputs()
+
+    async def _score_pending_inputs(self):
+        """Validate a whole batch, then send one ANSWER_BATCH broadcast."""
+        batch, self._pending_inputs = list(self._pending_inputs.values()), {}
+        minigame = self._active_minigame
+        if not batch or not minigame:
+            return
+
+        now_ns = time.monotonic_ns()
+        for _, _, received_ns in batch:
+            input_latency_seconds.observe((now_ns - received_ns) / 1e9)
+
+        scored = []
+        decided = False # Sudden death: the first correct answer ends it
+        for start in range(0, len(batch), INPUT_BATCH_CHUNK):
+            if start:
+                await asyncio.sleep(0) # Don't starve other lobbies on a burst
+            chunk = batch[start:start + INPUT_BATCH_CHUNK]
+            verdicts = minigame.process_batch([p.user_id for p, _, _ in chunk], [data for _, data, _ in chunk])
+            for (player, _, received_ns), is_correct in zip(chunk, verdicts):
+                if decided or player.user_id in self._answered:
+                    continue
+                if is_correct:
+                    player.add_score(self._points_for(player, received_ns))
+                    self._answered.add(player.user_id)
+                    decided = self.is_sudden_death
+                scored.append((player, bool(is_correct)))
+
+        # Ranks are read after the whole batch has moved the board
+        board = self._lobby.leaderboard
+        results = [[p.user_id, correct, p.score, board.rank(p.user_id)] for p, correct in scored]
+        eliminating = len(board) > 1 and not self.is_sudden_death
+        await self._lobby.broadcast({
+            "type": "ANSWER_BATCH",
+            "results": results,
+            "top": board.standings(STANDINGS_TOP),
+            "cutoff": board.score_at(board.median_index()) if eliminating else None, # Best score still below the line
+        })
+        if decided:
+            self._round_over.set()
+        elif not self._round_over.is_set():
+            self._check_round_complete()
+
+    def _points_for(self, player: Player, received_ns: int) -> int:
+        """Speed-based points from the RTT-compensated response time."""
+        self._clock.mark_answer(player.user_id, received_ns)
+        response_ns = self._clock.response_ns(player.user_id, received_ns, player.rtt)
+        remaining = max(0.0, 1.0 - response_ns / (ROUND_DURATION * 1_000_000_000))
+        return BASE_POINTS + int(SPEED_POINTS * remaining)
 
     async def _logic_check_elimination(self):
         """50% Elimination Rule."""
-        # Sort by score descending
-        sorted_players = sorted(
-            [p for p in self._lobby.players if p.is_alive],
-            key=lambda p: p.score,
-            reverse=True
-        )
-        
-        count = len(sorted_players)
+        # Alive players are already ranked by score, then by who got there first
+        board = self._lobby.leaderboard
+        count = len(board)
         if count <= 1:
             return # Don't eliminate if only 1 left
 
@@ -91,16 +285,18 @@ class GameSession:
         # User said: 30 -> 15 -> 7 -> 1.
         # 30 / 2 = 15.
         # 15 / 2 = 7.5 -> 7?
-        cutoff_index = count // 2
+        cutoff_index = board.median_index()
         
         # Keep top half
-        survivors = sorted_players[:cutoff_index]
-        eliminated = sorted_players[cutoff_index:]
+        survivors = board.top(cutoff_index)
+        eliminated = board.below(cutoff_index)
         
         # Update Status
+        self._eliminations.append(eliminated)
         for p in eliminated:
             p.eliminate()
-            await p.websocket.send_json({"type": "ELIMINATED"})
+            p.send(ELIMINATED)
+            self._lobby.spectators.welcome(p) # Follows the rest of the game from the spectator feed
             
         # Reset scores for next round? User said "They reset" in Q7.
         for p in survivors:
@@ -116,15 +312,11 @@ class GameSession:
 
     async def _declare_winner(self):
         """Round 4 Sudden Death Result."""
-        # Sort by score (Sudden Death)
-        sorted_players = sorted(
-            [p for p in self._lobby.players if p.is_alive],
-            key=lambda p: p.score,
-            reverse=True
-        )
+        # Highest score wins; ties go to whoever reached it first
+        leaders = self._lobby.leaderboard.top(1)
         
-        if sorted_players:
-            winner = sorted_players[0]
+        if leaders:
+            winner = leaders[0]
             # Ensure winner actually has score?
             if winner.score > 0:
                 await self._lobby.broadcast({
@@ -133,7 +325,29 @@ class GameSession:
                     "winner_id": winner.user_id
                 })
             else:
+                 winner = None
                  await self._lobby.broadcast({"type": "GAME_OVER", "winner": "Draw (No Score)"})
-            # Save stats to DB logic here
+            self._record_results(winner)
         else:
             await self._lobby.broadcast({"type": "GAME_OVER", "winner": "No One"})
+
+    def _record_results(self, winner: Optional[Player]):
+        """Queue final placements for the write-behind results writer (never awaits the DB)."""
+        alive = self._lobby.leaderboard.top(len(self._lobby.leaderboard))
+        if winner:
+            groups = [[winner], [p for p in alive if p is not winner]]
+        else:
+            groups = [alive] # Draw: everyone still standing shares first place
+        groups += reversed(self._eliminations) # Knocked out later places higher
+
+        placements = []
+        placed = 0
+        for group in groups:
+            place = placed + 1
+            for p in group:
+                if p not in self._lobby.players:
+                    continue # Left mid-game: not recorded
+                placed += 1
+                if p.authenticated: # Guests have no account row to update
+                    placements.append((p.user_id, place))
+        results_writer.submit(MatchResult(self._lobby.room_code, time.time(), placements))
@@ -0,0 +1,71 @@
+import time
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional, Tuple
+
+# (negated score, monotonic ns the score was reached, user id): ascending
+# order is best-first, and equal scores rank whoever got there first higher.
+RankKey = Tuple[int, int, int]
+
+class Leaderboard:
+    """
+    Alive players kept in rank order as scores change, so standings never
+    need a full sort. Lookups bisect an ordered key list (O(log n)); an
+    update is a bisect plus one list insert/delete, which is a memmove and
+    negligible at lobby sizes.
+    """
+    def __init__(self):
+        self._keys: List[RankKey] = []
+        self._key_of: Dict[int, RankKey] = {}
+        self._players: Dict[int, object] = {} # user_id -> Player
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._key_of
+
+    def update(self, player):
+        """Insert the player, or move them to match their current score."""
+        old = self._key_of.get(player.user_id)
+        if old is not None:
+            if old[0] == -player.score:
+                return # Unchanged score keeps its original tie-break time
+            del self._keys[bisect_left(self._keys, old)]
+        key = (-player.score, time.monotonic_ns(), player.user_id)
+        insort(self._keys, key)
+        self._key_of[player.user_id] = key
+        self._players[player.user_id] = player
+
+    def remove(self, player):
+        key = self._key_of.pop(player.user_id, None)
+        if key is not None:
+            del self._keys[bisect_left(self._keys, key)]
+            del self._players[player.user_id]
+
+    def rank(self, user_id: int) -> Optional[int]:
+        """1-based rank, or None if the player isn't on the board."""
+        key = self._key_of.get(user_id)
+        if key is None:
+            return None
+        return bisect_left(self._keys, key) + 1
+
+    def top(self, k: int) -> List:
+        return [self._players[key[2]] for key in self._keys[:k]]
+
+    def below(self, k: int) -> List:
+        """Everyone ranked after the first k players."""
+        return [self._players[key[2]] for key in self._keys[k:]]
+
+    def score_at(self, index: int) -> Optional[int]:
+        """Score held by the player at a 0-based position."""
+        if 0 <= index < len(self._keys):
+            return -self._keys[index][0]
+        return None
+
+    def median_index(self) -> int:
+        """Position of the elimination line: the top half sits above it."""
+        return len(self._keys) // 2
+
+    def standings(self, k: int) -> List[List[int]]:
+        """Compact [[user_id, score], ...] for the top k, ready to broadcast."""
+        return [[key[2], -key[0]] for key in self._keys[:k]]
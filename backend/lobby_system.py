@@ -1,21 +1,150 @@
+import asyncio
+import itertools
+from array import array
+import json
+import logging
+import os
 import random
-import string
-from typing import Dict, List, Optional
+import secrets
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Tuple, Union
 from fastapi import WebSocket
+from .state_backend import StateBackend, LocalBackend, create_backend
+from .leaderboard import Leaderboard
+from .metrics import broadcast_seconds, ws_messages_out
+from .protocol import CODECS, JSON_CODEC, EncodedMessage, Frame
+from .spectators import SPECTATOR_INTERVAL, SpectatorFeed
+from .timing import RttEstimator
+
+logger = logging.getLogger(__name__)
+
+CODE_LENGTH = 4
+REAP_INTERVAL = 30 # Seconds between reaper passes
+EMPTY_LOBBY_GRACE = 30 # Seconds an empty lobby is kept before reaping
+IDLE_LOBBY_TIMEOUT = 30 * 60 # Seconds without any activity before reaping
+OWNER_TTL = 120 # Seconds a worker's claim on a lobby code survives without refresh
+
+# Reply-channel payload prefixes (owner worker -> socket worker)
+FRAME_PREFIX = b"F"
+BINARY_FRAME_PREFIX = b"B"
+CLOSE_PREFIX = b"C"
+
+# Frames buffered per connection before the slow-consumer policy kicks in.
+# Policy: drop the OLDEST queued frame, so a lagging client always catches up
+# to the latest state instead of replaying stale rounds.
+SEND_QUEUE_SIZE = 32
+
+# Session resume: a dropped player keeps their slot for RESUME_GRACE seconds,
+# and each lobby keeps its last REPLAY_BUFFER_SIZE broadcasts to replay.
+RESUME_GRACE = float(os.getenv("RESUME_GRACE", "30"))
+REPLAY_BUFFER_SIZE = 128
+
+# Liveness: every HEARTBEAT_INTERVAL seconds each connection is pinged, and
+# evicted if nothing arrived for HEARTBEAT_TIMEOUT or a send failed/stalled.
+HEARTBEAT_INTERVAL = float(os.getenv("HEARTBEAT_INTERVAL", "5"))
+HEARTBEAT_TIMEOUT = float(os.getenv("HEARTBEAT_TIMEOUT", "15"))
+SEND_TIMEOUT = float(os.getenv("SEND_TIMEOUT", "5")) # A single frame stuck longer marks the socket dead
+
+class BroadcastStats:
+    """Latency from broadcast() to the last recipient's completed send."""
+    def __init__(self):
+        self.count = 0
+        self.last_latency = 0.0
+        self.max_latency = 0.0
+        self.total_latency = 0.0
+
+    def record(self, latency: float):
+        self.count += 1
+        self.last_latency = latency
+        self.total_latency += latency
+        if latency > self.max_latency:
+            self.max_latency = latency
+        broadcast_seconds.observe(latency)
+
+    @property
+    def avg_latency(self) -> float:
+        return self.total_latency / self.count if self.count else 0.0
+
+class BroadcastTicket:
+    """Counts down as each recipient's writer finishes (or drops) the frame."""
+    __slots__ = ("_stats", "_pending", "_started", "_on_sent")
+
+    def __init__(self, stats: BroadcastStats, pending: int,
+                 on_sent: Optional[Callable[["Player"], None]] = None):
+        self._stats = stats
+        self._pending = pending
+        self._started = time.perf_counter()
+        self._on_sent = on_sent # Called per recipient right after its send completes
+
+    def done(self, player: "Player", sent: bool):
+        if sent and self._on_sent:
+            self._on_sent(player)
+        self._pending -= 1
+        if self._pending == 0:
+            self._stats.record(time.perf_counter() - self._started)
+
+class PingTicket:
+    """Stamps the moment a PING actually leaves, for RTT sampling."""
+    __slots__ = ("seq",)
+
+    def __init__(self, seq: int):
+        self.seq = seq
+
+    def done(self, player: "Player", sent: bool):
+        if sent:
+            player._ping_sent = (self.seq, time.monotonic_ns())
 
 class Player:
-    def __init__(self, websocket: WebSocket, username: str, user_id: int):
+    # Slotted: a busy worker holds one of these per connection, so no per-instance __dict__
+    __slots__ = (
+        "websocket", "username", "user_id", "codec", "authenticated", "lobby_code",
+        "_is_alive", "_is_host", "_score", "_table", "_seat", "_standings",
+        "_outbox", "_wakeup", "_writer", "_send_failed", "_failed_at", "last_seen", "dropped_frames", "_replay",
+        "_suspended", "resume_token", "rtt", "_ping_seq", "_ping_sent", "answers_pings",
+    )
+
+    def __init__(self, websocket: WebSocket, username: str, user_id: int, codec=JSON_CODEC,
+                 authenticated: bool = False):
         self.websocket = websocket
         self.username = username
         self.user_id = user_id
-        self._is_alive = True
+        self.codec = codec # Wire format negotiated at connect
+        self.authenticated = authenticated # user_id came from a verified token
+        self.lobby_code: Optional[str] = None
         self._is_host = False
+        # Score and alive flag live in the lobby's PlayerTable columns while seated
+        self._is_alive = True
         self._score = 0
-        self._current_input = None  # To store latest received input
+        self._table: Optional["PlayerTable"] = None
+        self._seat = -1
+        self._standings: Optional[Leaderboard] = None # Lobby ranking kept in sync with score
+
+        # Outbound queue drained by a dedicated writer task. A bare deque plus
+        # one wakeup future: an asyncio.Queue would add three more deques here.
+        self._outbox: Deque[Tuple[Frame, object]] = deque()
+        self._wakeup: Optional[asyncio.Future] = None
+        self._writer: Optional[asyncio.Task] = None
+        self._send_failed = False
+        self._failed_at: Optional[float] = None # When the first send failed
+        self.last_seen = time.monotonic() # Last frame received from the client
+        self.dropped_frames = 0
+        self._replay: Optional[Deque[Frame]] = None # Sent ahead of the outbox after a resume
+
+        # Resume: while suspended the slot is kept but nothing is queued
+        self._suspended = False
+        self.resume_token: Optional[str] = None
+
+        # Latency tracking via application-level PING/PONG
+        self.rtt = RttEstimator()
+        self._ping_seq = 0
+        self._ping_sent = (0, 0) # (seq, monotonic ns) of the outstanding PING
+        self.answers_pings = False # Set by the first PONG; older clients never send one
 
     @property
     def is_alive(self) -> bool:
-        return self._is_alive
+        table = self._table
+        return bool(table.alive[self._seat]) if table is not None else self._is_alive
 
     @property
     def is_host(self) -> bool:
@@ -23,83 +152,910 @@ class Player:
     
     @property
     def score(self) -> int:
-        return self._score
+        table = self._table
+        return table.scores[self._seat] if table is not None else self._score
 
     def set_host(self, status: bool):
         self._is_host = status
         
     def eliminate(self):
+        if self._table is not None:
+            self._table.set_alive(self._seat, False)
         self._is_alive = False
+        if self._standings is not None:
+            self._standings.remove(self)
         
     def set_score(self, points: int):
-        self._score = points
+        if self._table is not None:
+            self._table.scores[self._seat] = points
+        else:
+            self._score = points
+        if self._standings is not None and self.is_alive:
+            self._standings.update(self)
         
     def add_score(self, points: int):
-        self._score += points
+        self.set_score(self.score + points)
+
+    def attach_standings(self, standings: Optional[Leaderboard]):
+        if self._standings is not None:
+            self._standings.remove(self)
+        self._standings = standings
+        if standings is not None and self.is_alive:
+            standings.update(self)
+
+    def _take_seat(self, table: "PlayerTable", seat: int):
+        self._table = table
+        self._seat = seat
+
+    def _leave_seat(self):
+        """Copy the column values back so the player keeps them off the table."""
+        table = self._table
+        self._score = table.scores[self._seat]
+        self._is_alive = bool(table.alive[self._seat])
+        self._table = None
+        self._seat = -1
+
+    @property
+    def send_failed(self) -> bool:
+        return self._send_failed
+
+    @property
+    def failed_at(self) -> Optional[float]:
+        return self._failed_at
+
+    def mark_seen(self):
+        self.last_seen = time.monotonic()
+
+    @property
+    def suspended(self) -> bool:
+        return self._suspended
+
+    def suspend(self):
+        """Socket dropped: keep the slot, stop sending until reattached."""
+        self._suspended = True
+        self.stop_writer()
+
+    def reattach(self, websocket: WebSocket, codec):
+        """Move this player onto a new socket; call start_writer() once replay is set."""
+        self.stop_writer() # Drops frames meant for the old socket; replay covers them
+        self.websocket = websocket
+        self.codec = codec
+        self._send_failed = False
+        self._failed_at = None
+        self._suspended = False
+        self.answers_pings = False
+        self.mark_seen()
+
+    def replay(self, frames: List[Frame]):
+        """Frames the writer sends before anything queued afterwards."""
+        if self._replay is None:
+            self._replay = deque()
+        self._replay.extend(frames)
+
+    def _discard_outbox(self):
+        self._replay = None
+        outbox = self._outbox
+        while outbox:
+            _, ticket = outbox.popleft()
+            if ticket:
+                ticket.done(self, False)
+
+    def start_writer(self):
+        if self._writer is None:
+            self._writer = asyncio.create_task(self._drain_outbox())
+
+    def stop_writer(self):
+        """Cancel the writer and drop what's still queued, completing those frames' tickets."""
+        if self._writer is not None:
+            self._writer.cancel()
+            self._writer = None
+        self._discard_outbox()
+
+    def send(self, message: Union[dict, EncodedMessage]):
+        """Queue a message for this player only (never blocks)."""
+        if isinstance(message, EncodedMessage):
+            ws_messages_out.inc(message.message.get("type"))
+            self.enqueue(message.frame(self.codec))
+        else:
+            ws_messages_out.inc(message.get("type"))
+            self.enqueue(self.codec.encode(message))
+
+    def send_ping(self):
+        self._ping_seq += 1
+        ws_messages_out.inc("PING")
+        self.enqueue(self.codec.encode({"type": "PING", "seq": self._ping_seq}), PingTicket(self._ping_seq))
+
+    def handle_pong(self, seq):
+        sent_seq, sent_ns = self._ping_sent
+        self.answers_pings = True
+        self.mark_seen()
+        if sent_ns and seq == sent_seq:
+            self.rtt.observe(time.monotonic_ns() - sent_ns)
+            self._ping_sent = (0, 0)
+
+    def roster_entry(self) -> dict:
+        return {"username": self.username, "is_host": self.is_host, "id": self.user_id,
+                "connected": not self._suspended}
+
+    def enqueue(self, frame: Frame, ticket=None):
+        """Queue an already-encoded frame, dropping the oldest one if full."""
+        if self._suspended:
+            if ticket:
+                ticket.done(self, False)
+            return
+        outbox = self._outbox
+        if len(outbox) >= SEND_QUEUE_SIZE:
+            _, stale_ticket = outbox.popleft()
+            self.dropped_frames += 1
+            if stale_ticket:
+                stale_ticket.done(self, False)
+        outbox.append((frame, ticket))
+        wakeup = self._wakeup
+        if wakeup is not None and not wakeup.done():
+            wakeup.set_result(None)
+
+    async def close(self, message: Optional[dict] = None):
+        """Send a final message (if any) and close the connection."""
+        self.stop_writer()
+        try:
+            if message:
+                await self._deliver(self.codec.encode(message))
+            await self.websocket.close()
+        except Exception:
+            pass
+
+    async def _deliver(self, frame: Frame):
+        if isinstance(frame, bytes):
+            await self.websocket.send_bytes(frame)
+        else:
+            await self.websocket.send_text(frame)
+
+    async def _drain_outbox(self):
+        while True:
+            if self._replay:
+                frame, ticket = self._replay.popleft(), None
+                if not self._replay:
+                    self._replay = None
+            elif self._outbox:
+                frame, ticket = self._outbox.popleft()
+            else:
+                self._wakeup = asyncio.get_running_loop().create_future()
+                try:
+                    await self._wakeup
+                finally:
+                    self._wakeup = None
+                continue
+            sent = False
+            try:
+                if not self._send_failed:
+                    # Not wait_for(): its inner task can finish in the same pass
+                    # as stop_writer()'s cancel and swallow it, leaking the writer.
+                    async with asyncio.timeout(SEND_TIMEOUT):
+                        await self._deliver(frame)
+                    sent = True
+            except Exception:
+                # Dead or stalled socket: keep draining so tickets complete;
+                # the next heartbeat sweep evicts us.
+                self._send_failed = True
+                if self._failed_at is None:
+                    self._failed_at = time.monotonic()
+            finally:
+                if ticket:
+                    ticket.done(self, sent)
+
+class RemotePlayer(Player):
+    """
+    Lobby-side stand-in for a player whose socket is held by another worker.
+    Frames are published to that worker's reply channel instead of a socket.
+    """
+    __slots__ = ("_backend", "channel")
+
+    def __init__(self, backend: StateBackend, channel: str, username: str, user_id: int, codec=JSON_CODEC,
+                 authenticated: bool = False):
+        super().__init__(None, username, user_id, codec, authenticated)
+        self._backend = backend
+        self.channel = channel
+
+    async def _deliver(self, frame: Frame):
+        if isinstance(frame, bytes):
+            await self._backend.publish(self.channel, BINARY_FRAME_PREFIX + frame)
+        else:
+            await self._backend.publish(self.channel, FRAME_PREFIX + frame.encode())
+
+    async def close(self, message: Optional[dict] = None):
+        self.stop_writer()
+        try:
+            await self._backend.publish(self.channel, CLOSE_PREFIX + json.dumps(message or {}).encode())
+        except Exception:
+            pass
+
+class RemoteLobbyLink:
+    """Socket-side half of a player whose lobby is hosted by another worker."""
+    def __init__(self, backend: StateBackend, code: str, player: Player, channel: str):
+        self.code = code
+        self.player = player
+        self._backend = backend
+        self._channel = channel
+
+    async def open(self):
+        self.player.start_writer()
+        await self._backend.subscribe(self._channel, self._on_reply)
+        await self._publish({
+            "op": "join",
+            "username": self.player.username,
+            "user_id": self.player.user_id,
+            "codec": self.player.codec.name,
+            "authenticated": self.player.authenticated,
+        })
+
+    def _on_reply(self, data: bytes):
+        kind, body = data[:1], data[1:]
+        if kind == FRAME_PREFIX:
+            self.player.enqueue(body.decode())
+        elif kind == BINARY_FRAME_PREFIX:
+            self.player.enqueue(body)
+        elif kind == CLOSE_PREFIX:
+            asyncio.create_task(self.player.close(json.loads(body) or None))
+
+    async def forward(self, message: dict):
+        await self._publish({"op": "msg", "data": message})
+
+    async def close(self):
+        self.player.stop_writer()
+        await self._backend.unsubscribe(self._channel)
+        await self._publish({"op": "leave"})
+
+    async def _publish(self, envelope: dict):
+        envelope["conn"] = self._channel
+        await self._backend.publish(lobby_channel(self.code), json.dumps(envelope).encode())
+
+def owner_key(code: str) -> str:
+    return f"lobby:{code}:owner"
+
+def lobby_channel(code: str) -> str:
+    return f"lobby:{code}"
+
+class PlayerTable:
+    """
+    A lobby's players, indexed by user id, in join order. Scores and alive
+    flags are columns (one seat per player, reused after a leave) rather
+    than per-object ints, and the alive count is kept as a running total.
+    Supports the list operations lobby code relies on: iteration, len(),
+    truthiness and `player in table`, the last two in O(1).
+    """
+    __slots__ = ("_by_id", "scores", "alive", "_free", "alive_count")
+
+    def __init__(self):
+        self._by_id: Dict[int, Player] = {}
+        self.scores = array("q")
+        self.alive = bytearray()
+        self._free: List[int] = [] # Seats vacated by leavers
+        self.alive_count = 0
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def __iter__(self) -> Iterator[Player]:
+        return iter(self._by_id.values())
+
+    def __contains__(self, player: Player) -> bool:
+        return self._by_id.get(player.user_id) is player
+
+    def get(self, user_id: int) -> Optional[Player]:
+        return self._by_id.get(user_id)
+
+    def add(self, player: Player):
+        if self._free:
+            seat = self._free.pop()
+            self.scores[seat] = player.score
+            self.alive[seat] = player.is_alive
+        else:
+            seat = len(self.scores)
+            self.scores.append(player.score)
+            self.alive.append(player.is_alive)
+        self.alive_count += player.is_alive
+        self._by_id[player.user_id] = player
+        player._take_seat(self, seat)
+
+    def remove(self, player: Player):
+        del self._by_id[player.user_id]
+        seat = player._seat
+        self.alive_count -= self.alive[seat]
+        player._leave_seat()
+        self._free.append(seat)
+
+    def clear(self):
+        for player in list(self._by_id.values()):
+            self.remove(player)
+
+    def set_alive(self, seat: int, alive: bool):
+        self.alive_count += int(alive) - self.alive[seat]
+        self.alive[seat] = alive
 
 class Lobby:
     def __init__(self, room_code: str):
         self.room_code = room_code
-        self.players: List[Player] = []
+        self.players = PlayerTable()
+        self._host: Optional[Player] = None
         self._is_game_active = False
         self._min_players = 2 # Changed to 2 for dev testing, user said 5
+        self.broadcast_stats = BroadcastStats()
+        self.leaderboard = Leaderboard() # Alive players in rank order
+        self.spectators = SpectatorFeed(self) # Eliminated players and observers, at a lower rate
+        self.game_session = None # Set by START_GAME
+        self.last_activity = time.monotonic()
+        self.empty_since: Optional[float] = self.last_activity
+        self._roster_message: Optional[EncodedMessage] = None # Cleared on any roster change
+
+        # Every broadcast gets a lobby sequence number and is kept for replay
+        self._event_seq = 0
+        self._events: Deque[EncodedMessage] = deque(maxlen=REPLAY_BUFFER_SIZE)
+
+    def touch(self):
+        self.last_activity = time.monotonic()
+
+    @property
+    def event_seq(self) -> int:
+        return self._event_seq
         
     @property
     def host(self) -> Optional[Player]:
-        for p in self.players:
-            if p.is_host:
-                return p
-        return None
+        return self._host
+
+    def _set_host(self, player: Optional[Player]):
+        if self._host is not None:
+            self._host.set_host(False)
+        self._host = player
+        if player is not None:
+            player.set_host(True)
         
     async def connect(self, player: Player):
+        stale = self.players.get(player.user_id)
+        if stale is not None:
+            self.disconnect(stale) # Same user on an older object: one seat per id
         if not self.players:
-            player.set_host(True) # First player is host
-        self.players.append(player)
-        await self.broadcast_player_list()
+            self._set_host(player) # First player is host
+        self.players.add(player)
+        player.attach_standings(self.leaderboard)
+        self._roster_message = None
+        self.empty_since = None
+        self.touch()
+        player.start_writer()
+        # Full roster for the newcomer, a one-entry delta for everyone else
+        player.send(self.player_list_message())
+        player.send_ping() # First RTT sample before any round is timed
+        self._fanout({"type": "PLAYER_JOINED", "player": player.roster_entry()}, exclude=player)
         
     def disconnect(self, player: Player):
         if player in self.players:
+            player.attach_standings(None)
             self.players.remove(player)
-            if player.is_host:
-                self._migrate_host()
+            self._roster_message = None
+            player.stop_writer()
+            self.touch()
+            if not self.players:
+                self.empty_since = self.last_activity
+            new_host = self._migrate_host() if player is self._host else None
+            self._fanout({
+                "type": "PLAYER_LEFT",
+                "id": player.user_id,
+                "host_id": new_host.user_id if new_host else None,
+            })
+            if self.game_session:
+                self.game_session.player_left(player)
                 
-    def _migrate_host(self):
-        """Transfer host to the next available player."""
-        if self.players:
-            new_host = self.players[0]
-            new_host.set_host(True)
-            # Notify everyone (we'd call broadcast here)
+    def _migrate_host(self) -> Optional[Player]:
+        """Transfer host to the next available player, preferring connected ones."""
+        new_host = next((p for p in self.players if not p.suspended), None)
+        if new_host is None:
+            new_host = next(iter(self.players), None)
+        self._set_host(new_host)
+        return new_host # Announced in the PLAYER_LEFT/PLAYER_STATUS delta
+
+    def mark_away(self, player: Player):
+        """A suspended player keeps their slot, but not the host role."""
+        new_host = None
+        if player is self._host:
+            self._set_host(None)
+            new_host = self._migrate_host()
+        self._roster_message = None
+        self._fanout({
+            "type": "PLAYER_STATUS",
+            "id": player.user_id,
+            "connected": False,
+            "host_id": new_host.user_id if new_host else None,
+        }, exclude=player)
+
+    def resume(self, player: Player, last_seq) -> int:
+        """
+        Replay what a reattached player missed, then resume live delivery.
+        If the gap is older than the buffer, send the current roster instead
+        so the client can resynchronise. Returns the number of events replayed.
+        """
+        oldest = self._event_seq - len(self._events) # Events after this seq are buffered
+        gap = not isinstance(last_seq, int) or last_seq < oldest or last_seq > self._event_seq
+        missed = [] if gap else list(self._events)[len(self._events) - (self._event_seq - last_seq):]
+        resumed = {
+            "type": "RESUMED",
+            "code": self.room_code,
+            "token": player.resume_token,
+            "seq": self._event_seq,
+            "gap": gap,
+            "replayed": len(missed),
+        }
+        frames = [player.codec.encode(resumed)]
+        if gap:
+            frames.append(self.player_list_message().frame(player.codec))
+        frames += [event.frame(player.codec) for event in missed]
+        player.replay(frames)
+        player.start_writer()
+        self._roster_message = None
+        self._fanout({"type": "PLAYER_STATUS", "id": player.user_id, "connected": True, "host_id": None},
+                     exclude=player)
+        return len(missed)
+
+    def snapshot(self) -> dict:
+        """
+        Serializable state for the snapshot log: roster with scores, alive
+        flags and resume tokens, plus the game session's round state.
+        Players relayed from other workers aren't included.
+        """
+        session = self.game_session
+        return {
+            "code": self.room_code,
+            "seq": self._event_seq,
+            "host": self._host.user_id if self._host else None,
+            "players": [
+                [p.user_id, p.username, p.authenticated, p.is_alive, p.score, p.resume_token]
+                for p in self.players if not isinstance(p, RemotePlayer)
+            ],
+            "game": session.snapshot() if session else None,
+        }
+
+    @classmethod
+    def from_snapshot(cls, state: dict) -> "Lobby":
+        """Rebuild a lobby from snapshot(); every player starts suspended, awaiting RESUME."""
+        lobby = cls(state["code"])
+        lobby._event_seq = state["seq"] # Clients compare it to their last seen seq on resume
+        for user_id, username, authenticated, alive, score, token in state["players"]:
+            if not token:
+                continue # Nothing to resume with
+            player = Player(None, username, user_id, authenticated=authenticated)
+            player.set_score(score)
+            if not alive:
+                player.eliminate()
+            player.lobby_code = lobby.room_code
+            player.resume_token = token
+            player.suspend()
+            lobby.players.add(player)
+            player.attach_standings(lobby.leaderboard)
+        host = lobby.players.get(state["host"]) if state["host"] is not None else None
+        lobby._set_host(host or next(iter(lobby.players), None))
+        if lobby.players:
+            lobby.empty_since = None
+        return lobby
+
+    def player_list_message(self) -> EncodedMessage:
+        """Full roster, rebuilt (and re-encoded) only after the roster changes."""
+        if self._roster_message is None:
+            self._roster_message = EncodedMessage({
+                "type": "PLAYER_LIST",
+                "players": [p.roster_entry() for p in self.players],
+            })
+        return self._roster_message
             
-    async def broadcast(self, message: dict):
-        for p in self.players:
-            try:
-                await p.websocket.send_json(message)
-            except:
-                pass # Handle stale connections later
+    async def broadcast(self, message: Union[dict, EncodedMessage],
+                        on_sent: Optional[Callable[[Player], None]] = None):
+        """Serialize once per wire format and enqueue; never waits on sockets."""
+        self._fanout(message, on_sent=on_sent)
 
-    async def broadcast_player_list(self):
-        p_list = [{"username": p.username, "is_host": p.is_host, "id": p.user_id} for p in self.players]
-        await self.broadcast({"type": "PLAYER_LIST", "players": p_list})
+    def _fanout(self, message: Union[dict, EncodedMessage], exclude: Optional[Player] = None,
+                on_sent: Optional[Callable[[Player], None]] = None):
+        # Full-rate delivery is for players still in the game; everyone else
+        # gets this event in the spectator feed's next delta
+        recipients = self.players.alive_count - (exclude is not None and exclude.is_alive)
+        if recipients <= 0 and not len(self.spectators):
+            return
+        self.touch()
+        payload = message.message if isinstance(message, EncodedMessage) else message
+        self._event_seq += 1
+        message = EncodedMessage({**payload, "seq": self._event_seq})
+        self._events.append(message)
+        self.spectators.record(message.message)
+        if recipients <= 0:
+            return
+        ws_messages_out.inc(payload.get("type"), recipients)
+        ticket = BroadcastTicket(self.broadcast_stats, recipients, on_sent)
+        for p in self.players:
+            if p is not exclude and p.is_alive:
+                p.enqueue(message.frame(p.codec), ticket)
 
 class LobbyManager:
-    def __init__(self):
+    """
+    Registry of live lobbies.
+    Codes come from a shuffled free pool (O(1) to allocate, no retry loop),
+    players are indexed by id, and a reaper task drops empty/idle lobbies.
+
+    Each code is claimed in the shared StateBackend, so with several workers
+    a JOIN that lands on the wrong process is relayed to the owning worker
+    over pub/sub (RemoteLobbyLink on this side, RemotePlayer on the owner).
+    """
+    def __init__(self, backend: Optional[StateBackend] = None, code_length: int = CODE_LENGTH):
+        self.backend = backend or LocalBackend()
         self.active_lobbies: Dict[str, Lobby] = {}
+        self._player_index: Dict[int, str] = {}  # user_id -> lobby code
+        self._connections: Dict[int, Player] = {}  # user_id -> live socket on this worker
+        self._resume_tokens: Dict[str, Player] = {}
+        self._grace_timers: Dict[str, asyncio.TimerHandle] = {}  # token -> slot expiry
 
-    def create_lobby(self) -> str:
-        """Generate 4-digit numeric code."""
-        while True:
-            code = "".join(random.choices(string.digits, k=4))
-            if code not in self.active_lobbies:
-                self.active_lobbies[code] = Lobby(code)
-                return code
+        codes = [str(i).zfill(code_length) for i in range(10 ** code_length)]
+        random.shuffle(codes)
+        # Released codes go to the back so they aren't immediately reissued
+        self._free_codes: Deque[str] = deque(codes)
+
+        # Traffic from players connected to other workers
+        self._remote_players: Dict[str, RemotePlayer] = {}  # reply channel -> proxy
+        self._inbox: asyncio.Queue = asyncio.Queue()
+        self._link_ids = itertools.count()
+        self.command_handler = None  # async (lobby, player, msg), set by main
+
+        self._tasks: List[asyncio.Task] = []
+        self.lobbies_created = 0
+        self.lobbies_restored = 0
+        self.lobbies_removed = 0
+        self.players_joined = 0
+        self.players_left = 0
+        self.spectators_joined = 0
+        self.duplicate_sessions = 0
+        self.sessions_resumed = 0
+        self.sessions_expired = 0
+        self.evictions_timeout = 0
+        self.evictions_send_failed = 0
+        self.stale_send_time = 0.0 # Seconds dead sockets stayed attached after their first failed send
+
+    async def start(self):
+        await self.backend.start()
+        self._tasks = [
+            asyncio.create_task(self._reap_forever()),
+            asyncio.create_task(self._process_inbox()),
+            asyncio.create_task(self._heartbeat_forever()),
+            asyncio.create_task(self._spectate_forever()),
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        await self.backend.close()
+
+    async def create_lobby(self) -> str:
+        """Allocate a free numeric code and claim it for this worker."""
+        for _ in range(len(self._free_codes)):
+            code = self._free_codes.popleft()
+            if not await self.backend.claim(owner_key(code), self.backend.worker_id, OWNER_TTL):
+                self._free_codes.append(code) # Hosted by another worker
+                continue
+            await self._host_lobby(Lobby(code))
+            self.lobbies_created += 1
+            return code
+        raise RuntimeError("No free lobby codes")
+
+    async def restore_lobby(self, state: dict, grace: float) -> Optional[Lobby]:
+        """
+        Recreate a lobby saved by a previous process. Its players hold their
+        slots (and resume tokens) for `grace` seconds, as after a dropped
+        socket. None if the code is already hosted here or by another worker.
+        """
+        code = state["code"]
+        if code in self.active_lobbies or not await self.backend.claim(owner_key(code), self.backend.worker_id, OWNER_TTL):
+            return None
+        try:
+            self._free_codes.remove(code)
+        except ValueError:
+            pass
+        lobby = Lobby.from_snapshot(state)
+        await self._host_lobby(lobby)
+        self.lobbies_restored += 1
+        loop = asyncio.get_running_loop()
+        for p in lobby.players:
+            self._player_index[p.user_id] = code
+            self._resume_tokens[p.resume_token] = p
+            self._grace_timers[p.resume_token] = loop.call_later(grace, self._expire, p)
+        return lobby
+
+    async def _host_lobby(self, lobby: Lobby):
+        code = lobby.room_code
+        self.active_lobbies[code] = lobby
+        await self.backend.subscribe(
+            lobby_channel(code), lambda data, code=code: self._inbox.put_nowait((code, data))
+        )
 
     def get_lobby(self, code: str) -> Optional[Lobby]:
         return self.active_lobbies.get(code)
 
-    def cleanup(self):
-        """Remove empty lobbies."""
-        empty_codes = [code for code, lobby in self.active_lobbies.items() if not lobby.players]
-        for code in empty_codes:
-            del self.active_lobbies[code]
+    def spectate(self, code: str, player: Player) -> Optional[Lobby]:
+        """Attach a read-only observer; None if the lobby isn't here or its audience is full."""
+        lobby = self.active_lobbies.get(code)
+        if lobby is None or not lobby.spectators.add_observer(player):
+            return None
+        self.spectators_joined += 1
+        return lobby
+
+    def find_player_lobby(self, user_id: int) -> Optional[Lobby]:
+        code = self._player_index.get(user_id)
+        return self.active_lobbies.get(code) if code else None
+
+    async def join_lobby(self, code: str, player: Player) -> Optional[Lobby]:
+        lobby = self.active_lobbies.get(code)
+        if lobby is None:
+            return None
+        self._player_index[player.user_id] = code
+        player.lobby_code = code
+        self.players_joined += 1
+        await lobby.connect(player)
+        return lobby
+
+    async def join_remote(self, code: str, player: Player) -> Optional[RemoteLobbyLink]:
+        """Relay a player to a lobby hosted by another worker, if any."""
+        owner = await self.backend.get(owner_key(code))
+        if owner is None or owner == self.backend.worker_id:
+            return None
+        channel = f"conn:{self.backend.worker_id}:{next(self._link_ids)}"
+        link = RemoteLobbyLink(self.backend, code, player, channel)
+        await link.open()
+        return link
+
+    def register_connection(self, player: Player) -> Optional[Player]:
+        """Index a new socket by user id; returns the session it displaces, if any."""
+        previous = self._connections.get(player.user_id)
+        self._connections[player.user_id] = player
+        if previous is None or previous is player:
+            return None
+        self.duplicate_sessions += 1
+        return previous
+
+    def held_by_account(self, user_id: int) -> bool:
+        """Whether a signed-in session, live or suspended, holds this user id here."""
+        current = self._connections.get(user_id)
+        if current is not None and current.authenticated:
+            return True
+        lobby = self.find_player_lobby(user_id)
+        return lobby is not None and any(p.user_id == user_id and p.authenticated for p in lobby.players)
+
+    def unregister_connection(self, player: Player):
+        if self._connections.get(player.user_id) is player:
+            del self._connections[player.user_id]
+
+    def connection(self, user_id: int) -> Optional[Player]:
+        return self._connections.get(user_id)
+
+    def issue_resume_token(self, player: Player) -> str:
+        """New single-use token for resuming this player's slot."""
+        self._revoke_resume(player)
+        token = secrets.token_urlsafe(18)
+        player.resume_token = token
+        self._resume_tokens[token] = player
+        lobby = self.active_lobbies.get(player.lobby_code)
+        if lobby is not None:
+            lobby.touch() # Snapshots rewrite lobbies touched since their last record
+        return token
+
+    def _revoke_resume(self, player: Player):
+        if player.resume_token:
+            self._resume_tokens.pop(player.resume_token, None)
+            timer = self._grace_timers.pop(player.resume_token, None)
+            if timer:
+                timer.cancel()
+            player.resume_token = None
+
+    def suspend(self, player: Player):
+        """Socket lost: hold the slot for RESUME_GRACE seconds, then leave."""
+        lobby = self.active_lobbies.get(player.lobby_code)
+        if lobby is None or player not in lobby.players or player.suspended:
+            return
+        if not player.resume_token or RESUME_GRACE <= 0:
+            self.leave_lobby(player)
+            self.unregister_connection(player)
+            return
+        player.suspend()
+        lobby.mark_away(player)
+        self._grace_timers[player.resume_token] = asyncio.get_running_loop().call_later(
+            RESUME_GRACE, self._expire, player
+        )
+
+    def _expire(self, player: Player):
+        self._grace_timers.pop(player.resume_token, None)
+        if player.suspended:
+            self.sessions_expired += 1
+            self.leave_lobby(player)
+            self.unregister_connection(player)
+
+    async def resume(self, token, user_id: int, websocket: WebSocket, codec, last_seq) -> Optional[Player]:
+        """Reattach a held (or half-open) slot to a new socket and replay missed events."""
+        player = self._resume_tokens.get(token) if isinstance(token, str) else None
+        if player is None or player.user_id != user_id:
+            return None
+        lobby = self.active_lobbies.get(player.lobby_code)
+        if lobby is None or player not in lobby.players:
+            return None
+        old_socket = None if player.suspended else player.websocket
+        player.reattach(websocket, codec)
+        self.issue_resume_token(player) # Rotate: each token resumes once
+        self.sessions_resumed += 1
+        lobby.resume(player, last_seq)
+        if old_socket is not None:
+            try:
+                await old_socket.close() # The old connection hadn't noticed it was dead yet
+            except Exception:
+                pass
+        return player
+
+    def leave_lobby(self, player: Player):
+        self._revoke_resume(player)
+        lobby = self.active_lobbies.get(player.lobby_code)
+        if lobby is None or player not in lobby.players:
+            return
+        if self._player_index.get(player.user_id) == player.lobby_code:
+            del self._player_index[player.user_id]
+        self.players_left += 1
+        lobby.disconnect(player)
+
+    async def remove_lobby(self, code: str):
+        lobby = self.active_lobbies.pop(code, None)
+        if lobby is None:
+            return
+        self.lobbies_removed += 1
+        self._free_codes.append(code)
+        await self.backend.unsubscribe(lobby_channel(code))
+        await self.backend.release(owner_key(code))
+        if lobby.game_session:
+            lobby.game_session.stop()
+        for p in list(lobby.players):
+            self._player_index.pop(p.user_id, None)
+            self._revoke_resume(p)
+            if isinstance(p, RemotePlayer):
+                self._remote_players.pop(p.channel, None)
+            await p.close({"type": "ERROR", "msg": "Lobby closed"})
+        lobby.players.clear()
+        for observer in lobby.spectators.close():
+            await observer.close({"type": "ERROR", "msg": "Lobby closed"})
+
+    async def cleanup(self):
+        """Remove lobbies that have been empty or idle for too long."""
+        now = time.monotonic()
+        expired = [
+            code for code, lobby in self.active_lobbies.items()
+            if (lobby.empty_since is not None and now - lobby.empty_since > EMPTY_LOBBY_GRACE)
+            or now - lobby.last_activity > IDLE_LOBBY_TIMEOUT
+        ]
+        for code in expired:
+            await self.remove_lobby(code)
+
+    async def _reap_forever(self):
+        while True:
+            await asyncio.sleep(REAP_INTERVAL)
+            try:
+                await self.cleanup()
+                await self.backend.refresh([owner_key(code) for code in self.active_lobbies], OWNER_TTL)
+            except Exception:
+                logger.exception("Lobby reaper pass failed")
+
+    def heartbeat(self):
+        """
+        One liveness sweep: ping healthy connections, evict dead ones. The
+        silence timeout only applies to clients that have answered a PING;
+        older JSON clients never do, so a dead one of those is found by a
+        failed send or the server's protocol-level WebSocket ping instead.
+        """
+        now = time.monotonic()
+        for lobby in list(self.active_lobbies.values()):
+            for p in list(lobby.players):
+                if p.suspended:
+                    continue
+                if p.send_failed:
+                    self.evictions_send_failed += 1
+                    self.stale_send_time += now - p.failed_at
+                    self.evict(p)
+                elif p.answers_pings and now - p.last_seen > HEARTBEAT_TIMEOUT:
+                    self.evictions_timeout += 1
+                    self.evict(p)
+                else:
+                    p.send_ping()
+            for p in list(lobby.spectators.observers):
+                if p.send_failed or (p.answers_pings and now - p.last_seen > HEARTBEAT_TIMEOUT):
+                    lobby.spectators.remove_observer(p) # Observers hold no slot to resume
+                    asyncio.create_task(_close_quietly(p.websocket))
+                else:
+                    p.send_ping()
+
+    def evict(self, player: Player):
+        """Drop a dead connection now rather than when its receive loop notices."""
+        if isinstance(player, RemotePlayer):
+            # The worker holding the socket is gone or wedged: no resume
+            self._remote_players.pop(player.channel, None)
+            self.leave_lobby(player)
+            return
+        self.suspend(player) # Still resumable within the grace period
+        asyncio.create_task(_close_quietly(player.websocket))
+
+    async def _heartbeat_forever(self):
+        while True:
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            try:
+                self.heartbeat()
+            except Exception:
+                logger.exception("Heartbeat pass failed")
+
+    async def _spectate_forever(self):
+        while True:
+            await asyncio.sleep(SPECTATOR_INTERVAL)
+            for lobby in list(self.active_lobbies.values()):
+                try:
+                    lobby.spectators.flush()
+                except Exception:
+                    logger.exception("Spectator flush failed for lobby %s", lobby.room_code)
+
+    async def _process_inbox(self):
+        # Single consumer keeps relayed messages in publish order
+        while True:
+            code, data = await self._inbox.get()
+            try:
+                await self._handle_relayed(code, json.loads(data))
+            except Exception:
+                logger.exception("Failed to handle relayed message for lobby %s", code)
+
+    async def _handle_relayed(self, code: str, envelope: dict):
+        op = envelope.get("op")
+        channel = envelope.get("conn")
+        if op == "join":
+            codec = CODECS.get(envelope.get("codec"), JSON_CODEC)
+            proxy = RemotePlayer(self.backend, channel, envelope["username"], envelope["user_id"], codec,
+                                 envelope.get("authenticated", False))
+            if not proxy.authenticated and self.held_by_account(proxy.user_id):
+                await proxy.close({"type": "ERROR", "msg": "User id is held by a signed-in session"})
+                return
+            if await self.join_lobby(code, proxy) is None:
+                await proxy.close({"type": "ERROR", "msg": "Lobby not found"})
+                return
+            self._remote_players[channel] = proxy
+            proxy.send({"type": "LOBBY_JOINED", "code": code})
+        elif op == "msg":
+            proxy = self._remote_players.get(channel)
+            lobby = self.active_lobbies.get(code)
+            if proxy and lobby and self.command_handler:
+                await self.command_handler(lobby, proxy, envelope["data"])
+        elif op == "leave":
+            proxy = self._remote_players.pop(channel, None)
+            if proxy:
+                self.leave_lobby(proxy)
+
+    def stats(self) -> dict:
+        """Size and churn counters for monitoring."""
+        return {
+            "active_lobbies": len(self.active_lobbies),
+            "active_players": len(self._player_index),
+            "connections": len(self._connections),
+            "spectators": sum(len(lobby.spectators.observers) for lobby in self.active_lobbies.values()),
+            "spectators_joined": self.spectators_joined,
+            "duplicate_sessions": self.duplicate_sessions,
+            "resumable_sessions": len(self._resume_tokens),
+            "sessions_resumed": self.sessions_resumed,
+            "sessions_expired": self.sessions_expired,
+            "evictions_timeout": self.evictions_timeout,
+            "evictions_send_failed": self.evictions_send_failed,
+            "stale_send_time": self.stale_send_time,
+            "free_codes": len(self._free_codes),
+            "lobbies_created": self.lobbies_created,
+            "lobbies_restored": self.lobbies_restored,
+            "lobbies_removed": self.lobbies_removed,
+            "players_joined": self.players_joined,
+            "players_left": self.players_left,
+        }
+
+async def _close_quietly(websocket: WebSocket):
+    try:
+        await asyncio.wait_for(websocket.close(), SEND_TIMEOUT)
+    except Exception:
+        pass
 
-lobby_manager = LobbyManager()
+lobby_manager = LobbyManager(create_backend())
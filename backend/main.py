@@ -1,19 +1,59 @@
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from sqlalchemy import inspect, text
 from sqlalchemy.ext.asyncio import AsyncSession
-import json
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Optional, Union
 
 from .database import engine, Base, get_db
-from .routers import auth
+from .routers import auth, users, metrics
 from .lobby_system import lobby_manager, Player
 from .game_engine import GameSession
+from .protocol import negotiate, decode_frame, ProtocolError
+from .commands import Command, Create, GameInput, Join, Pong, Resume, Spectate, StartGame, parse_command
+from .metrics import ws_messages_in, profiler
+from .rate_limit import ConnectionLimiter, FrameTooLarge
+from .minigames.question_bank import question_bank
+from .minigames.registry import minigame_registry
+from .results_writer import results_writer
+from .snapshot import lobby_snapshots
+from .user_cache import elo_leaderboard, watch_profile_writes
+from .security import hashing_pool, token_verifier, WS_REQUIRE_AUTH
+
+logger = logging.getLogger(__name__)
 
 # Create Tables (Async) - For Dev Only. In prod use Alembic.
 async def init_tables():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_unique_game_stats)
+
+def _unique_game_stats(conn):
+    """
+    The results writer UPSERTs on game_stats.user_id, which needs a unique
+    index. create_all doesn't alter tables made before it existed, so fold
+    any duplicate rows into one per user and add the index here.
+    """
+    inspector = inspect(conn)
+    if any(c["column_names"] == ["user_id"] for c in inspector.get_unique_constraints("game_stats")) or \
+            any(i["unique"] and i["column_names"] == ["user_id"] for i in inspector.get_indexes("game_stats")):
+        return
+    conn.execute(text(
+        "UPDATE game_stats SET"
+        " wins = (SELECT SUM(g.wins) FROM game_stats g WHERE g.user_id = game_stats.user_id),"
+        " total_games = (SELECT SUM(g.total_games) FROM game_stats g WHERE g.user_id = game_stats.user_id)"
+        " WHERE id IN (SELECT MIN(id) FROM game_stats GROUP BY user_id HAVING COUNT(*) > 1)"
+    ))
+    conn.execute(text("DELETE FROM game_stats WHERE id NOT IN (SELECT MIN(id) FROM game_stats GROUP BY user_id)"))
+    conn.execute(text("CREATE UNIQUE INDEX ix_game_stats_user_id ON game_stats (user_id)"))
+    logger.warning("Added the unique index on game_stats.user_id (duplicate rows merged)")
 
-app = FastAPI(on_startup=[init_tables])
+app = FastAPI(
+    on_startup=[init_tables, elo_leaderboard.refresh, question_bank.load, minigame_registry.discover, lobby_manager.start,
+                watch_profile_writes, lobby_snapshots.start, results_writer.start],
+    on_shutdown=[lobby_snapshots.stop, lobby_manager.stop, results_writer.stop, hashing_pool.shutdown, profiler.stop],
+)
 
 # CORS
 app.add_middleware(
@@ -25,63 +65,224 @@ app.add_middleware(
 )
 
 app.include_router(auth.router)
+app.include_router(users.router)
+app.include_router(metrics.router)
 
 @app.get("/")
 async def root():
     return {"status": "online", "message": "EDU PARTY Game Server is Running! Connect using the Game Client."}
 
+async def on_game_input(lobby, player: Player, command: GameInput):
+    if lobby.game_session:
+        await lobby.game_session.handle_input(player, command.input)
+
+async def on_pong(lobby, player: Player, command: Pong):
+    player.handle_pong(command.seq)
+
+async def on_start_game(lobby, player: Player, command: StartGame):
+    if player.is_host:
+        session = GameSession(lobby)
+        lobby.game_session = session # Attach to lobby
+        asyncio.create_task(session.start_game())
+
+# In-lobby commands by model; CREATE/JOIN/RESUME/SPECTATE are only valid as a connection's first command
+LOBBY_COMMANDS: Dict[type, Callable[..., Awaitable[None]]] = {
+    GameInput: on_game_input,
+    Pong: on_pong,
+    StartGame: on_start_game,
+}
+HANDSHAKE_COMMANDS = (Create, Join, Resume, Spectate)
+
+def rejection(reason) -> dict:
+    return {"type": "REJECTED", "reason": str(reason)}
+
+async def handle_command(lobby, player: Player, command: Union[Command, dict]):
+    """Dispatch one in-lobby command (players relayed from other workers arrive as dicts)."""
+    player.mark_seen()
+    if isinstance(command, dict):
+        try:
+            command = parse_command(command)
+        except ProtocolError as exc:
+            player.send(rejection(exc))
+            return
+    handler = LOBBY_COMMANDS.get(type(command))
+    if handler is None:
+        player.send(rejection(f"{command.command} is not valid in a lobby"))
+        return
+    await handler(lobby, player, command)
+
+lobby_manager.command_handler = handle_command
+
+async def receive_command(websocket: WebSocket, limiter: ConnectionLimiter) -> Optional[Command]:
+    """
+    Read one frame, decode it as JSON (text) or binary protocol (bytes) and
+    validate it. Returns None for a frame the limiter dropped (checked before
+    decoding); raises ProtocolError for a malformed one, whatever the decoder
+    actually tripped over, so a bad frame never takes the connection down.
+    """
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000))
+    data = message.get("bytes")
+    if data is None:
+        data = message.get("text", "")
+    if not limiter.admit(len(data)):
+        return None
+    try:
+        command = parse_command(decode_frame(data))
+    except ProtocolError:
+        ws_messages_in.inc("invalid")
+        raise
+    except Exception as exc:
+        ws_messages_in.inc("invalid")
+        logger.warning("Unexpected error decoding a %d-byte frame", len(data), exc_info=True)
+        raise ProtocolError("Malformed frame") from exc
+    ws_messages_in.inc(command.command)
+    return command
+
+async def send_direct(websocket: WebSocket, codec, message: dict):
+    """Send before this socket has a Player (and writer task) of its own."""
+    frame = codec.encode(message)
+    if isinstance(frame, bytes):
+        await websocket.send_bytes(frame)
+    else:
+        await websocket.send_text(frame)
+
+async def next_command(websocket: WebSocket, limiter: ConnectionLimiter, codec,
+                       player: Optional[Player] = None) -> Command:
+    """The next valid command. Bad frames are answered with REJECTED; the socket stays open."""
+    while True:
+        try:
+            command = await receive_command(websocket, limiter)
+        except ProtocolError as exc:
+            if player is not None:
+                player.send(rejection(exc)) # Queued, so it can't interleave with the writer
+            else:
+                await send_direct(websocket, codec, rejection(exc))
+            continue
+        if command is not None:
+            return command
+
+async def spectate(websocket: WebSocket, limiter: ConnectionLimiter, codec, player: Player, code: str):
+    """Observer connection: the lobby's spectator feed out, only PONGs in."""
+    lobby = lobby_manager.spectate(code, player)
+    if lobby is None:
+        await player.close({"type": "ERROR", "msg": "Lobby not found"})
+        return
+    try:
+        while True:
+            command = await next_command(websocket, limiter, codec, player)
+            player.mark_seen()
+            if isinstance(command, Pong):
+                player.handle_pong(command.seq)
+            else:
+                player.send(rejection("Spectators are read-only"))
+    finally:
+        lobby.spectators.remove_observer(player)
+
 @app.websocket("/ws/{client_id}")
 async def websocket_endpoint(websocket: WebSocket, client_id: int):
-    # In real app, validate token here
-    await websocket.accept()
+    # Browsers can't set headers on a WebSocket, so the JWT rides in ?token=
+    token = websocket.query_params.get("token")
+    claims = token_verifier.verify(token) if token else None
+    if (token and (claims is None or claims["uid"] != client_id)) or (not token and WS_REQUIRE_AUTH):
+        await websocket.close(code=1008) # Rejected during the handshake
+        return
+
+    offered = websocket.scope.get("subprotocols", [])
+    codec = negotiate(offered)
+    await websocket.accept(subprotocol=codec.name if codec.name in offered else None)
+    lobby = None
+    player = None
+    link = None # Set when the lobby lives on another worker
+    limiter = ConnectionLimiter()
     
-    # Wait for JOIN or CREATE message
+    # Wait for JOIN, CREATE, RESUME or SPECTATE message
     try:
-        data = await websocket.receive_text()
-        msg = json.loads(data)
-        cmd = msg.get("command")
-        username = msg.get("username", f"Player{client_id}")
+        command = await next_command(websocket, limiter, codec)
+        while not isinstance(command, HANDSHAKE_COMMANDS):
+            await send_direct(websocket, codec, rejection("Create, join, resume or spectate a lobby first"))
+            command = await next_command(websocket, limiter, codec)
+        if claims:
+            username = claims["sub"]
+        else:
+            username = getattr(command, "username", None) or f"Player{client_id}"
         
-        player = Player(websocket, username, client_id)
+        player = Player(websocket, username, client_id, codec, authenticated=claims is not None)
         lobby = None
+
+        if isinstance(command, Resume):
+            # Same slot, score and standing; the missed broadcasts are replayed
+            resumed = await lobby_manager.resume(command.token, client_id, websocket, codec, command.last_seq)
+            if not resumed:
+                await player.close({"type": "ERROR", "msg": "Session expired"})
+                return
+            player = resumed
+            lobby = lobby_manager.get_lobby(player.lobby_code)
+
+        if isinstance(command, Spectate):
+            # Read-only and outside the player roster, so it doesn't displace a session
+            await spectate(websocket, limiter, codec, player, command.code)
+            return
+
+        # Tokenless ids are only claimed, so they never displace a signed-in session
+        if not player.authenticated and lobby_manager.held_by_account(player.user_id):
+            await player.close({"type": "ERROR", "msg": "User id is held by a signed-in session"})
+            return
+
+        # One live session per user: the newest connection wins
+        previous = lobby_manager.register_connection(player)
+        if previous:
+            lobby_manager.leave_lobby(previous)
+            await previous.close({"type": "ERROR", "msg": "Signed in from another connection"})
         
-        if cmd == "CREATE":
-            code = lobby_manager.create_lobby()
-            lobby = lobby_manager.get_lobby(code)
-            await lobby.connect(player)
-            await websocket.send_json({"type": "LOBBY_CREATED", "code": code})
+        if isinstance(command, Create):
+            code = await lobby_manager.create_lobby()
+            lobby = await lobby_manager.join_lobby(code, player)
+            player.send({
+                "type": "LOBBY_CREATED", "code": code,
+                "token": lobby_manager.issue_resume_token(player), "seq": lobby.event_seq,
+            })
             
-        elif cmd == "JOIN":
-            code = msg.get("code")
-            lobby = lobby_manager.get_lobby(code)
+        elif isinstance(command, Join):
+            code = command.code
+            lobby = await lobby_manager.join_lobby(code, player)
             if lobby:
-                await lobby.connect(player)
-                await websocket.send_json({"type": "LOBBY_JOINED", "code": code})
-            else:
-                await websocket.send_json({"type": "ERROR", "msg": "Lobby not found"})
-                await websocket.close()
+                player.send({
+                    "type": "LOBBY_JOINED", "code": code,
+                    "token": lobby_manager.issue_resume_token(player), "seq": lobby.event_seq,
+                })
+            elif code:
+                link = await lobby_manager.join_remote(code, player)
+            if not lobby and not link:
+                await player.close({"type": "ERROR", "msg": "Lobby not found"})
                 return
 
         # Main Loop for this connection
         if lobby:
             while True:
-                data = await websocket.receive_text()
                 # Handle Game Inputs here
-                msg = json.loads(data)
-                if msg.get("command") == "GAME_INPUT":
-                    # We need access to the game session. 
-                    # For MVP, assume lobby has a 'game_session' attribute or we attach it.
-                    # Let's make sure Lobby tracks the session.
-                    if hasattr(lobby, "game_session") and lobby.game_session:
-                        await lobby.game_session.handle_input(player, msg.get("input"))
-                    else:
-                        # Temporary: If no session, Create one? strictly host should start.
-                        pass
-                elif msg.get("command") == "START_GAME" and player.is_host:
-                     session = GameSession(lobby)
-                     lobby.game_session = session # Attach to lobby
-                     asyncio.create_task(session.start_game())
+                await handle_command(lobby, player, await next_command(websocket, limiter, codec, player))
+        elif link:
+            while True:
+                command = await next_command(websocket, limiter, codec, player)
+                await link.forward(command.model_dump(exclude_none=True))
 
     except WebSocketDisconnect:
-        if lobby and player:
-            lobby.disconnect(player)
+        if lobby and player and player.websocket is websocket:
+            lobby_manager.suspend(player) # Held for a resume, then removed
+        if link:
+            await link.close()
+    except FrameTooLarge:
+        # Abusive or broken client: no resume slot, just go
+        if lobby and player and player.websocket is websocket:
+            lobby_manager.leave_lobby(player)
+        if link:
+            await link.close()
+        try:
+            await websocket.close(code=1009) # Message too big
+        except Exception:
+            pass
+    finally:
+        if player and player.websocket is websocket and not player.suspended:
+            lobby_manager.unregister_connection(player)
@@ -0,0 +1,223 @@
+"""
+In-process metrics in the Prometheus text format, served at /metrics.
+
+Hot-path hooks are a dict lookup plus an integer add (counters) or a bisect
+into a short bucket list (histograms); nothing allocates per observation and
+nothing is formatted until a scrape. Values that already live elsewhere
+(lobby counts, pool stats) are read by callbacks at scrape time instead of
+being tracked twice.
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+# Seconds. Covers a sub-millisecond fan-out up to a slow bcrypt or DB call.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+ROUND_BUCKETS = (1.0, 2.5, 5.0, 10.0, 15.0, 20.0, 25.0, 30.0, 45.0, 60.0)
+
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "false").lower() in ("1", "true", "yes")
+PROFILER_TOKEN = os.getenv("PROFILER_TOKEN", "") # Sent as X-Profiler-Token; the endpoints stay off without one
+PROFILER_INTERVAL = float(os.getenv("PROFILER_INTERVAL", "0.01")) # Seconds between stack samples
+PROFILER_MAX_DEPTH = 64
+
+Labels = Optional[str]
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+class _Metric(ABC):
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, label: Optional[str] = None):
+        self.name = name
+        self.help = help
+        self.label = label # At most one label; its values must be a small, fixed set
+        REGISTRY.append(self)
+
+    def _selector(self, value: Labels, extra: str = "") -> str:
+        parts = [f'{self.label}="{_escape(value)}"'] if self.label and value is not None else []
+        if extra:
+            parts.append(extra)
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+    @abstractmethod
+    def samples(self) -> List[str]:
+        """Sample lines in the exposition format, without HELP/TYPE."""
+        pass
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines += self.samples()
+        return "\n".join(lines)
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, label: Optional[str] = None):
+        super().__init__(name, help, label)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, label: Labels = None, amount: float = 1):
+        values = self._values
+        values[label] = values.get(label, 0) + amount
+
+    def value(self, label: Labels = None) -> float:
+        return self._values.get(label, 0)
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{self._selector(label)} {value}" for label, value in list(self._values.items())]
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, label: Optional[str] = None,
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, help, label)
+        self._buckets = tuple(sorted(buckets))
+        self._series: Dict[Labels, list] = {} # label -> [per-bucket counts (last is +Inf), sum]
+
+    def observe(self, value: float, label: Labels = None):
+        series = self._series.get(label)
+        if series is None:
+            series = self._series[label] = [[0] * (len(self._buckets) + 1), 0.0]
+        series[0][bisect_left(self._buckets, value)] += 1
+        series[1] += value
+
+    def time(self, label: Labels = None) -> "_Timer":
+        return _Timer(self, label)
+
+    def samples(self) -> List[str]:
+        lines = []
+        for label, (counts, total) in list(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self._buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{self._selector(label, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{self._selector(label)} {total}")
+            lines.append(f"{self.name}_count{self._selector(label)} {cumulative}")
+        return lines
+
+class _Timer:
+    """Context manager observing elapsed perf_counter seconds into a histogram."""
+    __slots__ = ("_histogram", "_label", "_started")
+
+    def __init__(self, histogram: Histogram, label: Labels):
+        self._histogram = histogram
+        self._label = label
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._histogram.observe(time.perf_counter() - self._started, self._label)
+
+class Callback(_Metric):
+    """A gauge or counter read from existing state at scrape time."""
+    def __init__(self, name: str, help: str, fn: Callable[[], Union[float, Dict[str, float]]],
+                 label: Optional[str] = None, kind: str = "gauge"):
+        super().__init__(name, help, label)
+        self.kind = kind
+        self._fn = fn
+
+    def samples(self) -> List[str]:
+        try:
+            value = self._fn()
+        except Exception:
+            return [] # A broken source shouldn't take the whole scrape down
+        if isinstance(value, dict):
+            return [f"{self.name}{self._selector(label)} {v}" for label, v in value.items()]
+        return [f"{self.name} {value}"]
+
+REGISTRY: List[_Metric] = []
+
+def render() -> str:
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+# --- Hot-path instruments (the owning modules call these) ---
+
+ws_messages_in = Counter("eduparty_ws_messages_in_total", "WebSocket frames received, by command.", "type")
+ws_messages_out = Counter("eduparty_ws_messages_out_total", "WebSocket messages queued to clients, by type.", "type")
+broadcast_seconds = Histogram(
+    "eduparty_broadcast_seconds", "Time from a lobby broadcast to the last recipient's completed send."
+)
+input_latency_seconds = Histogram(
+    "eduparty_input_latency_seconds", "GAME_INPUT receipt to its verdict (includes the batch window)."
+)
+round_seconds = Histogram("eduparty_round_seconds", "Round duration.", buckets=ROUND_BUCKETS)
+hash_seconds = Histogram(
+    "eduparty_auth_hash_seconds", "Password hash/verify time including pool queueing.", "op",
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+db_query_seconds = Histogram("eduparty_db_query_seconds", "SQL statement execution time, by verb.", "verb")
+
+# --- Sampling profiler ---
+
+class SamplingProfiler:
+    """
+    Samples the event-loop thread's stack from a background thread and
+    tallies collapsed stacks ("a;b;c count", the flamegraph input format).
+    Costs nothing while stopped; while running, one sys._current_frames()
+    walk per interval.
+    """
+    def __init__(self, interval: float = PROFILER_INTERVAL):
+        self.interval = interval
+        self._target: Optional[int] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._stacks: Dict[str, int] = {}
+        self._stacks_lock = threading.Lock() # The sampler adds stacks while the loop reads them
+        self.samples = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self, thread_id: Optional[int] = None):
+        """Profile the given thread (default: the caller's, i.e. the event loop)."""
+        if self._thread is not None:
+            return
+        self._target = thread_id or threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    async def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            await asyncio.to_thread(self._thread.join) # Up to one in-progress sample; not on the loop
+            self._thread = None
+
+    def reset(self):
+        with self._stacks_lock:
+            self._stacks.clear()
+            self.samples = 0
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None and len(stack) < PROFILER_MAX_DEPTH:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            key = ";".join(reversed(stack))
+            with self._stacks_lock:
+                self._stacks[key] = self._stacks.get(key, 0) + 1
+                self.samples += 1
+
+    def collapsed(self, limit: Optional[int] = None) -> str:
+        with self._stacks_lock:
+            stacks = list(self._stacks.items())
+        stacks.sort(key=lambda item: item[1], reverse=True)
+        return "".join(f"{stack} {count}\n" for stack, count in stacks[:limit])
+
+profiler = SamplingProfiler()
@@ -6,8 +6,9 @@ class BaseGame(ABC):
     Enforces a strict interface for starting, updating, and scoring.
     """
     
-    def __init__(self, difficulty: int = 1):
+    def __init__(self, difficulty: int = 1, deck=None):
         self._difficulty = difficulty
+        self._deck = deck # Lobby's question_bank.Deck, for games that draw questions
         self._is_completed = False
         
     @property
@@ -33,11 +34,23 @@ class BaseGame(ABC):
         """Process player input. Return True if input was valid/correct."""
         pass
 
+    def process_batch(self, player_ids: list, inputs: list) -> list:
+        """Validate many inputs at once. Override for a faster bulk check."""
+        return [self.process_input(pid, data) for pid, data in zip(player_ids, inputs)]
+
     @abstractmethod
     def check_win_condition(self, player_id: str) -> bool:
         """Check if a specific player has met the win criteria."""
         pass
 
+    def snapshot(self) -> dict:
+        """JSON-serializable round state (e.g. the current question), for lobby snapshots."""
+        return {}
+
+    def restore(self, state: dict):
+        """Put back what snapshot() returned, after a restart."""
+        pass
+
     def finish_game(self):
         """Mark game as done."""
         self._is_completed = True
@@ -1,30 +1,32 @@
+from typing import Optional
 from .base import BaseGame
-import random
+from .question_bank import Deck, question_bank
 
 class MathGame(BaseGame):
-    def __init__(self, difficulty: int = 1):
-        super().__init__(difficulty)
+    def __init__(self, difficulty: int = 1, deck: Optional[Deck] = None):
+        # Pass the lobby's deck to avoid repeats
+        super().__init__(difficulty, deck or Deck(question_bank))
         self.problem = ""
         self.answer = 0
         self._generate_problem()
 
     def _generate_problem(self):
-        if self._difficulty == 1:
-            a, b = random.randint(1, 10), random.randint(1, 10)
-            self.problem = f"{a} + {b}"
-            self.answer = a + b
-        elif self._difficulty == 2:
-            a, b = random.randint(10, 50), random.randint(1, 10)
-            self.problem = f"{a} - {b}"
-            self.answer = a - b
-        else:
-            a, b = random.randint(5, 12), random.randint(5, 12)
-            self.problem = f"{a} * {b}"
-            self.answer = a * b
+        question = self._deck.draw("math", self._difficulty)
+        self.problem = question.text
+        self.answer = question.answer
+        self._answer_text = str(question.answer)
 
     def get_instructions(self) -> str:
         return f"Solve the math problem: {self.problem}"
 
+    def snapshot(self) -> dict:
+        return {"problem": self.problem, "answer": self.answer}
+
+    def restore(self, state: dict):
+        self.problem = state["problem"]
+        self.answer = state["answer"]
+        self._answer_text = str(self.answer)
+
     def start_game(self):
         # Logic to start timer?
         pass
@@ -33,9 +35,17 @@ class MathGame(BaseGame):
         try:
             val = int(input_data)
             return val == self.answer
-        except:
+        except (TypeError, ValueError):
             return False
 
+    def process_batch(self, player_ids: list, inputs: list) -> list:
+        # Canonical correct answers match as plain strings without parsing
+        expected = self._answer_text
+        return [
+            data == expected or self.process_input(pid, data)
+            for pid, data in zip(player_ids, inputs)
+        ]
+
     def check_win_condition(self, player_id: str) -> bool:
         # In "First to Score", this might just return True if they got it right
         return False
@@ -0,0 +1,198 @@
+import mmap
+import os
+import random
+import struct
+from array import array
+from math import gcd
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+# Pre-generated problem pools, stored as int32 columns in one binary file and
+# memory-mapped at startup. Every lobby shares the same read-only pages.
+QUESTION_BANK_PATH = os.getenv(
+    "QUESTION_BANK_PATH", os.path.join(os.path.dirname(__file__), "question_bank.bin")
+)
+
+_MAGIC = b"EDQB"
+_VERSION = 1
+_FILE_HEADER = struct.Struct("<4sHH")          # magic, version, pool count
+_POOL_HEADER = struct.Struct("<16s16sBcII")    # game, topic, difficulty, op, count, offset
+_RECORD_INTS = 3                               # a, b, answer
+_ALIGN = 8
+
+class Question(NamedTuple):
+    a: int
+    op: str
+    b: int
+    answer: int
+
+    @property
+    def text(self) -> str:
+        return f"{self.a} {self.op} {self.b}"
+
+class PoolSpec(NamedTuple):
+    game: str
+    topic: str
+    difficulty: int
+    op: str
+    a_range: Tuple[int, int]
+    b_range: Tuple[int, int]
+
+# Same ranges MathGame has always used, enumerated exhaustively
+MATH_POOLS = [
+    PoolSpec("math", "addition", 1, "+", (1, 10), (1, 10)),
+    PoolSpec("math", "subtraction", 2, "-", (10, 50), (1, 10)),
+    PoolSpec("math", "multiplication", 3, "*", (5, 12), (5, 12)),
+]
+
+_OPS = {
+    "+": lambda a, b: a + b,
+    "-": lambda a, b: a - b,
+    "*": lambda a, b: a * b,
+}
+
+class QuestionPool:
+    """One (game, difficulty) pool backed by a flat int32 view."""
+    def __init__(self, game: str, topic: str, difficulty: int, op: str, data: memoryview):
+        self.game = game
+        self.topic = topic
+        self.difficulty = difficulty
+        self.op = op
+        self._data = data
+
+    def __len__(self) -> int:
+        return len(self._data) // _RECORD_INTS
+
+    def question(self, index: int) -> Question:
+        base = index * _RECORD_INTS
+        data = self._data
+        return Question(data[base], self.op, data[base + 1], data[base + 2])
+
+class QuestionBank:
+    def __init__(self):
+        self._pools: Dict[Tuple[str, int], QuestionPool] = {}
+        self._by_topic: Dict[Tuple[str, str], List[QuestionPool]] = {}
+        self._mmap: Optional[mmap.mmap] = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._mmap is not None
+
+    def load(self, path: str = QUESTION_BANK_PATH):
+        """Map the bank file, generating it first if missing or outdated."""
+        if self.is_loaded:
+            return
+        if not _is_current(path):
+            build_bank_file(path)
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+        _, _, pool_count = _FILE_HEADER.unpack_from(view, 0)
+        for i in range(pool_count):
+            game, topic, difficulty, op, count, offset = _POOL_HEADER.unpack_from(
+                view, _FILE_HEADER.size + i * _POOL_HEADER.size
+            )
+            data = view[offset:offset + count * _RECORD_INTS * 4].cast("i")
+            pool = QuestionPool(_name(game), _name(topic), difficulty, op.decode(), data)
+            self._pools[(pool.game, difficulty)] = pool
+            self._by_topic.setdefault((pool.game, pool.topic), []).append(pool)
+
+    def pool(self, game: str, difficulty: int) -> QuestionPool:
+        """Pool for a difficulty, clamped to the hardest one available."""
+        if not self.is_loaded:
+            self.load()
+        pool = self._pools.get((game, difficulty))
+        if pool is None:
+            levels = [d for g, d in self._pools if g == game]
+            if not levels:
+                raise KeyError(f"No question pools for game '{game}'")
+            pool = self._pools[(game, min(max(levels), max(difficulty, min(levels))))]
+        return pool
+
+    def topic_pools(self, game: str, topic: str) -> List[QuestionPool]:
+        if not self.is_loaded:
+            self.load()
+        return self._by_topic.get((game, topic), [])
+
+class Deck:
+    """
+    Per-lobby draw order over shared pools: each pool is walked with a random
+    start and a stride coprime to its size, so nothing repeats until the
+    pool is exhausted, without copying or shuffling the pool.
+    """
+    def __init__(self, bank: QuestionBank, rng: Optional[random.Random] = None):
+        self._bank = bank
+        self._rng = rng or random.Random()
+        self._cursors: Dict[Tuple[str, int], List[int]] = {}  # key -> [next, stride]
+
+    def draw(self, game: str, difficulty: int) -> Question:
+        pool = self._bank.pool(game, difficulty)
+        size = len(pool)
+        key = (game, pool.difficulty)
+        cursor = self._cursors.get(key)
+        if cursor is None:
+            stride = self._rng.randrange(1, size) if size > 1 else 1
+            while gcd(stride, size) != 1:
+                stride += 1
+            cursor = self._cursors[key] = [self._rng.randrange(size), stride]
+        index = cursor[0]
+        cursor[0] = (index + cursor[1]) % size
+        return pool.question(index)
+
+    def cursors(self) -> List[List]:
+        """Draw positions as [game, difficulty, next, stride] rows, for lobby snapshots."""
+        return [[game, difficulty, *cursor] for (game, difficulty), cursor in self._cursors.items()]
+
+    def restore_cursors(self, rows: List[List]):
+        """Continue from saved positions, so a restored lobby doesn't repeat questions."""
+        self._cursors = {(game, difficulty): [index, stride] for game, difficulty, index, stride in rows}
+
+    def draw_batch(self, game: str, difficulty: int, count: int) -> List[Question]:
+        return [self.draw(game, difficulty) for _ in range(count)]
+
+def _name(raw: bytes) -> str:
+    return raw.rstrip(b"\0").decode()
+
+def _aligned(offset: int) -> int:
+    return (offset + _ALIGN - 1) & ~(_ALIGN - 1)
+
+def _is_current(path: str) -> bool:
+    try:
+        with open(path, "rb") as f:
+            magic, version, _ = _FILE_HEADER.unpack(f.read(_FILE_HEADER.size))
+    except (OSError, struct.error):
+        return False
+    return magic == _MAGIC and version == _VERSION
+
+def generate_pool(spec: PoolSpec) -> array:
+    compute = _OPS[spec.op]
+    records = array("i")
+    for a in range(spec.a_range[0], spec.a_range[1] + 1):
+        for b in range(spec.b_range[0], spec.b_range[1] + 1):
+            records.extend((a, b, compute(a, b)))
+    return records
+
+def build_bank_file(path: str = QUESTION_BANK_PATH, specs: List[PoolSpec] = MATH_POOLS):
+    """Generate every pool and write the bank file atomically."""
+    pools = [(spec, generate_pool(spec)) for spec in specs]
+    offset = _aligned(_FILE_HEADER.size + len(pools) * _POOL_HEADER.size)
+    headers = []
+    offsets = []
+    for spec, records in pools:
+        offsets.append(offset)
+        headers.append(_POOL_HEADER.pack(
+            spec.game.encode(), spec.topic.encode(), spec.difficulty,
+            spec.op.encode(), len(records) // _RECORD_INTS, offset,
+        ))
+        offset = _aligned(offset + len(records) * records.itemsize)
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_FILE_HEADER.pack(_MAGIC, _VERSION, len(pools)))
+        for header in headers:
+            f.write(header)
+        for (_, records), start in zip(pools, offsets):
+            f.write(b"\0" * (start - f.tell())) # Keep int32 columns aligned
+            f.write(records.tobytes())
+    os.replace(tmp_path, path)
+
+question_bank = QuestionBank()
@@ -0,0 +1,112 @@
+import importlib
+import inspect
+import pkgutil
+import random
+from importlib.metadata import entry_points
+from typing import Dict, List, Optional, Type
+from .base import BaseGame
+
+ENTRY_POINT_GROUP = "eduparty.minigames"
+
+# Modules in this package that never hold a minigame
+_NOT_GAMES = {"base", "registry", "question_bank"}
+
+class MinigameSpec:
+    """
+    Where a minigame lives and when to pick it. The class is imported on the
+    first load() and cached, so discovery itself never imports game code.
+    """
+    def __init__(self, name: str, target: str, weight: float = 1.0,
+                 min_difficulty: int = 1, max_difficulty: Optional[int] = None,
+                 entry_point=None):
+        self.name = name
+        self.target = target # "package.module" or "package.module:Class"
+        self.weight = weight
+        self.min_difficulty = min_difficulty
+        self.max_difficulty = max_difficulty
+        self._entry_point = entry_point
+        self._cls: Optional[Type[BaseGame]] = None
+
+    def accepts(self, difficulty: int) -> bool:
+        if difficulty < self.min_difficulty:
+            return False
+        return self.max_difficulty is None or difficulty <= self.max_difficulty
+
+    def load(self) -> Type[BaseGame]:
+        if self._cls is None:
+            if self._entry_point is not None:
+                cls = self._entry_point.load()
+            else:
+                module_name, _, class_name = self.target.partition(":")
+                module = importlib.import_module(module_name)
+                cls = getattr(module, class_name) if class_name else _find_game_class(module)
+            if not (inspect.isclass(cls) and issubclass(cls, BaseGame)):
+                raise TypeError(f"Minigame '{self.name}' is not a BaseGame subclass")
+            self._cls = cls
+        return self._cls
+
+def _find_game_class(module) -> Type[BaseGame]:
+    for obj in vars(module).values():
+        if (inspect.isclass(obj) and issubclass(obj, BaseGame)
+                and not inspect.isabstract(obj) and obj.__module__ == module.__name__):
+            return obj
+    raise LookupError(f"No BaseGame subclass in {module.__name__}")
+
+# Built-in catalog: metadata lives here so picking never needs an import
+CATALOG = [
+    MinigameSpec("math", f"{__package__}.math_game:MathGame", weight=1.0),
+]
+
+class MinigameRegistry:
+    def __init__(self, catalog: List[MinigameSpec] = CATALOG):
+        self._specs: Dict[str, MinigameSpec] = {spec.name: spec for spec in catalog}
+        self._discovered = False
+
+    @property
+    def names(self) -> List[str]:
+        return list(self._specs)
+
+    def register(self, spec: MinigameSpec):
+        self._specs[spec.name] = spec
+
+    def discover(self):
+        """Find minigames by package scan and entry points, without importing them."""
+        if self._discovered:
+            return
+        self._discovered = True
+        package = importlib.import_module(__package__)
+        known = {spec.target.partition(":")[0] for spec in self._specs.values()}
+        for module_info in pkgutil.iter_modules(package.__path__):
+            name = module_info.name
+            if name in _NOT_GAMES or module_info.ispkg:
+                continue
+            module_name = f"{__package__}.{name}"
+            if module_name not in known:
+                self.register(MinigameSpec(name, module_name))
+        for ep in entry_points(group=ENTRY_POINT_GROUP):
+            if ep.name not in self._specs:
+                self.register(MinigameSpec(ep.name, ep.value, entry_point=ep))
+
+    def get(self, name: str) -> Type[BaseGame]:
+        return self._specs[name].load()
+
+    def name_of(self, cls: Type[BaseGame]) -> str:
+        """Registered name of a loaded minigame class (what get() takes back)."""
+        for name, spec in self._specs.items():
+            if spec._cls is cls:
+                return name
+        raise LookupError(f"{cls.__name__} is not a registered minigame")
+
+    def pick(self, difficulty: int, rng: Optional[random.Random] = None) -> Type[BaseGame]:
+        """Weighted choice among minigames that accept this difficulty."""
+        if not self._discovered:
+            self.discover()
+        eligible = [spec for spec in self._specs.values() if spec.accepts(difficulty) and spec.weight > 0]
+        if not eligible:
+            raise LookupError(f"No minigame for difficulty {difficulty}")
+        if len(eligible) == 1:
+            return eligible[0].load()
+        spec = (rng or random).choices(eligible, weights=[s.weight for s in eligible])[0]
+        return spec.load()
+
+minigame_registry = MinigameRegistry()
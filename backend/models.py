@@ -19,7 +19,7 @@ class GameStat(Base):
     __tablename__ = "game_stats"
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), unique=True) # One running tally per user
     wins: Mapped[int] = mapped_column(Integer, default=0)
     total_games: Mapped[int] = mapped_column(Integer, default=0)
     
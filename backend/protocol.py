@@ -0,0 +1,351 @@
+"""
+WebSocket wire formats.
+
+Clients pick a format with the Sec-WebSocket-Protocol header at connect:
+  - "eduparty.json" (or no header): JSON text frames, as before.
+  - "eduparty.bin.v1": binary frames = 1 byte message-type code followed by
+    the remaining fields as a MessagePack map.
+
+Inbound frames are decoded by frame kind (text -> JSON, bytes -> binary), so
+a binary client may still send JSON text. The pygame client imports this
+module (frontend/protocol.py); keep MESSAGE_CODES in sync with
+web_client/protocol.js.
+
+Tradeoff: binary frames are roughly half the size of JSON, but the encoder
+is pure Python. Short messages (ROUND_START, PING) encode faster than with
+json.dumps; a large int-heavy one like a 10-row ANSWER_BATCH takes about
+1.5x as long as the C JSON encoder. Broadcasts are encoded once per format
+and the frame is shared by every recipient (EncodedMessage), so that extra
+cost is paid per broadcast while the bytes saved are per recipient. Measure
+with `python -m benchmarks.codec`.
+"""
+import json
+import struct
+from typing import Dict, Iterable, Union
+
+SUBPROTOCOL_JSON = "eduparty.json"
+SUBPROTOCOL_BINARY = "eduparty.bin.v1"
+
+Frame = Union[str, bytes]
+
+# Server -> client "type" values and client -> server "command" values.
+# Code 0 means "not in the table": the name travels inside the map instead.
+MESSAGE_CODES: Dict[str, int] = {
+    "PLAYER_LIST": 1,
+    "LOBBY_CREATED": 2,
+    "LOBBY_JOINED": 3,
+    "GAME_START": 4,
+    "ROUND_START": 5,
+    "ROUND_END": 6,
+    "gamestate": 7,
+    "ELIMINATED": 8,
+    "LOGIC_CHECK": 9,
+    "GAME_OVER": 10,
+    "ERROR": 11,
+    "PLAYER_JOINED": 12,
+    "PLAYER_LEFT": 13,
+    "ANSWER_BATCH": 14,
+    "PING": 15,
+    "RESUMED": 16,
+    "PLAYER_STATUS": 17,
+    "REJECTED": 18,
+    "SPECTATE_SNAPSHOT": 19,
+    "SPECTATE_DELTA": 20,
+    "CREATE": 64,
+    "JOIN": 65,
+    "START_GAME": 66,
+    "GAME_INPUT": 67,
+    "PONG": 68,
+    "RESUME": 69,
+    "SPECTATE": 70,
+}
+MESSAGE_NAMES: Dict[int, str] = {code: name for name, code in MESSAGE_CODES.items()}
+COMMAND_CODE_MIN = 64 # Codes at or above this are client commands
+
+class ProtocolError(ValueError):
+    """Raised for frames that can't be decoded."""
+    pass
+
+# --- MessagePack subset: nil, bool, int, float, str, bin, array, map ---
+
+_PACK_BB = struct.Struct(">BB").pack
+_PACK_BH = struct.Struct(">BH").pack
+_PACK_BI = struct.Struct(">BI").pack
+
+def _pack(obj, out: bytearray):
+    # Exact-type checks for what game messages are made of (small ints,
+    # short strings, lists, bools), most common first; anything else goes
+    # through the general isinstance chain in _pack_other.
+    kind = type(obj)
+    if kind is int:
+        if 0 <= obj < 0x80:
+            out.append(obj)
+        elif 0 < obj <= 0xFF:
+            out += _PACK_BB(0xCC, obj)
+        elif 0 < obj <= 0xFFFF:
+            out += _PACK_BH(0xCD, obj)
+        elif 0 < obj <= 0xFFFFFFFF:
+            out += _PACK_BI(0xCE, obj)
+        else:
+            _pack_int(obj, out)
+    elif kind is list:
+        _pack_array(obj, out)
+    elif kind is str:
+        data = obj.encode()
+        size = len(data)
+        if size < 32:
+            out.append(0xA0 | size)
+            out += data
+        else:
+            _pack_other(obj, out)
+    elif obj is None:
+        out.append(0xC0)
+    elif obj is True:
+        out.append(0xC3)
+    elif obj is False:
+        out.append(0xC2)
+    else:
+        _pack_other(obj, out)
+
+def _pack_int(obj: int, out: bytearray):
+    if 0 <= obj < 0x80:
+        out.append(obj)
+    elif -32 <= obj < 0:
+        out.append(obj & 0xFF)
+    elif 0 <= obj <= 0xFF:
+        out += _PACK_BB(0xCC, obj)
+    elif 0 <= obj <= 0xFFFF:
+        out += _PACK_BH(0xCD, obj)
+    elif 0 <= obj <= 0xFFFFFFFF:
+        out += _PACK_BI(0xCE, obj)
+    elif obj > 0:
+        out += struct.pack(">BQ", 0xCF, obj)
+    elif obj >= -0x80:
+        out += struct.pack(">Bb", 0xD0, obj)
+    elif obj >= -0x8000:
+        out += struct.pack(">Bh", 0xD1, obj)
+    elif obj >= -0x80000000:
+        out += struct.pack(">Bi", 0xD2, obj)
+    else:
+        out += struct.pack(">Bq", 0xD3, obj)
+
+def _pack_array(obj, out: bytearray):
+    size = len(obj)
+    if size < 16:
+        out.append(0x90 | size)
+    elif size <= 0xFFFF:
+        out += _PACK_BH(0xDC, size)
+    else:
+        out += _PACK_BI(0xDD, size)
+    for item in obj:
+        _pack(item, out)
+
+def _pack_other(obj, out: bytearray):
+    if obj is None:
+        out.append(0xC0)
+    elif obj is True:
+        out.append(0xC3)
+    elif obj is False:
+        out.append(0xC2)
+    elif isinstance(obj, int):
+        _pack_int(obj, out)
+    elif isinstance(obj, float):
+        out += struct.pack(">Bd", 0xCB, obj)
+    elif isinstance(obj, str):
+        data = obj.encode()
+        size = len(data)
+        if size < 32:
+            out.append(0xA0 | size)
+        elif size <= 0xFF:
+            out += _PACK_BB(0xD9, size)
+        elif size <= 0xFFFF:
+            out += _PACK_BH(0xDA, size)
+        else:
+            out += _PACK_BI(0xDB, size)
+        out += data
+    elif isinstance(obj, (bytes, bytearray)):
+        size = len(obj)
+        if size <= 0xFF:
+            out += _PACK_BB(0xC4, size)
+        elif size <= 0xFFFF:
+            out += _PACK_BH(0xC5, size)
+        else:
+            out += _PACK_BI(0xC6, size)
+        out += obj
+    elif isinstance(obj, (list, tuple)):
+        _pack_array(obj, out)
+    elif isinstance(obj, dict):
+        _pack_map(obj.items(), len(obj), out)
+    else:
+        raise ProtocolError(f"Cannot encode {type(obj).__name__}")
+
+def _pack_map(items: Iterable, size: int, out: bytearray):
+    if size < 16:
+        out.append(0x80 | size)
+    elif size <= 0xFFFF:
+        out += struct.pack(">BH", 0xDE, size)
+    else:
+        out += struct.pack(">BI", 0xDF, size)
+    for key, value in items:
+        _pack(key, out)
+        _pack(value, out)
+
+# Fixed-width formats: type byte -> (struct format, payload size)
+_FIXED = {
+    0xCA: (">f", 4), 0xCB: (">d", 8),
+    0xCC: (">B", 1), 0xCD: (">H", 2), 0xCE: (">I", 4), 0xCF: (">Q", 8),
+    0xD0: (">b", 1), 0xD1: (">h", 2), 0xD2: (">i", 4), 0xD3: (">q", 8),
+}
+_LENGTH = {
+    0xC4: (">B", 1), 0xC5: (">H", 2), 0xC6: (">I", 4),   # bin
+    0xD9: (">B", 1), 0xDA: (">H", 2), 0xDB: (">I", 4),   # str
+    0xDC: (">H", 2), 0xDD: (">I", 4),                    # array
+    0xDE: (">H", 2), 0xDF: (">I", 4),                    # map
+}
+
+# Legitimate messages nest three levels at most; this bounds recursion on hostile input
+MAX_DEPTH = 32
+
+def _unpack(data: bytes, pos: int, depth: int = 0):
+    tag = data[pos]
+    pos += 1
+    if tag < 0x80:
+        return tag, pos
+    if tag >= 0xE0:
+        return tag - 0x100, pos
+    if 0xA0 <= tag <= 0xBF:
+        end = pos + (tag & 0x1F)
+        if end > len(data):
+            raise ProtocolError("Truncated frame")
+        return data[pos:end].decode(), end
+    if 0x90 <= tag <= 0x9F:
+        return _unpack_array(data, pos, tag & 0x0F, depth)
+    if 0x80 <= tag <= 0x8F:
+        return _unpack_map(data, pos, tag & 0x0F, depth)
+    if tag == 0xC0:
+        return None, pos
+    if tag == 0xC2:
+        return False, pos
+    if tag == 0xC3:
+        return True, pos
+    if tag in _FIXED:
+        fmt, size = _FIXED[tag]
+        return struct.unpack_from(fmt, data, pos)[0], pos + size
+    if tag in _LENGTH:
+        fmt, size = _LENGTH[tag]
+        length = struct.unpack_from(fmt, data, pos)[0]
+        pos += size
+        if tag in (0xDC, 0xDD):
+            return _unpack_array(data, pos, length, depth)
+        if tag in (0xDE, 0xDF):
+            return _unpack_map(data, pos, length, depth)
+        end = pos + length
+        if end > len(data):
+            raise ProtocolError("Truncated frame")
+        chunk = data[pos:end]
+        return (chunk.decode() if tag >= 0xD9 else bytes(chunk)), end
+    raise ProtocolError(f"Unsupported type byte 0x{tag:02x}")
+
+def _unpack_array(data: bytes, pos: int, size: int, depth: int):
+    if depth >= MAX_DEPTH:
+        raise ProtocolError("Frame nested too deeply")
+    items = []
+    for _ in range(size):
+        item, pos = _unpack(data, pos, depth + 1)
+        items.append(item)
+    return items, pos
+
+def _unpack_map(data: bytes, pos: int, size: int, depth: int):
+    if depth >= MAX_DEPTH:
+        raise ProtocolError("Frame nested too deeply")
+    result = {}
+    for _ in range(size):
+        key, pos = _unpack(data, pos, depth + 1)
+        if not isinstance(key, (str, int)):
+            raise ProtocolError("Map keys must be strings or integers")
+        result[key], pos = _unpack(data, pos, depth + 1)
+    return result, pos
+
+# --- Codecs ---
+
+class JsonCodec:
+    name = SUBPROTOCOL_JSON
+
+    def encode(self, message: dict) -> str:
+        return json.dumps(message, separators=(",", ":"))
+
+    def decode(self, data: str) -> dict:
+        message = json.loads(data)
+        if not isinstance(message, dict):
+            raise ProtocolError("Frame is not an object")
+        return message
+
+class BinaryCodec:
+    name = SUBPROTOCOL_BINARY
+
+    def encode(self, message: dict) -> bytes:
+        name = message.get("type") or message.get("command")
+        code = MESSAGE_CODES.get(name, 0)
+        out = bytearray((code,))
+        if code:
+            key = "command" if code >= COMMAND_CODE_MIN else "type"
+            fields = [(k, v) for k, v in message.items() if k != key]
+        else:
+            fields = list(message.items())
+        _pack_map(fields, len(fields), out)
+        return bytes(out)
+
+    def decode(self, data: bytes) -> dict:
+        if not data:
+            raise ProtocolError("Empty frame")
+        try:
+            message, end = _unpack(data, 1)
+        except (IndexError, struct.error, UnicodeDecodeError) as exc:
+            raise ProtocolError(str(exc)) from exc
+        if not isinstance(message, dict):
+            raise ProtocolError("Frame is not a map")
+        if end != len(data):
+            raise ProtocolError("Trailing bytes after the message")
+        code = data[0]
+        if code:
+            name = MESSAGE_NAMES.get(code)
+            if name is None:
+                raise ProtocolError(f"Unknown message code {code}")
+            message["command" if code >= COMMAND_CODE_MIN else "type"] = name
+        return message
+
+JSON_CODEC = JsonCodec()
+BINARY_CODEC = BinaryCodec()
+CODECS = {codec.name: codec for codec in (JSON_CODEC, BINARY_CODEC)}
+
+class EncodedMessage:
+    """A message encoded at most once per wire format, then reused as-is."""
+    __slots__ = ("message", "_frames")
+
+    def __init__(self, message: dict):
+        self.message = message
+        self._frames = {}
+
+    def frame(self, codec) -> Frame:
+        frame = self._frames.get(codec)
+        if frame is None:
+            frame = self._frames[codec] = codec.encode(self.message)
+        return frame
+
+def negotiate(offered: Iterable[str]):
+    """Pick the codec for a connection from the client's offered subprotocols."""
+    offered = list(offered)
+    if SUBPROTOCOL_BINARY in offered:
+        return BINARY_CODEC
+    return JSON_CODEC
+
+def decode_frame(data: Frame) -> dict:
+    """Decode an inbound frame according to its kind (text or binary); only raises ProtocolError."""
+    try:
+        if isinstance(data, (bytes, bytearray)):
+            return BINARY_CODEC.decode(bytes(data))
+        return JSON_CODEC.decode(data)
+    except ProtocolError:
+        raise
+    except (ValueError, TypeError, RecursionError) as exc: # Malformed JSON, deep nesting (e.g. "[[[[...")
+        raise ProtocolError(str(exc) or type(exc).__name__) from exc
@@ -0,0 +1,56 @@
+import os
+import time
+from .metrics import Counter
+
+# Per-connection inbound limits. A client sending faster than WS_RATE_LIMIT
+# frames/second (after a WS_RATE_BURST allowance) has the excess dropped
+# before it is even decoded; frames over WS_MAX_FRAME_BYTES end the session.
+WS_RATE_LIMIT = float(os.getenv("WS_RATE_LIMIT", "20")) # 0 disables throttling
+WS_RATE_BURST = float(os.getenv("WS_RATE_BURST", "40"))
+WS_MAX_FRAME_BYTES = int(os.getenv("WS_MAX_FRAME_BYTES", "8192"))
+
+ws_frames_dropped = Counter("eduparty_ws_frames_dropped_total", "Inbound frames refused, by reason.", "reason")
+
+class FrameTooLarge(Exception):
+    """An inbound frame exceeded WS_MAX_FRAME_BYTES; the connection is closed."""
+    pass
+
+class TokenBucket:
+    """Classic token bucket; refilled lazily on each check, so idle connections cost nothing."""
+    __slots__ = ("rate", "burst", "_tokens", "_updated")
+
+    def __init__(self, rate: float = WS_RATE_LIMIT, burst: float = WS_RATE_BURST):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+
+    def take(self) -> bool:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+class ConnectionLimiter:
+    """Admission check for every frame a socket receives."""
+    __slots__ = ("_bucket", "_max_frame", "throttled")
+
+    def __init__(self, rate: float = WS_RATE_LIMIT, burst: float = WS_RATE_BURST,
+                 max_frame: int = WS_MAX_FRAME_BYTES):
+        self._bucket = TokenBucket(rate, burst) if rate > 0 else None
+        self._max_frame = max_frame
+        self.throttled = 0
+
+    def admit(self, size: int) -> bool:
+        """False if the frame should be dropped; raises FrameTooLarge if the socket should go."""
+        if size > self._max_frame:
+            ws_frames_dropped.inc("oversize")
+            raise FrameTooLarge(size)
+        if self._bucket is not None and not self._bucket.take():
+            self.throttled += 1
+            ws_frames_dropped.inc("rate")
+            return False
+        return True
@@ -0,0 +1,228 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from sqlalchemy import select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from .database import AsyncSessionLocal
+from .models import GameStat, User, UserResponse
+from .user_cache import elo_leaderboard, profiles_written
+
+logger = logging.getLogger(__name__)
+
+RESULTS_QUEUE_SIZE = int(os.getenv("RESULTS_QUEUE_SIZE", "1024"))
+RESULTS_BATCH_SIZE = int(os.getenv("RESULTS_BATCH_SIZE", "50")) # Matches per transaction
+RESULTS_FLUSH_INTERVAL = float(os.getenv("RESULTS_FLUSH_INTERVAL", "1.0")) # Seconds to gather a batch
+RESULTS_RETRIES = 3
+RESULTS_RETRY_DELAY = 0.5 # Doubles on each retry
+RESULTS_SPOOL_PATH = os.getenv(
+    "RESULTS_SPOOL_PATH", os.path.join(os.path.dirname(__file__), "results_spool.jsonl")
+)
+
+ELO_K = 32
+_STOP = object() # Queued by stop(): the writer flushes its batch and exits
+
+class MatchResult(NamedTuple):
+    lobby_code: str
+    finished_at: float
+    placements: List[Tuple[int, int]] # (user_id, place); 1 is the winner, ties share a place
+
+def elo_deltas(ratings: Dict[int, float], placements: List[Tuple[int, int]], k: float = ELO_K) -> Dict[int, float]:
+    """
+    Multi-player ELO: every pair of players is scored as a head-to-head game
+    (win, loss or draw by place), and each player's total is scaled by
+    1/(n-1) so a match moves ratings about as much as a single 1v1 game.
+    """
+    n = len(placements)
+    deltas = {uid: 0.0 for uid, _ in placements}
+    if n < 2:
+        return deltas
+    scale = k / (n - 1)
+    for i, (uid_a, place_a) in enumerate(placements):
+        for uid_b, place_b in placements[i + 1:]:
+            expected_a = 1 / (1 + 10 ** ((ratings[uid_b] - ratings[uid_a]) / 400))
+            actual_a = 1.0 if place_a < place_b else 0.5 if place_a == place_b else 0.0
+            change = scale * (actual_a - expected_a)
+            deltas[uid_a] += change
+            deltas[uid_b] -= change
+    return deltas
+
+class ResultsWriter:
+    """
+    Write-behind persistence of finished games. submit() only enqueues, so
+    the game loop never waits on the database; a background task batches
+    queued matches into one transaction (game_stats UPSERT + ELO update).
+    Batches that still fail after retries are spooled to disk and replayed
+    on the next start.
+    """
+    def __init__(self, spool_path: str = RESULTS_SPOOL_PATH):
+        self._spool_path = spool_path
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.written = 0
+        self.failed_batches = 0
+        self.spooled = 0
+
+    def submit(self, result: MatchResult):
+        if not result.placements:
+            return
+        if self._queue is None:
+            self._spool([result]) # Writer not running (e.g. during shutdown)
+            return
+        try:
+            self._queue.put_nowait(result)
+        except asyncio.QueueFull:
+            self._spool([result])
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=RESULTS_QUEUE_SIZE)
+        backlog = await asyncio.to_thread(self._take_spool)
+        self._task = asyncio.create_task(self._run(backlog))
+
+    async def stop(self):
+        """Let the writer finish its batch and the queue, spooling them if the database is unavailable."""
+        queue, self._queue = self._queue, None # Results submitted from here on go straight to the spool
+        if self._task:
+            if not self._task.done():
+                await queue.put(_STOP) # Queued behind everything already submitted
+            try:
+                await self._task
+            except Exception:
+                logger.exception("Results writer failed")
+            self._task = None
+        if queue is not None:
+            remaining = []
+            while not queue.empty():
+                result = queue.get_nowait()
+                if result is not _STOP:
+                    remaining.append(result)
+            if remaining:
+                await self._write_or_spool(remaining)
+
+    async def _run(self, backlog: List[MatchResult]):
+        for start in range(0, len(backlog), RESULTS_BATCH_SIZE):
+            await self._write_or_spool(backlog[start:start + RESULTS_BATCH_SIZE])
+        queue = self._queue
+        stopping = False
+        while not stopping:
+            result = await queue.get()
+            if result is _STOP:
+                return
+            batch = [result]
+            deadline = time.monotonic() + RESULTS_FLUSH_INTERVAL
+            while len(batch) < RESULTS_BATCH_SIZE:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    result = await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if result is _STOP:
+                    stopping = True # Write what we gathered, then exit
+                    break
+                batch.append(result)
+            await self._write_or_spool(batch)
+
+    async def _write_or_spool(self, batch: List[MatchResult]):
+        delay = RESULTS_RETRY_DELAY
+        for attempt in range(RESULTS_RETRIES):
+            try:
+                updated = await self._write_batch(batch)
+                self.written += len(batch)
+                break
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.warning("Results batch failed (attempt %d/%d)", attempt + 1, RESULTS_RETRIES, exc_info=True)
+                if attempt + 1 < RESULTS_RETRIES:
+                    await asyncio.sleep(delay)
+                    delay *= 2
+        else:
+            self.failed_batches += 1
+            await asyncio.to_thread(self._spool, batch)
+            return
+
+        # Committed: serve the new ratings from memory from now on
+        await profiles_written(updated)
+        try:
+            await elo_leaderboard.refresh()
+        except Exception:
+            logger.warning("Leaderboard reload failed", exc_info=True)
+
+    async def _write_batch(self, batch: List[MatchResult]) -> List[UserResponse]:
+        """One transaction for the whole batch; returns the users it re-rated."""
+        user_ids = {uid for result in batch for uid, _ in result.placements}
+        async with AsyncSessionLocal() as session:
+            async with session.begin():
+                rows = (await session.execute(
+                    select(User.id, User.username, User.elo).where(User.id.in_(user_ids)).with_for_update()
+                )).all()
+                ratings: Dict[int, float] = {uid: elo for uid, _, elo in rows}
+                names = {uid: username for uid, username, _ in rows}
+
+                # Matches are applied in order so ELO compounds correctly
+                stats: Dict[int, List[int]] = {} # user_id -> [wins, games]
+                for result in batch:
+                    placements = [(uid, place) for uid, place in result.placements if uid in ratings]
+                    for uid, change in elo_deltas(ratings, placements).items():
+                        ratings[uid] += change
+                    for uid, place in placements:
+                        counts = stats.setdefault(uid, [0, 0])
+                        counts[0] += place == 1
+                        counts[1] += 1
+                if not stats:
+                    return []
+
+                await session.execute(
+                    update(User), [{"id": uid, "elo": round(ratings[uid])} for uid in stats]
+                )
+                insert = postgresql.insert if session.bind.dialect.name == "postgresql" else sqlite.insert
+                stmt = insert(GameStat).values([
+                    {"user_id": uid, "wins": wins, "total_games": games}
+                    for uid, (wins, games) in stats.items()
+                ])
+                await session.execute(stmt.on_conflict_do_update(
+                    index_elements=[GameStat.user_id],
+                    set_={
+                        "wins": GameStat.wins + stmt.excluded.wins,
+                        "total_games": GameStat.total_games + stmt.excluded.total_games,
+                    },
+                ))
+        return [UserResponse(id=uid, username=names[uid], elo=round(ratings[uid])) for uid in stats]
+
+    def _spool(self, batch: List[MatchResult]):
+        with open(self._spool_path, "a") as f:
+            for result in batch:
+                f.write(json.dumps(result) + "\n")
+        self.spooled += len(batch)
+        logger.error("Spooled %d match results to %s", len(batch), self._spool_path)
+
+    def _take_spool(self) -> List[MatchResult]:
+        """Read and remove the spool file; entries are retried (and re-spooled on failure)."""
+        try:
+            with open(self._spool_path) as f:
+                lines = f.readlines()
+            os.remove(self._spool_path)
+        except FileNotFoundError:
+            return []
+        results = []
+        for line in lines:
+            try:
+                lobby_code, finished_at, placements = json.loads(line)
+            except ValueError:
+                continue # Torn write from a crash mid-append
+            results.append(MatchResult(lobby_code, finished_at, [tuple(p) for p in placements]))
+        return results
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize() if self._queue else 0,
+            "written": self.written,
+            "failed_batches": self.failed_batches,
+            "spooled": self.spooled,
+        }
+
+results_writer = ResultsWriter()
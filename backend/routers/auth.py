@@ -4,31 +4,48 @@ from sqlalchemy.future import select
 from datetime import timedelta
 from ..database import get_db
 from ..models import User, UserCreate, UserLogin, Token, UserResponse
-from ..security import get_password_hash, verify_password, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
+from ..user_cache import user_cache, profiles_written
+from ..security import hashing_pool, HashPoolBusy, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
+def _busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Server busy, try again shortly",
+        headers={"Retry-After": "1"},
+    )
+
 @router.post("/register", response_model=UserResponse)
 async def register(user: UserCreate, db: AsyncSession = Depends(get_db)):
-    # Check existing
-    result = await db.execute(select(User).where(User.username == user.username))
-    if result.scalars().first():
+    # Check existing (cached names answer without a query)
+    if await user_cache.get_by_username(db, user.username):
         raise HTTPException(status_code=400, detail="Username already registered")
     
-    hashed_pw = get_password_hash(user.password)
+    try:
+        hashed_pw = await hashing_pool.hash(user.password)
+    except HashPoolBusy:
+        raise _busy()
     new_user = User(username=user.username, password_hash=hashed_pw)
     
     db.add(new_user)
     await db.commit()
     await db.refresh(new_user)
-    return new_user
+    profile = UserResponse.model_validate(new_user)
+    await profiles_written([profile])
+    return profile
 
 @router.post("/token", response_model=Token)
 async def login(user_data: UserLogin, db: AsyncSession = Depends(get_db)):
     result = await db.execute(select(User).where(User.username == user_data.username))
     user = result.scalars().first()
     
-    if not user or not verify_password(user_data.password, user.password_hash):
+    try:
+        valid = user is not None and await hashing_pool.verify(user_data.password, user.password_hash)
+    except HashPoolBusy:
+        raise _busy()
+    
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -37,6 +54,6 @@ async def login(user_data: UserLogin, db: AsyncSession = Depends(get_db)):
     
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+        data={"sub": user.username, "uid": user.id}, expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
@@ -0,0 +1,73 @@
+import hmac
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+from ..database import pool_stats
+from ..lobby_system import lobby_manager
+from ..metrics import Callback, PROFILER_ENABLED, PROFILER_TOKEN, profiler, render
+from ..results_writer import results_writer
+from ..security import hashing_pool, token_verifier
+from ..snapshot import lobby_snapshots
+from ..user_cache import user_cache
+
+router = APIRouter(tags=["metrics"])
+
+# State that's already tracked elsewhere is read at scrape time
+Callback("eduparty_active_lobbies", "Lobbies hosted by this worker.", lambda: len(lobby_manager.active_lobbies))
+Callback("eduparty_active_players", "Players in lobbies on this worker (including suspended).",
+         lambda: lobby_manager.stats()["active_players"])
+Callback("eduparty_connections", "Live WebSocket sessions on this worker.",
+         lambda: lobby_manager.stats()["connections"])
+Callback("eduparty_spectators", "Read-only observers attached to lobbies on this worker.",
+         lambda: lobby_manager.stats()["spectators"])
+Callback("eduparty_lobby_events_total", "Session and eviction counters from the lobby manager.",
+         lambda: {k: v for k, v in lobby_manager.stats().items()
+                  if k.startswith(("sessions_", "evictions_", "lobbies_", "players_"))
+                  or k in ("duplicate_sessions", "spectators_joined")},
+         label="event", kind="counter")
+Callback("eduparty_db_pool", "Connection pool occupancy and checkout waits.",
+         pool_stats, label="stat")
+Callback("eduparty_hash_pool_in_flight", "Password hash jobs running or queued.", lambda: hashing_pool.in_flight)
+Callback("eduparty_hash_pool_rejected_total", "Hash jobs refused with 429.", lambda: hashing_pool.rejected,
+         kind="counter")
+Callback("eduparty_results_writer", "Write-behind match results queue and totals.", results_writer.stats,
+         label="stat")
+Callback("eduparty_lobby_snapshots", "Lobby snapshot log size and totals.", lobby_snapshots.stats,
+         label="stat")
+Callback("eduparty_cache_hits_total", "Cache hits by cache.",
+         lambda: {"token": token_verifier.cache.hits, "user": user_cache.hits}, label="cache", kind="counter")
+Callback("eduparty_cache_misses_total", "Cache misses by cache.",
+         lambda: {"token": token_verifier.cache.misses, "user": user_cache.misses}, label="cache", kind="counter")
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(render(), media_type="text/plain; version=0.0.4")
+
+# Profiler control exists only when PROFILER_ENABLED and PROFILER_TOKEN are
+# set; every call must carry the token. It samples nothing until started.
+
+def _require_profiler(token: Optional[str]):
+    if not (PROFILER_ENABLED and PROFILER_TOKEN):
+        raise HTTPException(status_code=404, detail="Profiler disabled")
+    if token is None or not hmac.compare_digest(token.encode(), PROFILER_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Invalid profiler token")
+
+@router.post("/metrics/profiler/start")
+async def start_profiler(reset: bool = True, x_profiler_token: Optional[str] = Header(None)):
+    _require_profiler(x_profiler_token)
+    if reset:
+        profiler.reset()
+    profiler.start() # Handlers run on the event loop thread, which is what we want sampled
+    return {"running": True}
+
+@router.post("/metrics/profiler/stop")
+async def stop_profiler(x_profiler_token: Optional[str] = Header(None)):
+    _require_profiler(x_profiler_token)
+    await profiler.stop()
+    return {"running": False, "samples": profiler.samples}
+
+@router.get("/metrics/profiler", response_class=PlainTextResponse)
+async def profile(limit: int = 200, x_profiler_token: Optional[str] = Header(None)):
+    """Collapsed stacks, most frequent first; feed to flamegraph.pl or speedscope."""
+    _require_profiler(x_profiler_token)
+    return PlainTextResponse(profiler.collapsed(limit))
@@ -0,0 +1,29 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List
+from ..database import get_db
+from ..models import UserResponse
+from ..user_cache import user_cache, elo_leaderboard, LEADERBOARD_SIZE
+
+router = APIRouter(prefix="/users", tags=["users"])
+
+# Sessions connect lazily, so cache hits below never touch the database
+
+@router.get("/leaderboard", response_model=List[UserResponse])
+async def leaderboard(limit: int = Query(10, ge=1, le=LEADERBOARD_SIZE)):
+    await elo_leaderboard.refresh() # Only queries if a load failed or the board lost its tail
+    return elo_leaderboard.top(limit)
+
+@router.get("/by-name/{username}", response_model=UserResponse)
+async def profile_by_name(username: str, db: AsyncSession = Depends(get_db)):
+    user = await user_cache.get_by_username(db, username)
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
+
+@router.get("/{user_id}", response_model=UserResponse)
+async def profile(user_id: int, db: AsyncSession = Depends(get_db)):
+    user = await user_cache.get_by_id(db, user_id)
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
@@ -1,13 +1,23 @@
 from passlib.context import CryptContext
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
+import asyncio
+import hashlib
 import jwt
 import os
+import time
+from .cache import TTLCache
+from .metrics import hash_seconds
 
 # Configuration
 SECRET_KEY = os.getenv("SECRET_KEY", "super_secret_dev_key_123")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(os.cpu_count() or 2)))
+HASH_QUEUE_LIMIT = int(os.getenv("HASH_QUEUE_LIMIT", "64")) # Waiting jobs before we shed load
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "4096"))
+WS_REQUIRE_AUTH = os.getenv("WS_REQUIRE_AUTH", "false").lower() in ("1", "true", "yes")
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -17,6 +27,52 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+class HashPoolBusy(Exception):
+    """Raised when the hashing pool's queue is full; callers answer 429."""
+    pass
+
+class HashingPool:
+    """
+    Runs bcrypt off the event loop. The bcrypt C code releases the GIL, so a
+    thread pool gives real parallelism without pickling work to processes.
+    At most workers + queue_limit jobs are accepted; beyond that we refuse
+    immediately instead of letting a login storm queue up unbounded.
+    """
+    def __init__(self, workers: int = HASH_WORKERS, queue_limit: int = HASH_QUEUE_LIMIT):
+        self._workers = workers
+        self._limit = workers + queue_limit
+        self._in_flight = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.rejected = 0
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    async def _run(self, op: str, fn, *args):
+        if self._in_flight >= self._limit:
+            self.rejected += 1
+            raise HashPoolBusy()
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self._workers, thread_name_prefix="bcrypt")
+        self._in_flight += 1
+        try:
+            with hash_seconds.time(op):
+                return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self._in_flight -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run("hash", get_password_hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run("verify", verify_password, plain_password, hashed_password)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     if expires_delta:
@@ -27,3 +83,37 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     to_encode.update({"exp": expire})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
+
+def decode_access_token(token: str) -> dict:
+    """Check signature and expiry; raises jwt.PyJWTError if either fails."""
+    return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+
+class TokenVerifier:
+    """
+    Verified-claims cache for WebSocket handshakes. Entries are keyed by the
+    token's SHA-256 (raw tokens never sit in memory as keys) and expire with
+    the token itself, so reconnects skip signature checks and the database.
+    """
+    def __init__(self, maxsize: int = TOKEN_CACHE_SIZE):
+        self._cache = TTLCache(maxsize)
+
+    @property
+    def cache(self) -> TTLCache:
+        return self._cache
+
+    def verify(self, token: str) -> Optional[dict]:
+        """Claims for a valid token carrying a user id, else None."""
+        key = hashlib.sha256(token.encode()).digest()
+        claims = self._cache.get(key)
+        if claims is None:
+            try:
+                claims = decode_access_token(token)
+            except jwt.PyJWTError:
+                return None
+            if not isinstance(claims.get("uid"), int):
+                return None # Issued before tokens carried the user id
+            self._cache.set(key, claims, ttl=claims["exp"] - time.time())
+        return claims
+
+hashing_pool = HashingPool()
+token_verifier = TokenVerifier()
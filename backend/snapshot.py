@@ -0,0 +1,215 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Dict, List, Optional
+from .game_engine import GameSession
+from .lobby_system import LobbyManager, lobby_manager
+
+try:
+    import fcntl
+except ImportError: # Windows: no advisory locks, so overlapping processes aren't detected
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Lobby state survives a restart (e.g. a deploy) through an append-only JSON
+# Lines log: one record per lobby whenever it changed, the newest record per
+# code wins. On a host with an ephemeral filesystem point SNAPSHOT_PATH at a
+# persistent disk; an empty value turns snapshots off. Each log belongs to
+# one process, enforced with a lock file: sibling workers (uvicorn
+# --workers N) each take the next numbered log (lobby_snapshot.1.jsonl, ...),
+# while a log held by an older process, as in an overlapping deploy, is
+# waited for so that process can write its final state before we restore.
+SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH", os.path.join(os.path.dirname(__file__), "lobby_snapshot.jsonl"))
+SNAPSHOT_INTERVAL = float(os.getenv("SNAPSHOT_INTERVAL", "1.0")) # Seconds between incremental writes
+SNAPSHOT_MAX_AGE = float(os.getenv("SNAPSHOT_MAX_AGE", "600")) # Older records aren't restored
+SNAPSHOT_RESTORE_GRACE = float(os.getenv("SNAPSHOT_RESTORE_GRACE", "120")) # Seconds restored players have to RESUME
+SNAPSHOT_RESUME_WAIT = float(os.getenv("SNAPSHOT_RESUME_WAIT", "15")) # Max wait for them before a game carries on
+SNAPSHOT_LOCK_WAIT = float(os.getenv("SNAPSHOT_LOCK_WAIT", "60")) # Seconds to wait for a previous owner; then run without snapshots
+SNAPSHOT_COMPACT_LINES = 1000 # Rewrite the log once it holds more than this many records (and 4 per lobby)
+SNAPSHOT_VERSION = 1
+
+def _is_sibling(parent_pid: int) -> bool:
+    # Processes under init (or a container's PID 1) are unrelated deploys, not workers
+    return parent_pid > 1 and parent_pid == os.getppid()
+
+class LobbySnapshots:
+    """
+    Incremental snapshots of every lobby this worker hosts. A background
+    task appends a record for each lobby touched since its last one (and a
+    tombstone for removed lobbies); when the log grows past the compaction
+    threshold it is rewritten atomically with one record per live lobby.
+    On start, lobbies from a previous process are restored with their
+    players suspended, so clients get back in with their resume tokens,
+    and interrupted games carry on from the round they were in.
+    """
+    def __init__(self, manager: LobbyManager = lobby_manager, path: str = SNAPSHOT_PATH):
+        self._manager = manager
+        self._path = path # The numbered slot actually taken, once started
+        self._written: Dict[str, float] = {} # code -> lobby.last_activity when its record was written
+        self._lines = 0 # Records in the log file
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._lock_file = None # Held open (and flock'd) while we own the log
+        self.records_written = 0
+        self.compactions = 0
+        self.restored = 0
+
+    async def start(self):
+        if not self._path or not await self._acquire():
+            return
+        for state in await asyncio.to_thread(self._read):
+            await self._restore(state)
+        if self.restored:
+            logger.info("Restored %d lobbies from %s", self.restored, self._path)
+        await self.flush(compact=True) # Start from a fresh file with just what came back
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Write the final state; runs before the lobby manager stops."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            await self.flush()
+        self._release()
+
+    async def _acquire(self) -> bool:
+        """Lock a log for this process: the first free slot, waiting on ones an older process holds."""
+        if fcntl is None:
+            return True
+        base, ext = os.path.splitext(self._path)
+        deadline = time.monotonic() + SNAPSHOT_LOCK_WAIT
+        slot = 0
+        while True:
+            path = self._path if slot == 0 else f"{base}.{slot}{ext}"
+            lock_file = open(f"{path}.lock", "a+")
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock_file.seek(0)
+                holder = lock_file.read().split()
+                lock_file.close()
+                if len(holder) == 2 and _is_sibling(int(holder[1])):
+                    slot += 1 # Another worker of this server: take the next log
+                    continue
+                if time.monotonic() >= deadline:
+                    logger.error("%s is still locked by another process; lobby snapshots are off", path)
+                    return False
+                await asyncio.sleep(0.1)
+                continue
+            lock_file.truncate(0)
+            lock_file.write(f"{os.getpid()} {os.getppid()}\n")
+            lock_file.flush()
+            self._path = path
+            self._lock_file = lock_file
+            return True
+
+    def _release(self):
+        if self._lock_file is not None:
+            self._lock_file.close() # Closing drops the flock
+            self._lock_file = None
+
+    async def _restore(self, state: dict):
+        code = state.get("code")
+        try:
+            lobby = await self._manager.restore_lobby(state, SNAPSHOT_RESTORE_GRACE)
+            if lobby is None:
+                return
+            self.restored += 1
+            if state.get("game"):
+                session = GameSession.restore(lobby, state["game"])
+                lobby.game_session = session
+                asyncio.create_task(session.resume_game(SNAPSHOT_RESUME_WAIT))
+        except Exception:
+            logger.exception("Failed to restore lobby %s", code)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(SNAPSHOT_INTERVAL)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Lobby snapshot failed")
+
+    async def flush(self, compact: bool = False):
+        """Append records for changed and removed lobbies, compacting if the log is too long."""
+        async with self._lock:
+            lines = self._changes()
+            limit = max(SNAPSHOT_COMPACT_LINES, 4 * len(self._manager.active_lobbies))
+            if not compact and self._lines + len(lines) <= limit:
+                if lines:
+                    await asyncio.to_thread(self._append, lines)
+                    self._lines += len(lines)
+                    self.records_written += len(lines)
+                return
+            lines = [self._record(lobby) for lobby in self._manager.active_lobbies.values()]
+            await asyncio.to_thread(self._rewrite, lines)
+            self._lines = len(lines)
+            self.records_written += len(lines)
+            self.compactions += 1
+
+    def _changes(self) -> List[str]:
+        # Encoded on the event loop, between awaits, so each record is consistent
+        lines = []
+        active = self._manager.active_lobbies
+        for code in [code for code in self._written if code not in active]:
+            del self._written[code]
+            lines.append(json.dumps({"v": SNAPSHOT_VERSION, "at": time.time(), "code": code, "removed": True}))
+        for code, lobby in active.items():
+            if self._written.get(code) != lobby.last_activity:
+                lines.append(self._record(lobby))
+        return lines
+
+    def _record(self, lobby) -> str:
+        self._written[lobby.room_code] = lobby.last_activity
+        return json.dumps({"v": SNAPSHOT_VERSION, "at": time.time(), **lobby.snapshot()}, separators=(",", ":"))
+
+    def _append(self, lines: List[str]):
+        with open(self._path, "a") as f:
+            f.write("\n".join(lines) + "\n")
+
+    def _rewrite(self, lines: List[str]):
+        tmp_path = f"{self._path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            if lines:
+                f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, self._path)
+
+    def _read(self) -> List[dict]:
+        """Newest recent record per lobby code, tombstones applied."""
+        try:
+            with open(self._path) as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return []
+        latest: Dict[str, dict] = {}
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue # Torn write from a crash mid-append
+            if record.get("v") != SNAPSHOT_VERSION:
+                continue
+            if record.get("removed"):
+                latest.pop(record["code"], None)
+            else:
+                latest[record["code"]] = record
+        oldest = time.time() - SNAPSHOT_MAX_AGE
+        return [record for record in latest.values() if record["at"] >= oldest]
+
+    def stats(self) -> dict:
+        return {
+            "lobbies_tracked": len(self._written),
+            "log_records": self._lines,
+            "records_written": self.records_written,
+            "compactions": self.compactions,
+            "restored": self.restored,
+        }
+
+lobby_snapshots = LobbySnapshots()
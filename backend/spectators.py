@@ -0,0 +1,118 @@
+import os
+from typing import TYPE_CHECKING, Iterator, List, Set
+from .metrics import ws_messages_out
+from .protocol import EncodedMessage
+
+if TYPE_CHECKING:
+    from .lobby_system import Lobby, Player
+
+# Spectators (eliminated players and read-only observers) get at most one
+# delta per SPECTATOR_INTERVAL: the lobby events since the last one. Every
+# SPECTATOR_SNAPSHOT_EVERY ticks, if anything changed, a full snapshot follows
+# to resync anyone whose outbox dropped frames.
+SPECTATOR_INTERVAL = float(os.getenv("SPECTATOR_INTERVAL", "1.0"))
+SPECTATOR_SNAPSHOT_EVERY = int(os.getenv("SPECTATOR_SNAPSHOT_EVERY", "10"))
+SPECTATOR_LIMIT = int(os.getenv("SPECTATOR_LIMIT", "500")) # Observers per lobby
+SPECTATOR_TOP = 10
+
+# Only the newest of these matters to a viewer: each supersedes the last
+LATEST_ONLY = frozenset(("ANSWER_BATCH",))
+
+class SpectatorFeed:
+    """
+    A lobby's low-rate outbound channel. Lobby broadcasts go to active
+    players immediately and are only recorded here; flush() then encodes
+    one delta per tick for the whole audience, so a large audience adds
+    one list append per broadcast to the players' fan-out, not N sends.
+    """
+    def __init__(self, lobby: "Lobby"):
+        self._lobby = lobby
+        self.observers: Set["Player"] = set() # By connection: one user may watch from several
+        self._pending: List[dict] = []
+        self._ticks = 0
+        self._changed = False # Events since the last periodic snapshot
+
+    def __len__(self) -> int:
+        """Observers plus eliminated players."""
+        players = self._lobby.players
+        return len(self.observers) + len(players) - players.alive_count
+
+    def audience(self) -> Iterator["Player"]:
+        yield from self.observers
+        for p in self._lobby.players:
+            if not p.is_alive and not p.suspended:
+                yield p
+
+    def record(self, event: dict):
+        if len(self):
+            self._pending.append(event)
+
+    def add_observer(self, player: "Player") -> bool:
+        if len(self.observers) >= SPECTATOR_LIMIT:
+            return False
+        self.observers.add(player)
+        player.lobby_code = self._lobby.room_code
+        player.start_writer()
+        player.send(self.snapshot())
+        return True
+
+    def remove_observer(self, player: "Player"):
+        if player in self.observers:
+            self.observers.remove(player)
+            player.stop_writer()
+
+    def welcome(self, player: "Player"):
+        """A player just joined the audience (e.g. eliminated): start them from a snapshot."""
+        player.send(self.snapshot())
+
+    def snapshot(self) -> dict:
+        lobby = self._lobby
+        session = lobby.game_session
+        return {
+            "type": "SPECTATE_SNAPSHOT",
+            "code": lobby.room_code,
+            "seq": lobby.event_seq,
+            "round": session.round_number if session else 0,
+            "instruction": session.instruction if session else None,
+            "players": [[p.user_id, p.username, p.is_alive, p.score] for p in lobby.players],
+            "top": lobby.leaderboard.standings(SPECTATOR_TOP),
+        }
+
+    def flush(self):
+        """One tick: send the pending delta (or a periodic snapshot) to the audience."""
+        if not len(self):
+            self._pending.clear()
+            return
+        self._ticks += 1
+        messages = []
+        if self._pending:
+            messages.append(EncodedMessage({
+                "type": "SPECTATE_DELTA",
+                "seq": self._lobby.event_seq,
+                "events": self._coalesced(),
+            }))
+            self._pending = []
+            self._changed = True
+        if self._changed and self._ticks % SPECTATOR_SNAPSHOT_EVERY == 0:
+            messages.append(EncodedMessage(self.snapshot()))
+            self._changed = False
+        for message in messages:
+            sent = 0
+            for p in self.audience():
+                p.enqueue(message.frame(p.codec))
+                sent += 1
+            ws_messages_out.inc(message.message["type"], sent)
+
+    def _coalesced(self) -> List[dict]:
+        latest = {event["type"]: i for i, event in enumerate(self._pending) if event["type"] in LATEST_ONLY}
+        return [
+            event for i, event in enumerate(self._pending)
+            if event["type"] not in LATEST_ONLY or latest[event["type"]] == i
+        ]
+
+    def close(self) -> List["Player"]:
+        """Detach every observer (lobby closing); returns them for the caller to close."""
+        observers = list(self.observers)
+        self.observers.clear()
+        self._pending.clear()
+        return observers
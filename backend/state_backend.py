@@ -0,0 +1,310 @@
+import asyncio
+import logging
+import os
+import socket
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Callable, Deque, Dict, Iterable, Optional, Tuple
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# Selected at import time: "memory" (single process) or "redis" (multi-worker)
+LOBBY_BACKEND = os.getenv("LOBBY_BACKEND", "memory")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+RECONNECT_DELAY = 0.1 # Seconds before the first reconnect attempt; doubles per failure
+RECONNECT_MAX_DELAY = 5.0
+
+MessageHandler = Callable[[bytes], None]
+
+class BackendError(Exception):
+    """Raised when the state backend rejects a command."""
+    pass
+
+class StateBackend(ABC):
+    """
+    Shared lobby state and pub/sub used to route players across workers.
+    Keys hold small string values (e.g. which worker owns a lobby code);
+    channels carry opaque byte payloads.
+    """
+
+    def __init__(self):
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    @abstractmethod
+    async def claim(self, key: str, value: str, ttl: int) -> bool:
+        """Set key only if absent. Return True if we now own it."""
+        pass
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[str]:
+        pass
+
+    @abstractmethod
+    async def release(self, key: str):
+        pass
+
+    @abstractmethod
+    async def refresh(self, keys: Iterable[str], ttl: int):
+        """Extend the expiry of keys we still own."""
+        pass
+
+    @abstractmethod
+    async def publish(self, channel: str, data: bytes):
+        pass
+
+    @abstractmethod
+    async def subscribe(self, channel: str, handler: MessageHandler):
+        """Handler is called (synchronously) for every message on channel."""
+        pass
+
+    @abstractmethod
+    async def unsubscribe(self, channel: str):
+        pass
+
+class LocalBackend(StateBackend):
+    """In-process backend: one worker, nothing leaves the event loop."""
+
+    def __init__(self):
+        super().__init__()
+        self._keys: Dict[str, str] = {}
+        self._handlers: Dict[str, MessageHandler] = {}
+
+    async def claim(self, key: str, value: str, ttl: int) -> bool:
+        if key in self._keys:
+            return False
+        self._keys[key] = value
+        return True
+
+    async def get(self, key: str) -> Optional[str]:
+        return self._keys.get(key)
+
+    async def release(self, key: str):
+        self._keys.pop(key, None)
+
+    async def refresh(self, keys: Iterable[str], ttl: int):
+        pass # Nothing expires in-process
+
+    async def publish(self, channel: str, data: bytes):
+        handler = self._handlers.get(channel)
+        if handler:
+            asyncio.get_running_loop().call_soon(handler, data)
+
+    async def subscribe(self, channel: str, handler: MessageHandler):
+        self._handlers[channel] = handler
+
+    async def unsubscribe(self, channel: str):
+        self._handlers.pop(channel, None)
+
+# --- RESP (Redis protocol) client ---
+
+def encode_command(*args) -> bytes:
+    out = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        if not isinstance(arg, bytes):
+            arg = str(arg).encode()
+        out.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+    return b"".join(out)
+
+async def read_reply(reader: asyncio.StreamReader):
+    """Parse one RESP value. Error replies are returned, not raised."""
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("State backend closed the connection")
+    prefix, rest = line[:1], line[1:-2]
+    if prefix == b"+":
+        return rest.decode()
+    if prefix == b"-":
+        return BackendError(rest.decode())
+    if prefix == b":":
+        return int(rest)
+    if prefix == b"$":
+        size = int(rest)
+        if size < 0:
+            return None
+        data = await reader.readexactly(size + 2)
+        return data[:-2]
+    if prefix == b"*":
+        size = int(rest)
+        if size < 0:
+            return None
+        return [await read_reply(reader) for _ in range(size)]
+    raise BackendError(f"Unexpected reply: {line!r}")
+
+class RedisBackend(StateBackend):
+    """
+    Cross-process backend speaking the Redis protocol over two connections:
+    one pipelined command connection and one dedicated to SUBSCRIBE pushes.
+    Works against Redis or the stand-in in backend/broker.py.
+
+    A lost connection is re-opened in the background with backoff. Commands
+    issued meanwhile fail at once with ConnectionError rather than waiting,
+    and subscriptions are restored when the push connection comes back.
+    """
+
+    def __init__(self, url: str = REDIS_URL):
+        super().__init__()
+        parsed = urlparse(url)
+        self._host = parsed.hostname or "localhost"
+        self._port = parsed.port or 6379
+        self._password = parsed.password
+        self._db = int(parsed.path.lstrip("/") or 0)
+
+        self._cmd_writer: Optional[asyncio.StreamWriter] = None
+        self._sub_writer: Optional[asyncio.StreamWriter] = None
+        self._pending: Deque[asyncio.Future] = deque()
+        self._handlers: Dict[str, MessageHandler] = {}
+        self._tasks = []
+
+    async def _open(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        reader, writer = await asyncio.open_connection(self._host, self._port)
+        setup = []
+        if self._password:
+            setup.append(encode_command("AUTH", self._password))
+        if self._db:
+            setup.append(encode_command("SELECT", self._db))
+        for cmd in setup:
+            writer.write(cmd)
+            reply = await read_reply(reader)
+            if isinstance(reply, BackendError):
+                raise reply
+        return reader, writer
+
+    @property
+    def connected(self) -> bool:
+        return self._cmd_writer is not None and self._sub_writer is not None
+
+    async def start(self):
+        # The first connect must succeed; after that, outages are ridden out
+        commands = await self._open()
+        pushes = await self._open()
+        # Usable as soon as start() returns; the serve loops pick up the replies
+        self._cmd_writer = commands[1]
+        self._sub_writer = pushes[1]
+        self._tasks = [
+            asyncio.create_task(self._keep_connected("command", commands, self._serve_commands)),
+            asyncio.create_task(self._keep_connected("subscriber", pushes, self._serve_pushes)),
+        ]
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        for writer in (self._cmd_writer, self._sub_writer):
+            if writer:
+                writer.close()
+        self._cmd_writer = self._sub_writer = None
+
+    async def _keep_connected(self, name: str, connection, serve):
+        """Run serve() on a connection until it drops, then reconnect with backoff."""
+        delay = RECONNECT_DELAY
+        while True:
+            if connection is None:
+                try:
+                    connection = await self._open()
+                except (OSError, BackendError) as exc:
+                    logger.warning("State backend %s reconnect failed (%s); retrying in %.1fs", name, exc, delay)
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, RECONNECT_MAX_DELAY)
+                    continue
+                logger.info("State backend %s connection restored", name)
+                delay = RECONNECT_DELAY
+            reader, writer = connection
+            try:
+                await serve(reader, writer)
+            except (ConnectionError, OSError, asyncio.IncompleteReadError) as exc:
+                logger.warning("State backend %s connection lost: %s", name, exc)
+            except Exception:
+                logger.exception("State backend %s connection failed", name)
+            writer.close()
+            connection = None
+
+    async def _serve_commands(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._cmd_writer = writer
+        try:
+            # Replies arrive in request order, so futures resolve FIFO
+            while True:
+                reply = await read_reply(reader)
+                future = self._pending.popleft()
+                if future.done():
+                    continue # Caller was cancelled
+                if isinstance(reply, BackendError):
+                    future.set_exception(reply)
+                else:
+                    future.set_result(reply)
+        finally:
+            self._cmd_writer = None
+            while self._pending:
+                future = self._pending.popleft()
+                if not future.done():
+                    future.set_exception(ConnectionError("State backend connection lost"))
+
+    async def _serve_pushes(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._sub_writer = writer
+        try:
+            if self._handlers:
+                writer.write(encode_command("SUBSCRIBE", *self._handlers)) # Restore after a reconnect
+                await writer.drain()
+            while True:
+                push = await read_reply(reader)
+                if isinstance(push, list) and len(push) == 3 and push[0] == b"message":
+                    handler = self._handlers.get(push[1].decode())
+                    if handler:
+                        handler(push[2])
+        finally:
+            self._sub_writer = None
+
+    async def _command(self, *args):
+        writer = self._cmd_writer
+        if writer is None:
+            raise ConnectionError("State backend is disconnected")
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append(future)
+        writer.write(encode_command(*args))
+        await writer.drain()
+        return await future
+
+    async def claim(self, key: str, value: str, ttl: int) -> bool:
+        return await self._command("SET", key, value, "NX", "EX", ttl) == "OK"
+
+    async def get(self, key: str) -> Optional[str]:
+        value = await self._command("GET", key)
+        return value.decode() if value is not None else None
+
+    async def release(self, key: str):
+        await self._command("DEL", key)
+
+    async def refresh(self, keys: Iterable[str], ttl: int):
+        await asyncio.gather(*(self._command("EXPIRE", key, ttl) for key in keys))
+
+    async def publish(self, channel: str, data: bytes):
+        await self._command("PUBLISH", channel, data)
+
+    async def subscribe(self, channel: str, handler: MessageHandler):
+        self._handlers[channel] = handler # Re-subscribed on reconnect if the write is lost
+        await self._send_push_command("SUBSCRIBE", channel)
+
+    async def unsubscribe(self, channel: str):
+        if self._handlers.pop(channel, None):
+            await self._send_push_command("UNSUBSCRIBE", channel)
+
+    async def _send_push_command(self, *args):
+        writer = self._sub_writer
+        if writer is None:
+            return
+        try:
+            writer.write(encode_command(*args))
+            await writer.drain()
+        except (ConnectionError, OSError):
+            pass # The subscriber loop notices and reconnects
+
+def create_backend() -> StateBackend:
+    if LOBBY_BACKEND == "redis":
+        return RedisBackend(REDIS_URL)
+    return LocalBackend()
@@ -0,0 +1,77 @@
+import time
+from array import array
+from typing import Dict, Iterable, Optional
+
+# Same smoothing constants TCP uses for SRTT/RTTVAR (RFC 6298)
+RTT_ALPHA = 1 / 8
+RTT_BETA = 1 / 4
+
+# PONGs are client-controlled: a client that delays them would otherwise get
+# the delay taken off its answer times. Compensation uses the lowest RTT seen
+# (delaying can only raise it) and never exceeds this bound.
+MAX_RTT_COMPENSATION_NS = 300_000_000
+
+class RttEstimator:
+    """Smoothed round-trip time from PING/PONG samples, in nanoseconds."""
+    __slots__ = ("srtt_ns", "rttvar_ns", "min_ns", "samples")
+
+    def __init__(self):
+        self.srtt_ns = 0
+        self.rttvar_ns = 0
+        self.min_ns = 0 # Lowest sample: a floor the client can't inflate by holding one PONG
+        self.samples = 0
+
+    def observe(self, sample_ns: int):
+        if sample_ns <= 0:
+            return
+        if not self.samples:
+            self.srtt_ns = sample_ns
+            self.rttvar_ns = sample_ns // 2
+            self.min_ns = sample_ns
+        else:
+            self.min_ns = min(self.min_ns, sample_ns)
+            self.rttvar_ns += int(RTT_BETA * (abs(self.srtt_ns - sample_ns) - self.rttvar_ns))
+            self.srtt_ns += int(RTT_ALPHA * (sample_ns - self.srtt_ns))
+        self.samples += 1
+
+    @property
+    def one_way_ns(self) -> int:
+        return self.srtt_ns // 2
+
+class RoundClock:
+    """
+    Per-round timing record: when each player's ROUND_START actually left the
+    server and when their answer arrived, in int64 columns indexed by slot.
+    0 means "not yet".
+    """
+    def __init__(self, player_ids: Iterable[int]):
+        self.started_ns = time.monotonic_ns()
+        self._slots: Dict[int, int] = {uid: i for i, uid in enumerate(player_ids)}
+        size = len(self._slots)
+        self.sent_ns = array("q", bytes(8 * size))
+        self.answer_ns = array("q", bytes(8 * size))
+
+    def mark_sent(self, user_id: int, now_ns: Optional[int] = None):
+        slot = self._slots.get(user_id)
+        if slot is not None:
+            self.sent_ns[slot] = now_ns or time.monotonic_ns()
+
+    def mark_answer(self, user_id: int, now_ns: int):
+        slot = self._slots.get(user_id)
+        if slot is not None and not self.answer_ns[slot]:
+            self.answer_ns[slot] = now_ns
+
+    def response_ns(self, user_id: int, received_ns: int, rtt: Optional[RttEstimator] = None) -> int:
+        """
+        Time the player took to answer, measured from their own ROUND_START
+        send time. The player's minimum RTT is removed (prompt downlink +
+        answer uplink), capped at MAX_RTT_COMPENSATION_NS, so a laggy
+        connection isn't penalised for the network and a client stalling
+        its PONGs can't buy itself time.
+        """
+        slot = self._slots.get(user_id)
+        sent = self.sent_ns[slot] if slot is not None else 0
+        elapsed = received_ns - (sent or self.started_ns)
+        if rtt is not None and rtt.samples:
+            elapsed -= min(rtt.min_ns, MAX_RTT_COMPENSATION_NS, elapsed)
+        return max(elapsed, 0)
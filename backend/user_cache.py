@@ -0,0 +1,143 @@
+import asyncio
+import json
+import logging
+import os
+from bisect import insort
+from typing import Iterable, List, Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from .cache import TTLCache
+from .database import AsyncSessionLocal
+from .lobby_system import lobby_manager
+from .models import User, UserResponse
+
+logger = logging.getLogger(__name__)
+
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "300")) # Bounds staleness across workers
+LEADERBOARD_SIZE = int(os.getenv("LEADERBOARD_SIZE", "100"))
+PROFILE_CHANNEL = "users:written" # Profiles a worker just committed, for the other workers' caches
+
+class UserCache:
+    """
+    Read-through cache of public profiles (UserResponse, never the password
+    hash) by id and by username. The writing worker updates its entries in
+    place and the others invalidate theirs (see profiles_written); the TTL
+    covers a lost notification.
+    """
+    def __init__(self, maxsize: int = USER_CACHE_SIZE, ttl: float = USER_CACHE_TTL):
+        self._by_id = TTLCache(maxsize, ttl)
+        self._id_by_name = TTLCache(maxsize, ttl)
+
+    @property
+    def hits(self) -> int:
+        return self._by_id.hits
+
+    @property
+    def misses(self) -> int:
+        return self._by_id.misses
+
+    def put(self, user: UserResponse):
+        self._by_id.set(user.id, user)
+        self._id_by_name.set(user.username, user.id)
+
+    def invalidate(self, user_id: int):
+        user = self._by_id.pop(user_id)
+        if user is not None:
+            self._id_by_name.pop(user.username)
+
+    async def get_by_id(self, db: AsyncSession, user_id: int) -> Optional[UserResponse]:
+        user = self._by_id.get(user_id)
+        if user is None:
+            row = await db.get(User, user_id)
+            if row is None:
+                return None # Misses aren't cached: the user may register any moment
+            user = UserResponse.model_validate(row)
+            self.put(user)
+        return user
+
+    async def get_by_username(self, db: AsyncSession, username: str) -> Optional[UserResponse]:
+        user_id = self._id_by_name.get(username)
+        user = self._by_id.get(user_id) if user_id is not None else None
+        if user is None:
+            result = await db.execute(select(User).where(User.username == username))
+            row = result.scalars().first()
+            if row is None:
+                return None
+            user = UserResponse.model_validate(row)
+            self.put(user)
+        return user
+
+class EloLeaderboard:
+    """
+    Global top-N by ELO, held in memory. Loaded once at startup, then patched
+    with the users each match commit touched, so reads never hit the database.
+    """
+    def __init__(self, size: int = LEADERBOARD_SIZE):
+        self._size = size
+        self._entries: List[Tuple[int, int, UserResponse]] = [] # (-elo, id, user), best first
+        self._stale = True # Needs a full load (startup, or the tail may be missing someone)
+        self._loading = asyncio.Lock()
+
+    def top(self, limit: Optional[int] = None) -> List[UserResponse]:
+        entries = self._entries if limit is None else self._entries[:limit]
+        return [user for _, _, user in entries]
+
+    async def refresh(self):
+        """Reload from the database if the board is stale."""
+        if self._stale:
+            async with self._loading: # One reload, however many readers find the board stale
+                if self._stale:
+                    async with AsyncSessionLocal() as db:
+                        await self.load(db)
+
+    async def load(self, db: AsyncSession):
+        result = await db.execute(select(User).order_by(User.elo.desc(), User.id).limit(self._size))
+        self._entries = [(-u.elo, u.id, UserResponse.model_validate(u)) for u in result.scalars()]
+        self._stale = False
+
+    def apply(self, users: Iterable[UserResponse]):
+        """Merge fresh ratings for a set of users into the board."""
+        users = list(users)
+        changed = {u.id for u in users}
+        floor = self._entries[-1][:2] if len(self._entries) >= self._size else None
+        self._entries = [entry for entry in self._entries if entry[1] not in changed]
+        for user in users:
+            insort(self._entries, (-user.elo, user.id, user))
+        del self._entries[self._size:]
+        # A full board's last place now ranks below the old floor: some user
+        # we don't hold may belong there, so reload instead of guessing.
+        if floor is not None and self._entries[-1][:2] > floor:
+            self._stale = True
+
+user_cache = UserCache()
+elo_leaderboard = EloLeaderboard()
+
+async def profiles_written(users: List[UserResponse]):
+    """Serve committed profiles from memory here and tell the other workers to drop theirs."""
+    for user in users:
+        user_cache.put(user)
+    elo_leaderboard.apply(users)
+    backend = lobby_manager.backend
+    message = {"worker": backend.worker_id, "users": [user.model_dump() for user in users]}
+    try:
+        await backend.publish(PROFILE_CHANNEL, json.dumps(message).encode())
+    except Exception:
+        logger.warning("Profile write notification failed", exc_info=True) # Others fall back on the TTL
+
+def _on_profiles_written(data: bytes):
+    try:
+        message = json.loads(data)
+        if message["worker"] == lobby_manager.backend.worker_id:
+            return # Already updated in place
+        users = [UserResponse(**user) for user in message["users"]]
+    except (ValueError, KeyError, TypeError):
+        logger.warning("Malformed profile write notification", exc_info=True)
+        return
+    for user in users:
+        user_cache.invalidate(user.id) # Re-read on next use rather than trust message order
+    elo_leaderboard.apply(users)
+
+async def watch_profile_writes():
+    """Follow other workers' profile writes; runs after the lobby manager has started its backend."""
+    await lobby_manager.backend.subscribe(PROFILE_CHANNEL, _on_profiles_written)
@@ -0,0 +1,43 @@
+"""
+Encode cost and frame size of the hot server -> client messages, per wire
+format (see the tradeoff note in backend/protocol.py).
+
+    python -m benchmarks.codec [--n 20000] [--rows 10]
+"""
+import argparse
+import time
+
+from backend.protocol import BINARY_CODEC, JSON_CODEC
+
+def messages(rows: int) -> dict:
+    return {
+        "PING": {"type": "PING", "seq": 42},
+        "ROUND_START": {"type": "ROUND_START", "round": 2, "instruction": "Solve the math problem: 12 * 7", "seq": 55},
+        f"ANSWER_BATCH ({rows} rows)": {
+            "type": "ANSWER_BATCH",
+            "results": [[1000 + i, i % 3 != 0, 150 + i, i + 1] for i in range(rows)],
+            "top": [[1000 + i, 200 - i] for i in range(min(rows, 10))],
+            "cutoff": 150,
+            "seq": 1234,
+        },
+    }
+
+def per_call_us(fn, message, n: int) -> float:
+    started = time.perf_counter()
+    for _ in range(n):
+        fn(message)
+    return (time.perf_counter() - started) / n * 1e6
+
+def main(n: int, rows: int):
+    for name, message in messages(rows).items():
+        print(f"{name}:")
+        for codec in (JSON_CODEC, BINARY_CODEC):
+            cost = per_call_us(codec.encode, message, n)
+            print(f"  {codec.name:<16} {cost:7.2f} us/encode  {len(codec.encode(message)):6d} bytes")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=20_000, help="encodes per measurement")
+    parser.add_argument("--rows", type=int, default=10, help="ANSWER_BATCH result rows")
+    args = parser.parse_args()
+    main(args.n, args.rows)
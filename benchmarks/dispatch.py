@@ -0,0 +1,76 @@
+"""
+Per-message cost of inbound command handling: the old json.loads + if/elif
+chain on msg.get("command") versus decode + schema validation + the
+LOBBY_COMMANDS dict lookup in backend.main.
+
+    python -m benchmarks.dispatch [--n 200000]
+
+The chain is also measured with extra (never-matching) commands placed
+ahead of GAME_INPUT, to show how its cost grows as commands are added while
+the table stays flat.
+"""
+import argparse
+import json
+import time
+
+from backend.commands import GameInput, Pong, StartGame, parse_command
+from backend.protocol import BINARY_CODEC, JSON_CODEC, decode_frame
+
+FRAMES = {
+    "GAME_INPUT": {"command": "GAME_INPUT", "input": "42"},
+    "PONG": {"command": "PONG", "seq": 7},
+    "START_GAME": {"command": "START_GAME"},
+}
+
+def _noop(*args):
+    pass
+
+def legacy_chain(extra: int):
+    """The pre-schema dispatch: one string compare per command ahead of the match."""
+    names = [f"EXTRA_{i}" for i in range(extra)]
+
+    def dispatch(msg: dict):
+        command = msg.get("command")
+        for name in names: # Stands in for `elif msg.get("command") == ...` branches
+            if command == name:
+                return
+        if command == "GAME_INPUT":
+            _noop(msg.get("input"))
+        elif command == "PONG":
+            _noop(msg.get("seq"))
+        elif command == "START_GAME":
+            _noop()
+    return dispatch
+
+TABLE = {GameInput: _noop, Pong: _noop, StartGame: _noop}
+
+def table_dispatch(msg: dict):
+    command = parse_command(msg)
+    TABLE[type(command)](command)
+
+def bench(label: str, fn, frame, n: int):
+    started = time.perf_counter()
+    for _ in range(n):
+        fn(frame)
+    per = (time.perf_counter() - started) / n * 1e9
+    print(f"  {label:<38} {per:8.0f} ns/msg")
+
+def main(n: int):
+    for name, message in FRAMES.items():
+        text = JSON_CODEC.encode(message)
+        binary = BINARY_CODEC.encode(message)
+        print(f"{name}:")
+        chain = legacy_chain(0)
+        bench("legacy json.loads + if/elif", lambda f: chain(json.loads(f)), text, n)
+        bench("legacy if/elif only", chain, message, n)
+        for extra in (10, 50):
+            chain = legacy_chain(extra)
+            bench(f"legacy if/elif, +{extra} commands", chain, message, n)
+        bench("schema validate + table", table_dispatch, message, n)
+        bench("decode_frame(json) + schema + table", lambda f: table_dispatch(decode_frame(f)), text, n)
+        bench("decode_frame(binary) + schema + table", lambda f: table_dispatch(decode_frame(f)), binary, n)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=200_000, help="messages per measurement")
+    main(parser.parse_args().n)
@@ -0,0 +1,266 @@
+"""
+Headless load generator: N lobbies x M bot players playing full games.
+
+Each bot is a frontend NetworkManager. The first bot of a lobby CREATEs it,
+the rest JOIN, the host starts the game, and every alive bot answers each
+round (correctly, after a short random "think" delay) until GAME_OVER.
+
+    python -m benchmarks.loadtest --lobbies 50 --players 8 --spawn-server
+
+Reports:
+  start latency      START_GAME sent -> GAME_START received, per bot
+  broadcast latency  START_GAME sent -> round 1 ROUND_START received, per bot
+  answer fan-out     a bot's GAME_INPUT sent -> the ANSWER_BATCH carrying it
+                     received by each other bot (includes the server's input
+                     batching window)
+  answer-ack latency GAME_INPUT sent -> ANSWER_BATCH carrying our result
+
+Broadcast timings start at a client send that triggers the broadcast; all
+bots share one process clock, so every recipient is measured against it.
+  msgs/sec           frames received (and sent) by all bots
+  server RSS         peak VmRSS of the server process (--spawn-server or --server-pid)
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import random
+import re
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+from frontend.network import NetworkManager
+
+_PROBLEM = re.compile(r"(-?\d+)\s*([-+*])\s*(-?\d+)")
+_OPS = {"+": lambda a, b: a + b, "-": lambda a, b: a - b, "*": lambda a, b: a * b}
+
+class Recorder:
+    """Latency samples (seconds) and frame counters shared by all bots."""
+    def __init__(self):
+        self.start_latency: List[float] = []
+        self.answer_ack: List[float] = []
+        self.broadcast_latency: List[float] = []
+        self.answer_fanout: List[float] = []
+        self.input_sent: Dict[tuple, float] = {} # (lobby, client id) -> last GAME_INPUT send time
+        self.frames_in = 0
+        self.frames_out = 0
+        self.games_finished = 0
+        self.errors = 0
+
+class Bot:
+    def __init__(self, url: str, client_id: int, rec: Recorder, binary: bool, think: float):
+        self.net = NetworkManager(url, binary=binary)
+        self.client_id = client_id
+        self.rec = rec
+        self.think = think
+        self.code: Optional[str] = None
+        self.alive = True
+        self.answer_sent: Optional[float] = None
+        self.start_sent: Optional[float] = None
+        self.joined = asyncio.Event()
+
+    async def send(self, message: dict):
+        self.rec.frames_out += 1
+        await self.net.send(message)
+
+    async def run(self, create: bool, code: Optional[str] = None):
+        await self.net.connect_websocket(self.client_id)
+        if create:
+            await self.send({"command": "CREATE", "username": f"bot{self.client_id}"})
+        else:
+            await self.send({"command": "JOIN", "code": code, "username": f"bot{self.client_id}"})
+        try:
+            while True:
+                msg = await self.net.receive()
+                if msg is None:
+                    return
+                self.rec.frames_in += 1
+                if await self.handle(msg):
+                    return
+        finally:
+            await self.net.close()
+
+    async def handle(self, msg: dict, timed: bool = True) -> bool:
+        """Returns True once the game is over. Events unpacked from a spectator delta aren't timed."""
+        now = time.perf_counter()
+        kind = msg.get("type")
+        if kind == "PING":
+            await self.send({"command": "PONG", "seq": msg["seq"]})
+            return False
+        if kind == "SPECTATE_DELTA":
+            # Eliminated: lobby events now arrive batched in the spectator feed
+            for event in msg["events"]:
+                if await self.handle(event, timed=False):
+                    return True
+            return False
+        if kind == "SPECTATE_SNAPSHOT":
+            return False
+
+        if kind in ("LOBBY_CREATED", "LOBBY_JOINED"):
+            self.code = msg["code"]
+            self.joined.set()
+        elif kind == "GAME_START" and self.start_sent is not None:
+            self.rec.start_latency.append(now - self.start_sent)
+        elif kind == "ROUND_START":
+            if timed and msg.get("round") == 1 and self.start_sent is not None:
+                self.rec.broadcast_latency.append(now - self.start_sent)
+            if self.alive:
+                asyncio.create_task(self.answer(msg["instruction"]))
+        elif kind == "ANSWER_BATCH":
+            for result in msg["results"]:
+                sent = self.rec.input_sent.get((self.code, result[0]))
+                if timed and sent is not None and result[0] != self.client_id:
+                    self.rec.answer_fanout.append(now - sent)
+            if self.answer_sent is not None and any(result[0] == self.client_id for result in msg["results"]):
+                self.rec.answer_ack.append(now - self.answer_sent)
+                self.answer_sent = None
+        elif kind == "ELIMINATED":
+            self.alive = False
+        elif kind == "GAME_OVER":
+            self.rec.games_finished += 1
+            return True
+        elif kind == "ERROR":
+            self.rec.errors += 1
+            return True
+        return False
+
+    async def answer(self, instruction: str):
+        await asyncio.sleep(random.uniform(0, self.think))
+        match = _PROBLEM.search(instruction)
+        text = str(_OPS[match.group(2)](int(match.group(1)), int(match.group(3)))) if match else "0"
+        self.answer_sent = time.perf_counter()
+        self.rec.input_sent[(self.code, self.client_id)] = self.answer_sent
+        await self.send({"command": "GAME_INPUT", "input": text})
+
+async def run_lobby(url: str, players: int, ids, rec: Recorder, binary: bool, think: float):
+    host = Bot(url, next(ids), rec, binary, think)
+    tasks = [asyncio.create_task(host.run(create=True))]
+    await asyncio.wait_for(host.joined.wait(), 30)
+    guests = [Bot(url, next(ids), rec, binary, think) for _ in range(players - 1)]
+    tasks += [asyncio.create_task(g.run(create=False, code=host.code)) for g in guests]
+    await asyncio.wait_for(asyncio.gather(*(g.joined.wait() for g in guests)), 30)
+    host.start_sent = time.perf_counter()
+    for g in guests:
+        g.start_sent = host.start_sent
+    await host.send({"command": "START_GAME"})
+    await asyncio.gather(*tasks)
+
+def read_rss_kb(pid: int) -> Optional[int]:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+async def sample_rss(pid: Optional[int], peak: List[int], stop: asyncio.Event):
+    while pid and not stop.is_set():
+        rss = read_rss_kb(pid)
+        if rss:
+            peak[0] = max(peak[0], rss)
+        try:
+            await asyncio.wait_for(stop.wait(), 0.5)
+        except asyncio.TimeoutError:
+            pass
+
+def percentiles(samples: List[float]) -> str:
+    if not samples:
+        return "n/a"
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+    return f"p50 {pick(0.50):7.2f} ms  p95 {pick(0.95):7.2f} ms  p99 {pick(0.99):7.2f} ms  (n={len(ordered)})"
+
+def spawn_server(port: int) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", "sqlite+aiosqlite:///./loadtest.db")
+    env.setdefault("SNAPSHOT_PATH", "") # Bot lobbies mustn't be restored by the next real server
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env,
+    )
+    return server
+
+async def wait_for_server(url: str, timeout: float = 20):
+    deadline = time.monotonic() + timeout
+    probe = NetworkManager(url)
+    await probe.init_session()
+    try:
+        while True:
+            try:
+                async with probe.session.get(url + "/") as resp:
+                    if resp.status == 200:
+                        return
+            except OSError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"Server at {url} did not come up")
+            await asyncio.sleep(0.2)
+    finally:
+        await probe.close()
+
+async def main(args):
+    server = None
+    pid = args.server_pid
+    if args.spawn_server:
+        server = spawn_server(args.port)
+        pid = server.pid
+    try:
+        await wait_for_server(args.url)
+        rec = Recorder()
+        ids = itertools.count(args.id_base)
+        peak = [0]
+        stop = asyncio.Event()
+        sampler = asyncio.create_task(sample_rss(pid, peak, stop))
+
+        started = time.perf_counter()
+        lobbies = []
+        for _ in range(args.lobbies):
+            lobbies.append(asyncio.create_task(
+                run_lobby(args.url, args.players, ids, rec, not args.json, args.think)
+            ))
+            if args.ramp:
+                await asyncio.sleep(args.ramp)
+        results = await asyncio.gather(*lobbies, return_exceptions=True)
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await sampler
+
+        failed = [r for r in results if isinstance(r, BaseException)]
+        print(f"lobbies {args.lobbies} x players {args.players} "
+              f"({'json' if args.json else 'binary'}), {elapsed:.1f} s, "
+              f"{rec.games_finished} bot games finished, {len(failed)} lobbies failed, {rec.errors} errors")
+        if failed:
+            print(f"  first failure: {failed[0]!r}")
+        print(f"start latency      {percentiles(rec.start_latency)}")
+        print(f"broadcast latency  {percentiles(rec.broadcast_latency)}")
+        print(f"answer fan-out     {percentiles(rec.answer_fanout)}")
+        print(f"answer-ack latency {percentiles(rec.answer_ack)}")
+        print(f"msgs/sec           in {rec.frames_in / elapsed:9.0f}   out {rec.frames_out / elapsed:9.0f}")
+        print(f"server peak RSS    {peak[0] / 1024:.1f} MiB" if peak[0] else "server peak RSS    n/a")
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=None, help="server base URL (default http://127.0.0.1:PORT)")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--lobbies", type=int, default=10)
+    parser.add_argument("--players", type=int, default=8, help="bots per lobby, host included")
+    parser.add_argument("--think", type=float, default=0.5, help="max random delay before answering (s)")
+    parser.add_argument("--ramp", type=float, default=0.0, help="delay between lobby starts (s)")
+    parser.add_argument("--json", action="store_true", help="use the JSON protocol instead of binary")
+    parser.add_argument("--id-base", type=int, default=1_000_000, help="first bot client id")
+    parser.add_argument("--spawn-server", action="store_true", help="run uvicorn backend.main:app locally")
+    parser.add_argument("--server-pid", type=int, default=None, help="sample RSS of an existing server")
+    args = parser.parse_args(argv)
+    args.url = args.url or f"http://127.0.0.1:{args.port}"
+    return args
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,106 @@
+"""
+Per-player memory for a worker holding many concurrent players.
+
+Builds N players (default 100k) in lobbies of M, in three stages, and
+reports the traced bytes each stage adds per player plus process RSS:
+
+  player     a bare Player object (outbox, RTT estimator, ...)
+  seated     joined to a Lobby: PlayerTable seat, leaderboard entry, roster
+  writer     its writer task started and idle, as for a live connection
+
+    python -m benchmarks.player_memory [--players 100000] [--lobby-size 30]
+
+Exits non-zero if the total exceeds --budget bytes per player.
+"""
+import argparse
+import asyncio
+import gc
+import sys
+import time
+import tracemalloc
+
+from backend.lobby_system import Lobby, Player
+from backend.protocol import BINARY_CODEC
+
+class NullSocket:
+    """Accepts and discards frames, like a client that keeps up."""
+    def __init__(self):
+        self.frames = 0
+
+    async def send_text(self, data):
+        self.frames += 1
+
+    async def send_bytes(self, data):
+        self.frames += 1
+
+def rss_mib() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return float("nan")
+
+def traced() -> int:
+    gc.collect()
+    return tracemalloc.get_traced_memory()[0]
+
+async def main(args) -> int:
+    n, size = args.players, args.lobby_size
+    socket = NullSocket()
+    tracemalloc.start()
+    start = traced()
+
+    players = [Player(socket, f"player{i}", i, BINARY_CODEC) for i in range(n)]
+    after_players = traced()
+
+    lobbies = [Lobby(f"{i:04d}") for i in range((n + size - 1) // size)]
+    for i, p in enumerate(players):
+        lobby = lobbies[i // size]
+        lobby.players.add(p)
+        p.attach_standings(lobby.leaderboard)
+        p.lobby_code = lobby.room_code
+    for lobby in lobbies:
+        lobby.player_list_message()
+    after_seated = traced()
+
+    for p in players:
+        p.start_writer()
+    await asyncio.sleep(0) # Let every writer park on its empty outbox
+    after_writers = traced()
+    tracemalloc.stop() # Timed below at full speed
+
+    started = time.perf_counter()
+    for lobby in lobbies:
+        await lobby.broadcast({"type": "ROUND_START", "round": 1, "instruction": "Solve: 1 + 1"})
+    while socket.frames < n:
+        await asyncio.sleep(0)
+    fanout = time.perf_counter() - started
+
+    stages = [
+        ("player", after_players - start),
+        ("seated", after_seated - after_players),
+        ("writer", after_writers - after_seated),
+    ]
+    total = after_writers - start
+    print(f"{n} players in {len(lobbies)} lobbies of {size}")
+    for name, used in stages:
+        print(f"  {name:<8} {used / n:8.0f} B/player")
+    print(f"  {'total':<8} {total / n:8.0f} B/player  ({total / 2**20:.1f} MiB traced, RSS {rss_mib():.1f} MiB)")
+    print(f"  one broadcast per lobby delivered to every player in {fanout * 1000:.0f} ms")
+
+    for p in players:
+        p.stop_writer()
+    if total / n > args.budget:
+        print(f"over budget: {total / n:.0f} > {args.budget} B/player")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--players", type=int, default=100_000)
+    parser.add_argument("--lobby-size", type=int, default=30)
+    parser.add_argument("--budget", type=int, default=4096, help="max bytes per player")
+    sys.exit(asyncio.run(main(parser.parse_args())))
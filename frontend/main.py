@@ -162,7 +162,10 @@ class Game:
         await self.network.send({"command": "GAME_INPUT", "input": text})
 
     def handle_message(self, msg):
-        if msg["type"] == "LOBBY_CREATED":
+        if msg["type"] == "PING":
+            # Echo immediately: the server times answers net of our round trip
+            asyncio.create_task(self.network.send({"command": "PONG", "seq": msg["seq"]}))
+        elif msg["type"] == "LOBBY_CREATED":
             self.lobby_code = msg["code"]
             self.state = LOBBY
             self.lbl_lobby.set_text(f"Lobby: {self.lobby_code}")
@@ -173,6 +176,25 @@ class Game:
         elif msg["type"] == "PLAYER_LIST":
             self.player_list = msg["players"]
             self.lbl_players.set_text(f"Players: {len(self.player_list)}")
+        elif msg["type"] == "PLAYER_JOINED":
+            self.player_list.append(msg["player"])
+            self.lbl_players.set_text(f"Players: {len(self.player_list)}")
+        elif msg["type"] == "PLAYER_STATUS":
+            # Dropped or back; a dropped host hands over immediately
+            for p in self.player_list:
+                if p["id"] == msg["id"]:
+                    p["connected"] = msg["connected"]
+                if msg.get("host_id") is not None:
+                    p["is_host"] = p["id"] == msg["host_id"]
+            if msg.get("host_id") is not None:
+                self.is_host = msg["host_id"] == self.client_id
+        elif msg["type"] == "PLAYER_LEFT":
+            self.player_list = [p for p in self.player_list if p["id"] != msg["id"]]
+            if msg.get("host_id") is not None:
+                for p in self.player_list:
+                    p["is_host"] = p["id"] == msg["host_id"]
+                self.is_host = msg["host_id"] == self.client_id
+            self.lbl_players.set_text(f"Players: {len(self.player_list)}")
         elif msg["type"] == "GAME_START":
             self.state = GAME
         elif msg["type"] == "ROUND_START":
@@ -182,11 +204,27 @@ class Game:
             self.lbl_status.set_text("") 
             # Show popup
             self.popup = Popup(200, 150, 400, 300, f"ROUND {self.current_round}\n\n{msg['instruction']}", self.dismiss_popup)
+        elif msg["type"] == "ANSWER_BATCH":
+            for user_id, correct, _score, rank in msg["results"]:
+                if user_id == self.client_id:
+                    self.lbl_status.set_text(f"Correct! (#{rank})" if correct else "Wrong!")
         elif msg["type"] == "ROUND_END":
              self.lbl_status.set_text("Round Ended!")
         elif msg["type"] == "ELIMINATED":
-             self.lbl_status.set_text("ELIMINATED!")
-             # Show logic?
+             self.lbl_status.set_text("ELIMINATED! Spectating...")
+        elif msg["type"] == "SPECTATE_SNAPSHOT":
+            self.current_round = msg["round"]
+            self.lbl_round.set_text(f"Round {self.current_round} (spectating)")
+            self.lbl_instruction.set_text(msg["instruction"] or "")
+        elif msg["type"] == "SPECTATE_DELTA":
+            # Lobby events since the spectator feed's last tick
+            for event in msg["events"]:
+                if event["type"] != "ROUND_START":
+                    self.handle_message(event)
+                else:
+                    self.current_round = event["round"]
+                    self.lbl_round.set_text(f"Round {self.current_round} (spectating)")
+                    self.lbl_instruction.set_text(event["instruction"])
 
 async def main():
     game = Game()
@@ -1,12 +1,14 @@
 import aiohttp
-import json
 import asyncio
+from .protocol import SUBPROTOCOL_BINARY, SUBPROTOCOL_JSON, CODECS, JSON_CODEC, decode_frame
 
 class NetworkManager:
-    def __init__(self, base_url="http://localhost:8000"):
+    def __init__(self, base_url="http://localhost:8000", binary=True):
         self.base_url = base_url
         self.ws = None
         self.session = None
+        self.binary = binary # Offer the compact binary protocol at connect
+        self.codec = JSON_CODEC
 
     async def init_session(self):
         if not self.session:
@@ -22,20 +24,29 @@ class NetworkManager:
                 return data["access_token"]
             return None
 
-    async def connect_websocket(self, client_id):
+    async def connect_websocket(self, client_id, token=None):
         await self.init_session()
         ws_url = self.base_url.replace("http", "ws") + f"/ws/{client_id}"
-        self.ws = await self.session.ws_connect(ws_url)
+        if token:
+            ws_url += f"?token={token}" # Server checks it matches client_id
+        protocols = (SUBPROTOCOL_BINARY, SUBPROTOCOL_JSON) if self.binary else ()
+        self.ws = await self.session.ws_connect(ws_url, protocols=protocols)
+        # Servers without protocol support accept with no subprotocol -> JSON
+        self.codec = CODECS.get(self.ws.protocol, JSON_CODEC)
 
     async def send(self, message: dict):
         if self.ws:
-            await self.ws.send_json(message)
+            frame = self.codec.encode(message)
+            if isinstance(frame, bytes):
+                await self.ws.send_bytes(frame)
+            else:
+                await self.ws.send_str(frame)
 
     async def receive(self):
         if self.ws:
             msg = await self.ws.receive()
-            if msg.type == aiohttp.WSMsgType.TEXT:
-                return json.loads(msg.data)
+            if msg.type in (aiohttp.WSMsgType.TEXT, aiohttp.WSMsgType.BINARY):
+                return decode_frame(msg.data)
         return None
 
     async def close(self):
@@ -0,0 +1,20 @@
+"""
+Wire formats for the pygame client. This is the server's codec module,
+re-exported so client and server can't drift apart; run the client from
+the repository root (python -m frontend.main) so `backend` is importable.
+"""
+from backend.protocol import ( # noqa: F401
+    BINARY_CODEC,
+    CODECS,
+    COMMAND_CODE_MIN,
+    JSON_CODEC,
+    MESSAGE_CODES,
+    MESSAGE_NAMES,
+    SUBPROTOCOL_BINARY,
+    SUBPROTOCOL_JSON,
+    BinaryCodec,
+    Frame,
+    JsonCodec,
+    ProtocolError,
+    decode_frame,
+)
@@ -0,0 +1,10 @@
+import os
+import tempfile
+
+# backend modules read their settings at import time: point the database at a
+# throwaway SQLite file (pooled, like production) and keep lobby snapshots
+# and the results spool out of the package directory.
+_tmp = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = "sqlite+aiosqlite:///" + os.path.join(_tmp, "test.db")
+os.environ["SNAPSHOT_PATH"] = ""
+os.environ["RESULTS_SPOOL_PATH"] = os.path.join(_tmp, "results_spool.jsonl")
@@ -0,0 +1,37 @@
+"""Test doubles shared by the lobby and game engine tests."""
+import asyncio
+import json
+from typing import List, Optional
+
+class FakeSocket:
+    """Stands in for a Starlette WebSocket: records sent frames, can stall or fail."""
+    def __init__(self):
+        self.sent: List[dict] = []
+        self.gate: Optional[asyncio.Event] = None # Sends wait on it while it's unset
+        self.fail = False
+        self.closed = False
+
+    async def send_text(self, frame: str):
+        if self.gate is not None:
+            await self.gate.wait()
+        if self.fail:
+            raise ConnectionResetError("socket gone")
+        self.sent.append(json.loads(frame))
+
+    async def send_bytes(self, frame: bytes):
+        raise AssertionError("tests use the JSON codec")
+
+    async def close(self, code: int = 1000):
+        self.closed = True
+
+    def types(self) -> List[str]:
+        return [message["type"] for message in self.sent]
+
+    def of_type(self, kind: str) -> List[dict]:
+        return [message for message in self.sent if message["type"] == kind]
+
+async def eventually(check, timeout: float = 5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not check():
+        assert asyncio.get_running_loop().time() < deadline, "condition not met in time"
+        await asyncio.sleep(0.01)
@@ -0,0 +1,39 @@
+"""parse_command: the discriminated union every inbound frame is validated against."""
+import pytest
+
+from backend.commands import (
+    INPUT_MAX, USERNAME_MAX, Create, GameInput, Join, Pong, Resume, Spectate, StartGame, parse_command,
+)
+from backend.protocol import ProtocolError
+
+@pytest.mark.parametrize("message, model", [
+    ({"command": "CREATE"}, Create),
+    ({"command": "CREATE", "username": "ada"}, Create),
+    ({"command": "JOIN", "code": "1234"}, Join),
+    ({"command": "RESUME", "token": "abc", "last_seq": 12}, Resume),
+    ({"command": "SPECTATE", "code": "1234"}, Spectate),
+    ({"command": "START_GAME"}, StartGame),
+    ({"command": "GAME_INPUT", "input": "9"}, GameInput),
+    ({"command": "PONG", "seq": 4}, Pong),
+])
+def test_each_command_parses_to_its_model(message, model):
+    assert type(parse_command(message)) is model
+
+def test_numbers_coerced_and_extras_ignored():
+    join = parse_command({"command": "JOIN", "code": 1234, "legacy": True})
+    assert join.code == "1234"
+    assert parse_command({"command": "GAME_INPUT", "input": 9}).input == "9"
+
+@pytest.mark.parametrize("message, reason", [
+    ({}, "command"),
+    ({"command": "DANCE"}, "DANCE"),
+    ({"command": "JOIN"}, "JOIN.code"),
+    ({"command": "PONG", "seq": "soon"}, "PONG.seq"),
+    ({"command": "JOIN", "code": "1" * 17}, "JOIN.code"),
+    ({"command": "CREATE", "username": "x" * (USERNAME_MAX + 1)}, "CREATE.username"),
+    ({"command": "GAME_INPUT", "input": "x" * (INPUT_MAX + 1)}, "GAME_INPUT.input"),
+    ({"command": "RESUME", "token": None}, "RESUME.token"),
+])
+def test_invalid_commands_raise_protocol_error(message, reason):
+    with pytest.raises(ProtocolError, match=reason.replace(".", r"\.")):
+        parse_command(message)
@@ -0,0 +1,114 @@
+"""Pool configuration and the results writer's batched UPSERT + ELO, against aiosqlite."""
+import asyncio
+
+from sqlalchemy import create_engine, delete, inspect, select, text
+
+from backend import database, results_writer
+from backend.database import AsyncSessionLocal, Base, engine, pool_stats
+from backend.models import GameStat, User
+from backend.main import _unique_game_stats
+from backend.results_writer import MatchResult, ResultsWriter, elo_deltas
+
+async def reset_tables():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with AsyncSessionLocal() as db:
+        async with db.begin():
+            await db.execute(delete(GameStat))
+            await db.execute(delete(User))
+
+def run(scenario):
+    async def wrapped():
+        try:
+            await scenario()
+        finally:
+            await engine.dispose() # Pooled connections belong to this event loop
+    asyncio.run(wrapped())
+
+def test_file_sqlite_uses_the_timed_pool():
+    assert isinstance(engine.pool, database.TimedQueuePool)
+    assert engine.pool.size() == database.DB_POOL_SIZE
+    assert engine.pool.timeout() == database.DB_POOL_TIMEOUT
+
+def test_memory_sqlite_skips_pool_options():
+    assert "poolclass" not in database._engine_options("sqlite+aiosqlite:///:memory:")
+
+def test_pool_stats_track_checkouts():
+    async def scenario():
+        before = pool_stats()["acquired"]
+        async with engine.connect() as conn:
+            stats = pool_stats()
+            assert stats["checked_out"] == 1
+            assert stats["size"] == database.DB_POOL_SIZE
+            await conn.exec_driver_sql("SELECT 1")
+        stats = pool_stats()
+        assert stats["acquired"] == before + 1
+        assert stats["checked_out"] == 0
+        assert stats["max_wait"] >= stats["avg_wait"] >= 0
+    run(scenario)
+
+def test_write_batch_upserts_stats_and_compounds_elo():
+    async def scenario():
+        await reset_tables()
+        async with AsyncSessionLocal() as db:
+            async with db.begin():
+                db.add_all([User(id=uid, username=f"p{uid}", password_hash="x", elo=1000) for uid in (1, 2, 3)])
+                db.add(GameStat(user_id=1, wins=2, total_games=5)) # Existing tally gets added to
+
+        writer = ResultsWriter(spool_path="")
+        first = MatchResult("AAAA", 0.0, [(1, 1), (2, 2), (3, 3)])
+        second = MatchResult("AAAA", 1.0, [(2, 1), (1, 2), (99, 3)]) # 99 doesn't exist: skipped
+        updated = await writer._write_batch([first, second])
+
+        ratings = {1: 1000.0, 2: 1000.0, 3: 1000.0}
+        for placements in (first.placements, second.placements[:2]):
+            for uid, change in elo_deltas(ratings, placements).items():
+                ratings[uid] += change
+        expected = {uid: round(elo) for uid, elo in ratings.items()}
+        assert {u.id: u.elo for u in updated} == expected
+        assert {u.id: u.username for u in updated} == {1: "p1", 2: "p2", 3: "p3"}
+
+        async with AsyncSessionLocal() as db:
+            elos = dict((await db.execute(select(User.id, User.elo))).all())
+            stats = {uid: (wins, games) for uid, wins, games in
+                     (await db.execute(select(GameStat.user_id, GameStat.wins, GameStat.total_games))).all()}
+        assert elos == expected
+        assert stats == {1: (3, 7), 2: (1, 2), 3: (0, 1)}
+
+        assert await writer._write_batch([MatchResult("BBBB", 2.0, [(99, 1)])]) == []
+    run(scenario)
+
+def test_stop_writes_the_batch_being_gathered(monkeypatch, tmp_path):
+    monkeypatch.setattr(results_writer, "RESULTS_FLUSH_INTERVAL", 5.0)
+    spool = tmp_path / "spool.jsonl"
+    async def scenario():
+        await reset_tables()
+        async with AsyncSessionLocal() as db:
+            async with db.begin():
+                db.add_all([User(id=uid, username=f"p{uid}", password_hash="x", elo=1000) for uid in (1, 2)])
+
+        writer = ResultsWriter(spool_path=str(spool))
+        await writer.start()
+        writer.submit(MatchResult("CCCC", 0.0, [(1, 1), (2, 2)]))
+        await asyncio.sleep(0.1) # Taken off the queue, still inside the flush window
+        await writer.stop()
+        writer.submit(MatchResult("DDDD", 0.0, [(2, 1), (1, 2)])) # After stop: spooled
+
+        async with AsyncSessionLocal() as db:
+            stats = dict((await db.execute(select(GameStat.user_id, GameStat.total_games))).all())
+        assert stats == {1: 1, 2: 1}
+        assert writer.written == 1
+        assert writer.spooled == 1 and "DDDD" in spool.read_text()
+    run(scenario)
+
+def test_startup_merges_duplicate_stats_and_adds_unique_index():
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE game_stats (id INTEGER PRIMARY KEY, user_id INTEGER, wins INTEGER, total_games INTEGER)"))
+        conn.execute(text("INSERT INTO game_stats (user_id, wins, total_games) VALUES (1, 1, 2), (1, 2, 3), (2, 0, 1)"))
+        _unique_game_stats(conn)
+        _unique_game_stats(conn) # Already there: a no-op
+        rows = conn.execute(text("SELECT user_id, wins, total_games FROM game_stats ORDER BY user_id")).all()
+        indexes = inspect(conn).get_indexes("game_stats")
+    assert [tuple(row) for row in rows] == [(1, 3, 5), (2, 0, 1)]
+    assert [(i["column_names"], bool(i["unique"])) for i in indexes] == [(["user_id"], True)]
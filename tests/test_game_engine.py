@@ -0,0 +1,84 @@
+"""Rounds end as soon as they are decided, not when the timer runs out."""
+import asyncio
+
+import pytest
+
+import backend.game_engine as game_engine
+from backend.game_engine import GameSession
+from backend.lobby_system import Lobby, Player
+from backend.minigames.base import BaseGame
+from backend.minigames.registry import minigame_registry
+from tests.fakes import FakeSocket, eventually
+
+class StubGame(BaseGame):
+    """The answer is always 42."""
+    def get_instructions(self) -> str:
+        return "What is the answer?"
+
+    def start_game(self):
+        pass
+
+    def process_input(self, player_id, input_data) -> bool:
+        return input_data == "42"
+
+    def check_win_condition(self, player_id) -> bool:
+        return False
+
+@pytest.fixture(autouse=True)
+def stub_round(monkeypatch):
+    monkeypatch.setattr(game_engine, "ROUND_DURATION", 5) # Far longer than any test waits
+    monkeypatch.setattr(minigame_registry, "pick", lambda difficulty, rng=None: StubGame)
+
+async def start_round(round_number: int, player_count: int = 3):
+    lobby = Lobby("4242")
+    players = [Player(FakeSocket(), f"p{n}", n) for n in range(1, player_count + 1)]
+    for player in players:
+        await lobby.connect(player)
+    session = GameSession(lobby)
+    lobby.game_session = session
+    session._is_running = True
+    session._current_round = round_number
+    task = asyncio.create_task(session._play_round())
+    await eventually(lambda: all(p.websocket.of_type("ROUND_START") for p in players))
+    return lobby, session, players, task
+
+def stop_all(players):
+    for player in players:
+        player.stop_writer()
+
+def test_round_ends_once_everyone_answered():
+    async def scenario():
+        lobby, session, players, task = await start_round(1)
+        for player in players:
+            await session.handle_input(player, "42")
+        await asyncio.wait_for(task, 1)
+        assert all(p.score > 0 for p in players)
+        await eventually(lambda: all(p.websocket.of_type("ROUND_END") for p in players))
+        stop_all(players)
+    asyncio.run(scenario())
+
+def test_wrong_answer_keeps_round_open_until_that_player_leaves():
+    async def scenario():
+        lobby, session, players, task = await start_round(1)
+        *right, wrong = players
+        for player in right:
+            await session.handle_input(player, "42")
+        await session.handle_input(wrong, "7")
+        await asyncio.sleep(0.2) # Well past the input batch window
+        assert not task.done()
+        lobby.disconnect(wrong) # Everyone still here has answered
+        await asyncio.wait_for(task, 1)
+        stop_all(players)
+    asyncio.run(scenario())
+
+def test_sudden_death_ends_on_first_correct_answer():
+    async def scenario():
+        lobby, session, players, task = await start_round(game_engine.SUDDEN_DEATH_ROUND)
+        first, *rest = players
+        await session.handle_input(first, "42")
+        await asyncio.wait_for(task, 1)
+        for player in rest:
+            await session.handle_input(player, "42") # Too late
+        assert first.score > 0 and all(p.score == 0 for p in rest)
+        stop_all(players)
+    asyncio.run(scenario())
@@ -0,0 +1,146 @@
+"""Per-player outboxes, the slow-consumer policy, and session resume with replay."""
+import asyncio
+
+import backend.lobby_system as lobby_system
+from backend.lobby_system import (
+    REPLAY_BUFFER_SIZE, SEND_QUEUE_SIZE, BroadcastStats, BroadcastTicket, Lobby, LobbyManager, Player,
+)
+from tests.fakes import FakeSocket, eventually
+
+def make_player(user_id: int) -> Player:
+    return Player(FakeSocket(), f"p{user_id}", user_id)
+
+# --- Outbox ---
+
+def test_full_outbox_drops_oldest_frames():
+    async def scenario():
+        player = make_player(1)
+        socket = player.websocket
+        socket.gate = asyncio.Event()
+        player.start_writer()
+        for n in range(SEND_QUEUE_SIZE + 8):
+            player.send({"type": "TICK", "n": n})
+        assert player.dropped_frames == 8
+        socket.gate.set()
+        await eventually(lambda: len(socket.sent) == SEND_QUEUE_SIZE)
+        assert [m["n"] for m in socket.sent] == list(range(8, SEND_QUEUE_SIZE + 8)) # Newest kept, in order
+        player.stop_writer()
+    asyncio.run(scenario())
+
+def test_stalled_socket_doesnt_hold_up_the_lobby(monkeypatch):
+    monkeypatch.setattr(lobby_system, "SEND_TIMEOUT", 0.05)
+    async def scenario():
+        lobby = Lobby("1111")
+        stalled, healthy = make_player(1), make_player(2)
+        await lobby.connect(stalled)
+        await lobby.connect(healthy)
+        stalled.websocket.gate = asyncio.Event() # Never set: every send hangs
+        await lobby.broadcast({"type": "HELLO"})
+        await eventually(lambda: healthy.websocket.of_type("HELLO"))
+        await eventually(lambda: stalled.send_failed) # Timed out, marked for the heartbeat to evict
+        await eventually(lambda: lobby.broadcast_stats.count == lobby.event_seq) # Every ticket completed
+        stalled.stop_writer()
+        healthy.stop_writer()
+    asyncio.run(scenario())
+
+def test_stop_writer_completes_queued_tickets():
+    async def scenario():
+        player = make_player(1)
+        player.websocket.gate = asyncio.Event()
+        player.start_writer()
+        stats = BroadcastStats()
+        ticket = BroadcastTicket(stats, 1)
+        player.enqueue('{"type":"A"}', ticket)
+        await asyncio.sleep(0) # Writer is now stuck sending A
+        player.enqueue('{"type":"B"}', BroadcastTicket(stats, 1))
+        player.stop_writer()
+        assert stats.count == 1 # B dropped at once
+        await eventually(lambda: stats.count == 2) # A completes as the cancelled send unwinds
+    asyncio.run(scenario())
+
+def test_writer_stops_even_if_its_send_just_finished():
+    async def scenario():
+        player = make_player(1)
+        socket = player.websocket
+        socket.gate = asyncio.Event()
+        player.start_writer()
+        writer = player._writer
+        player.send({"type": "A"})
+        await asyncio.sleep(0) # Writer is waiting on the send
+        socket.gate.set() # The send completes in the same loop pass as the cancel below
+        player.stop_writer()
+        await asyncio.sleep(0.01)
+        assert writer.done()
+        player.send({"type": "B"}) # Nobody drains this any more
+        await asyncio.sleep(0.01)
+        assert "B" not in socket.types()
+    asyncio.run(scenario())
+
+# --- Resume ---
+
+async def lobby_with_two_players():
+    manager = LobbyManager()
+    code = await manager.create_lobby()
+    players = [make_player(1), make_player(2)]
+    for player in players:
+        manager.register_connection(player)
+        await manager.join_lobby(code, player)
+        manager.issue_resume_token(player)
+    return manager, manager.get_lobby(code), players
+
+def test_resume_replays_exactly_what_was_missed():
+    async def scenario():
+        manager, lobby, (host, dropped) = await lobby_with_two_players()
+        last_seq = lobby.event_seq # The last event the dropped client saw
+        token = dropped.resume_token
+        manager.suspend(dropped)
+        for n in range(3):
+            await lobby.broadcast({"type": "TICK", "n": n})
+
+        socket = FakeSocket()
+        resumed = await manager.resume(token, dropped.user_id, socket, dropped.codec, last_seq)
+        assert resumed is dropped
+        await eventually(lambda: len(socket.sent) >= 5)
+        header, *events = socket.sent
+        assert header["type"] == "RESUMED" and header["gap"] is False and header["replayed"] == 4
+        assert [m["seq"] for m in events] == list(range(last_seq + 1, last_seq + 5))
+        assert [m["type"] for m in events] == ["PLAYER_STATUS", "TICK", "TICK", "TICK"]
+        assert header["token"] == dropped.resume_token != token # Rotated
+
+        # Tokens are single use, and only for their own user id
+        assert await manager.resume(token, dropped.user_id, FakeSocket(), dropped.codec, last_seq) is None
+        assert await manager.resume(dropped.resume_token, host.user_id, FakeSocket(), dropped.codec, 0) is None
+        for player in (host, dropped):
+            player.stop_writer()
+    asyncio.run(scenario())
+
+def test_resume_past_the_replay_buffer_sends_the_roster():
+    async def scenario():
+        manager, lobby, (host, dropped) = await lobby_with_two_players()
+        token = dropped.resume_token
+        manager.suspend(dropped)
+        for n in range(REPLAY_BUFFER_SIZE + 5):
+            await lobby.broadcast({"type": "TICK", "n": n})
+
+        socket = FakeSocket()
+        await manager.resume(token, dropped.user_id, socket, dropped.codec, 0)
+        await eventually(lambda: len(socket.sent) >= 2)
+        assert socket.types()[:2] == ["RESUMED", "PLAYER_LIST"]
+        assert socket.sent[0]["gap"] is True and socket.sent[0]["replayed"] == 0
+        assert [p["id"] for p in socket.sent[1]["players"]] == [1, 2]
+        for player in (host, dropped):
+            player.stop_writer()
+    asyncio.run(scenario())
+
+def test_unresumed_slot_expires(monkeypatch):
+    monkeypatch.setattr(lobby_system, "RESUME_GRACE", 0.05)
+    async def scenario():
+        manager, lobby, (host, dropped) = await lobby_with_two_players()
+        token = dropped.resume_token
+        manager.suspend(dropped)
+        assert dropped in lobby.players and not host.websocket.of_type("PLAYER_LEFT")
+        await eventually(lambda: dropped not in lobby.players)
+        await eventually(lambda: host.websocket.of_type("PLAYER_LEFT"))
+        assert await manager.resume(token, dropped.user_id, FakeSocket(), dropped.codec, 0) is None
+        host.stop_writer()
+    asyncio.run(scenario())
@@ -0,0 +1,78 @@
+"""Wire codecs: binary round trips and hostile frames, which must only ever raise ProtocolError."""
+import pytest
+
+from backend.protocol import (
+    BINARY_CODEC, JSON_CODEC, MAX_DEPTH, SUBPROTOCOL_BINARY, EncodedMessage, ProtocolError, decode_frame, negotiate,
+)
+
+MESSAGES = [
+    {"type": "ROUND_START", "round": 3, "instruction": "Solve: 4 + 5", "duration": 12.5, "seq": 41},
+    {"type": "ANSWER_BATCH", "results": [[i, i % 2 == 0, 200 - i, i + 1] for i in range(10)],
+     "top": [[1, 199], [2, 150]], "cutoff": None, "seq": 7},
+    {"type": "PING", "seq": 0, "t": -1},
+    {"command": "GAME_INPUT", "input": "héllo " * 20},
+    {"command": "JOIN", "code": "1234", "username": "x" * 300},
+    {"type": "NOT_IN_THE_TABLE", "blob": b"\x00\xff" * 200, "big": 2**40, "neg": -2**40, "small": -100},
+    {"type": "gamestate", "nested": {"a": {"b": [1, [2, [3]]]}, "7": 0, "flags": [True, False]}},
+]
+
+@pytest.mark.parametrize("message", MESSAGES, ids=lambda m: m.get("type") or m.get("command"))
+def test_binary_round_trip(message):
+    frame = BINARY_CODEC.encode(message)
+    assert isinstance(frame, bytes)
+    assert decode_frame(frame) == message
+
+def test_json_frames_decode_by_kind():
+    message = {"command": "PONG", "seq": 3}
+    assert decode_frame(JSON_CODEC.encode(message)) == message
+    assert decode_frame(BINARY_CODEC.encode(message)) == message
+
+def test_binary_frames_are_smaller_and_encoded_once():
+    message = MESSAGES[1]
+    encoded = EncodedMessage(message)
+    frame = encoded.frame(BINARY_CODEC)
+    assert encoded.frame(BINARY_CODEC) is frame
+    assert len(frame) < len(encoded.frame(JSON_CODEC))
+
+def test_negotiate():
+    assert negotiate([SUBPROTOCOL_BINARY, "other"]) is BINARY_CODEC
+    assert negotiate([]) is JSON_CODEC
+
+def nested_arrays(depth: int) -> bytes:
+    return b"\x42" + b"\x81\xa1k" + b"\x91" * depth + b"\xc0"
+
+HOSTILE = {
+    "empty": b"",
+    "truncated map": BINARY_CODEC.encode(MESSAGES[0])[:-3],
+    "truncated fixstr": b"\x42\x81\xa4code\xa4ab",
+    "truncated str8": b"\x42\x81\xa4code\xd9\x10abc",
+    "truncated float": b"\x42\x81\xa1t\xcb\x00\x00",
+    "oversized array length": b"\x42\x81\xa1k\xdd\xff\xff\xff\xff\x01",
+    "oversized map length": b"\x42\xdf\xff\xff\xff\xff",
+    "oversized bin length": b"\x42\x81\xa1k\xc6\x7f\xff\xff\xff",
+    "unknown type byte": b"\x42\x81\xa1k\xc1",
+    "ext type": b"\x42\x81\xa1k\xd4\x01\x00",
+    "unknown message code": b"\x3f\x80",
+    "not a map": b"\x42\x91\x01",
+    "array as map key": b"\x42\x81\x91\x01\x01",
+    "bad utf-8": b"\x42\x81\xa1k\xa2\xff\xfe",
+    "trailing bytes": BINARY_CODEC.encode({"command": "PONG", "seq": 1}) + b"\x00",
+    "deep nesting": nested_arrays(MAX_DEPTH + 5),
+    "very deep nesting": nested_arrays(100_000),
+    "json not an object": "[1, 2]",
+    "json garbage": "{not json",
+    "json deep nesting": "[" * 100_000,
+}
+
+@pytest.mark.parametrize("frame", HOSTILE.values(), ids=HOSTILE.keys())
+def test_hostile_frames_raise_protocol_error(frame):
+    with pytest.raises(ProtocolError):
+        decode_frame(frame)
+
+def test_nesting_just_under_the_limit_decodes():
+    message = decode_frame(nested_arrays(MAX_DEPTH - 2))
+    assert message["command"] == "START_GAME"
+
+def test_encoder_rejects_unsupported_values():
+    with pytest.raises(ProtocolError):
+        BINARY_CODEC.encode({"type": "PING", "when": object()})
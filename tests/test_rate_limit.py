@@ -0,0 +1,50 @@
+"""Per-connection token bucket and frame size limit."""
+import types
+
+import pytest
+
+import backend.rate_limit as rate_limit
+from backend.rate_limit import ConnectionLimiter, FrameTooLarge, TokenBucket
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Stands in for time.monotonic; advance it with clock.now += seconds."""
+    fake = types.SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(rate_limit, "time", types.SimpleNamespace(monotonic=lambda: fake.now))
+    return fake
+
+def test_bucket_allows_a_burst_then_refuses(clock):
+    bucket = TokenBucket(rate=10, burst=5)
+    assert [bucket.take() for _ in range(6)] == [True] * 5 + [False]
+
+def test_bucket_refills_at_its_rate(clock):
+    bucket = TokenBucket(rate=10, burst=5)
+    for _ in range(5):
+        bucket.take()
+    clock.now += 0.25 # 2.5 tokens
+    assert [bucket.take() for _ in range(3)] == [True, True, False]
+
+def test_bucket_never_holds_more_than_its_burst(clock):
+    bucket = TokenBucket(rate=10, burst=5)
+    clock.now += 60
+    assert sum(bucket.take() for _ in range(10)) == 5
+
+def test_limiter_counts_throttled_frames(clock):
+    limiter = ConnectionLimiter(rate=1, burst=2, max_frame=100)
+    assert [limiter.admit(10) for _ in range(4)] == [True, True, False, False]
+    assert limiter.throttled == 2
+    clock.now += 1
+    assert limiter.admit(10)
+
+def test_oversize_frame_raises_even_with_tokens_left(clock):
+    limiter = ConnectionLimiter(rate=1, burst=2, max_frame=100)
+    assert limiter.admit(100)
+    with pytest.raises(FrameTooLarge):
+        limiter.admit(101)
+
+def test_zero_rate_disables_throttling(clock):
+    limiter = ConnectionLimiter(rate=0, burst=0, max_frame=100)
+    assert all(limiter.admit(10) for _ in range(1000))
+    assert limiter.throttled == 0
+    with pytest.raises(FrameTooLarge):
+        limiter.admit(101) # The size limit still applies
@@ -0,0 +1,113 @@
+"""RedisBackend against the in-repo broker: shared keys, cross-worker pub/sub, reconnects."""
+import asyncio
+
+import backend.state_backend as state_backend
+from backend.broker import Broker
+from backend.state_backend import RedisBackend
+
+class BrokerServer:
+    """backend.broker on an ephemeral port, able to drop every client connection."""
+    def __init__(self):
+        self.broker = Broker()
+        self.port = 0
+        self._server = None
+        self._clients = set()
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def _handle(self, reader, writer):
+        self._clients.add(writer)
+        try:
+            await self.broker.handle_client(reader, writer)
+        finally:
+            self._clients.discard(writer)
+
+    async def stop(self):
+        self._server.close()
+        for writer in list(self._clients):
+            writer.close()
+        await self._server.wait_closed()
+
+    @property
+    def url(self) -> str:
+        return f"redis://127.0.0.1:{self.port}/0"
+
+async def eventually(check, timeout: float = 5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not check():
+        assert asyncio.get_running_loop().time() < deadline, "condition not met in time"
+        await asyncio.sleep(0.02)
+
+def test_keys_and_pubsub_across_workers():
+    async def scenario():
+        server = BrokerServer()
+        await server.start()
+        a, b = RedisBackend(server.url), RedisBackend(server.url)
+        await a.start()
+        await b.start()
+        try:
+            assert await a.claim("owner:1234", "worker-a", 60)
+            assert not await b.claim("owner:1234", "worker-b", 60)
+            assert await b.get("owner:1234") == "worker-a"
+
+            received = []
+            await a.subscribe("lobby:1234", received.append)
+            await asyncio.sleep(0.05) # SUBSCRIBE has no reply to wait on
+            await b.publish("lobby:1234", b"hello")
+            await eventually(lambda: received == [b"hello"])
+
+            await a.release("owner:1234")
+            assert await b.get("owner:1234") is None
+        finally:
+            await a.close()
+            await b.close()
+            await server.stop()
+    asyncio.run(scenario())
+
+def test_usable_right_after_start():
+    async def scenario():
+        server = BrokerServer()
+        await server.start()
+        backend = RedisBackend(server.url)
+        await backend.start()
+        try:
+            assert backend.connected
+            assert await backend.get("owner:7") is None # No yield to the serve tasks first
+        finally:
+            await backend.close()
+            await server.stop()
+    asyncio.run(scenario())
+
+def test_fails_fast_then_reconnects_and_resubscribes(monkeypatch):
+    monkeypatch.setattr(state_backend, "RECONNECT_DELAY", 0.05)
+    async def scenario():
+        server = BrokerServer()
+        await server.start()
+        a, b = RedisBackend(server.url), RedisBackend(server.url)
+        await a.start()
+        await b.start()
+        received = []
+        await a.subscribe("lobby:42", received.append)
+        try:
+            await server.stop()
+            await eventually(lambda: not a.connected)
+            try:
+                await asyncio.wait_for(a.get("owner:42"), 1.0)
+            except ConnectionError:
+                pass # Fails at once instead of queueing a reply that never comes
+            else:
+                raise AssertionError("command succeeded while disconnected")
+
+            await server.start() # Same port
+            await eventually(lambda: a.connected and b.connected)
+            assert await a.claim("owner:42", "worker-a", 60)
+            await asyncio.sleep(0.05)
+            await b.publish("lobby:42", b"after")
+            await eventually(lambda: received == [b"after"])
+        finally:
+            await a.close()
+            await b.close()
+            await server.stop()
+    asyncio.run(scenario())
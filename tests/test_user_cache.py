@@ -0,0 +1,26 @@
+"""Profile writes: updated in place on the writing worker, invalidated on the others."""
+import asyncio
+import json
+
+from backend.models import UserResponse
+from backend.user_cache import _on_profiles_written, elo_leaderboard, profiles_written, user_cache
+
+def test_other_workers_invalidate_and_rerank():
+    stale = UserResponse(id=7, username="ada", elo=1000)
+    user_cache.put(stale)
+    elo_leaderboard.apply([stale])
+    fresh = UserResponse(id=7, username="ada", elo=1100)
+
+    _on_profiles_written(json.dumps({"worker": "elsewhere:1", "users": [fresh.model_dump()]}).encode())
+    assert user_cache._by_id.get(7) is None
+    assert user_cache._id_by_name.get("ada") is None
+    assert fresh in elo_leaderboard.top()
+
+def test_writer_keeps_its_own_entries():
+    async def scenario():
+        user = UserResponse(id=8, username="bob", elo=1050)
+        await profiles_written([user])
+        await asyncio.sleep(0) # LocalBackend delivers our own notification on the next loop pass
+        await asyncio.sleep(0)
+        assert user_cache._by_id.get(8) == user
+    asyncio.run(scenario())
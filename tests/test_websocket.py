@@ -0,0 +1,92 @@
+"""The /ws endpoint end to end: handshake commands, rejections, session ownership."""
+import json
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.lobby_system import lobby_manager
+from backend.main import app
+from backend.protocol import BINARY_CODEC, SUBPROTOCOL_BINARY
+from backend.security import create_access_token
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app) as client:
+        yield client
+
+def receive(ws, kind: str) -> dict:
+    """Next message of the given type, skipping broadcasts in between."""
+    while True:
+        message = json.loads(ws.receive_text())
+        if message.get("type") == kind:
+            return message
+
+def send(ws, command: str, **fields):
+    ws.send_text(json.dumps({"command": command, **fields}))
+
+def eventually(check, timeout: float = 5.0):
+    """The app runs on the TestClient's own thread: poll for its side effects."""
+    deadline = time.monotonic() + timeout
+    while not check():
+        assert time.monotonic() < deadline, "condition not met in time"
+        time.sleep(0.02)
+
+def test_guest_cannot_displace_a_signed_in_session(client):
+    token = create_access_token({"sub": "alice", "uid": 501})
+    with client.websocket_connect(f"/ws/501?token={token}") as alice:
+        send(alice, "CREATE")
+        code = receive(alice, "LOBBY_CREATED")["code"]
+        with client.websocket_connect("/ws/501") as guest:
+            send(guest, "JOIN", code=code, username="mallory")
+            assert json.loads(guest.receive_text()) == {"type": "ERROR", "msg": "User id is held by a signed-in session"}
+        send(alice, "PING_CHECK") # Still connected: an unknown command is answered, not dropped
+        assert receive(alice, "REJECTED")
+
+def test_same_id_can_spectate_from_two_connections(client):
+    with client.websocket_connect("/ws/601") as host:
+        send(host, "CREATE")
+        code = receive(host, "LOBBY_CREATED")["code"]
+        feed = lobby_manager.get_lobby(code).spectators
+        with client.websocket_connect("/ws/602") as first:
+            send(first, "SPECTATE", code=code)
+            receive(first, "SPECTATE_SNAPSHOT")
+            with client.websocket_connect("/ws/602") as second:
+                send(second, "SPECTATE", code=code)
+                receive(second, "SPECTATE_SNAPSHOT")
+                assert len(feed.observers) == 2
+            eventually(lambda: len(feed.observers) == 1) # Only the closed connection left
+            survivor, = feed.observers
+            assert survivor._writer is not None and not survivor._writer.done()
+
+def test_only_handshake_commands_before_joining(client):
+    with client.websocket_connect("/ws/611") as ws:
+        for frame in ["{not json", "[1, 2]", json.dumps({"command": "JOIN"})]:
+            ws.send_text(frame)
+            assert json.loads(ws.receive_text())["type"] == "REJECTED"
+        send(ws, "START_GAME")
+        assert json.loads(ws.receive_text()) == {
+            "type": "REJECTED", "reason": "Create, join, resume or spectate a lobby first",
+        }
+        send(ws, "CREATE") # Still open, and the first valid handshake command works
+        assert receive(ws, "LOBBY_CREATED")["code"]
+
+def test_in_lobby_rejections_keep_the_connection(client):
+    with client.websocket_connect("/ws/621") as ws:
+        send(ws, "CREATE")
+        receive(ws, "LOBBY_CREATED")
+        send(ws, "CREATE")
+        assert receive(ws, "REJECTED")["reason"] == "CREATE is not valid in a lobby"
+        send(ws, "GAME_INPUT", input="x" * 300)
+        assert receive(ws, "REJECTED")["reason"].startswith("GAME_INPUT.input")
+        send(ws, "PONG", seq=0)
+        send(ws, "START_GAME", junk=1) # Extra keys are ignored
+        assert receive(ws, "GAME_START")
+
+def test_binary_frames_are_validated_too(client):
+    with client.websocket_connect("/ws/631", subprotocols=[SUBPROTOCOL_BINARY]) as ws:
+        ws.send_bytes(b"\x42\x81\xa1k\xc1") # Unknown type byte
+        assert BINARY_CODEC.decode(ws.receive_bytes())["type"] == "REJECTED"
+        ws.send_bytes(BINARY_CODEC.encode({"command": "CREATE"}))
+        while BINARY_CODEC.decode(ws.receive_bytes())["type"] != "LOBBY_CREATED":
+            pass # Lobby broadcasts and pings, also binary
@@ -0,0 +1,183 @@
+// Binary wire format (see backend/protocol.py): 1 byte message-type code,
+// then the remaining fields as a MessagePack map. Keep MESSAGE_CODES in sync.
+const wire = {
+    SUBPROTOCOL_JSON: "eduparty.json",
+    SUBPROTOCOL_BINARY: "eduparty.bin.v1",
+    COMMAND_CODE_MIN: 64,
+
+    MESSAGE_CODES: {
+        PLAYER_LIST: 1,
+        LOBBY_CREATED: 2,
+        LOBBY_JOINED: 3,
+        GAME_START: 4,
+        ROUND_START: 5,
+        ROUND_END: 6,
+        gamestate: 7,
+        ELIMINATED: 8,
+        LOGIC_CHECK: 9,
+        GAME_OVER: 10,
+        ERROR: 11,
+        PLAYER_JOINED: 12,
+        PLAYER_LEFT: 13,
+        ANSWER_BATCH: 14,
+        PING: 15,
+        RESUMED: 16,
+        PLAYER_STATUS: 17,
+        REJECTED: 18,
+        SPECTATE_SNAPSHOT: 19,
+        SPECTATE_DELTA: 20,
+        CREATE: 64,
+        JOIN: 65,
+        START_GAME: 66,
+        GAME_INPUT: 67,
+        PONG: 68,
+        RESUME: 69,
+        SPECTATE: 70,
+    },
+    MESSAGE_NAMES: {},
+
+    encode: function (message) {
+        const name = message.type || message.command;
+        const code = this.MESSAGE_CODES[name] || 0;
+        const skip = code ? (code >= this.COMMAND_CODE_MIN ? "command" : "type") : null;
+        const fields = {};
+        for (const key in message) {
+            if (key !== skip) fields[key] = message[key];
+        }
+        const out = [code];
+        this._pack(fields, out);
+        return new Uint8Array(out).buffer;
+    },
+
+    decode: function (buffer) {
+        const bytes = new Uint8Array(buffer);
+        const state = { view: new DataView(buffer), bytes: bytes, pos: 1 };
+        const message = this._unpack(state);
+        const code = bytes[0];
+        if (code) {
+            message[code >= this.COMMAND_CODE_MIN ? "command" : "type"] = this.MESSAGE_NAMES[code];
+        }
+        return message;
+    },
+
+    _pushUint: function (out, value, size) {
+        for (let shift = (size - 1) * 8; shift >= 0; shift -= 8) {
+            out.push(Math.floor(value / Math.pow(2, shift)) & 0xff);
+        }
+    },
+
+    _pack: function (obj, out) {
+        if (obj === null || obj === undefined) {
+            out.push(0xc0);
+        } else if (obj === true || obj === false) {
+            out.push(obj ? 0xc3 : 0xc2);
+        } else if (typeof obj === "number") {
+            if (Number.isInteger(obj) && obj >= 0 && obj < 0x80) {
+                out.push(obj);
+            } else if (Number.isInteger(obj) && obj < 0 && obj >= -32) {
+                out.push(obj & 0xff);
+            } else if (Number.isInteger(obj) && obj >= 0 && obj <= 0xffffffff) {
+                out.push(0xce);
+                this._pushUint(out, obj, 4);
+            } else {
+                const tmp = new DataView(new ArrayBuffer(8));
+                tmp.setFloat64(0, obj);
+                out.push(0xcb);
+                for (let i = 0; i < 8; i++) out.push(tmp.getUint8(i));
+            }
+        } else if (typeof obj === "string") {
+            const data = new TextEncoder().encode(obj);
+            if (data.length < 32) {
+                out.push(0xa0 | data.length);
+            } else if (data.length <= 0xff) {
+                out.push(0xd9, data.length);
+            } else if (data.length <= 0xffff) {
+                out.push(0xda);
+                this._pushUint(out, data.length, 2);
+            } else {
+                out.push(0xdb);
+                this._pushUint(out, data.length, 4);
+            }
+            for (let i = 0; i < data.length; i++) out.push(data[i]);
+        } else if (Array.isArray(obj)) {
+            if (obj.length < 16) {
+                out.push(0x90 | obj.length);
+            } else {
+                out.push(0xdd);
+                this._pushUint(out, obj.length, 4);
+            }
+            obj.forEach(item => this._pack(item, out));
+        } else {
+            const keys = Object.keys(obj);
+            if (keys.length < 16) {
+                out.push(0x80 | keys.length);
+            } else {
+                out.push(0xdf);
+                this._pushUint(out, keys.length, 4);
+            }
+            keys.forEach(key => {
+                this._pack(key, out);
+                this._pack(obj[key], out);
+            });
+        }
+    },
+
+    _str: function (state, size) {
+        const text = new TextDecoder().decode(state.bytes.subarray(state.pos, state.pos + size));
+        state.pos += size;
+        return text;
+    },
+
+    _array: function (state, size) {
+        const items = [];
+        for (let i = 0; i < size; i++) items.push(this._unpack(state));
+        return items;
+    },
+
+    _map: function (state, size) {
+        const result = {};
+        for (let i = 0; i < size; i++) {
+            const key = this._unpack(state);
+            result[key] = this._unpack(state);
+        }
+        return result;
+    },
+
+    _unpack: function (state) {
+        const view = state.view;
+        const tag = view.getUint8(state.pos++);
+        let value;
+        if (tag < 0x80) return tag;
+        if (tag >= 0xe0) return tag - 0x100;
+        if (tag >= 0xa0 && tag <= 0xbf) return this._str(state, tag & 0x1f);
+        if (tag >= 0x90 && tag <= 0x9f) return this._array(state, tag & 0x0f);
+        if (tag >= 0x80 && tag <= 0x8f) return this._map(state, tag & 0x0f);
+        switch (tag) {
+            case 0xc0: return null;
+            case 0xc2: return false;
+            case 0xc3: return true;
+            case 0xca: value = view.getFloat32(state.pos); state.pos += 4; return value;
+            case 0xcb: value = view.getFloat64(state.pos); state.pos += 8; return value;
+            case 0xcc: value = view.getUint8(state.pos); state.pos += 1; return value;
+            case 0xcd: value = view.getUint16(state.pos); state.pos += 2; return value;
+            case 0xce: value = view.getUint32(state.pos); state.pos += 4; return value;
+            case 0xcf: value = Number(view.getBigUint64(state.pos)); state.pos += 8; return value;
+            case 0xd0: value = view.getInt8(state.pos); state.pos += 1; return value;
+            case 0xd1: value = view.getInt16(state.pos); state.pos += 2; return value;
+            case 0xd2: value = view.getInt32(state.pos); state.pos += 4; return value;
+            case 0xd3: value = Number(view.getBigInt64(state.pos)); state.pos += 8; return value;
+            case 0xd9: value = view.getUint8(state.pos); state.pos += 1; return this._str(state, value);
+            case 0xda: value = view.getUint16(state.pos); state.pos += 2; return this._str(state, value);
+            case 0xdb: value = view.getUint32(state.pos); state.pos += 4; return this._str(state, value);
+            case 0xdc: value = view.getUint16(state.pos); state.pos += 2; return this._array(state, value);
+            case 0xdd: value = view.getUint32(state.pos); state.pos += 4; return this._array(state, value);
+            case 0xde: value = view.getUint16(state.pos); state.pos += 2; return this._map(state, value);
+            case 0xdf: value = view.getUint32(state.pos); state.pos += 4; return this._map(state, value);
+        }
+        throw new Error("Unsupported type byte 0x" + tag.toString(16));
+    }
+};
+
+for (const name in wire.MESSAGE_CODES) {
+    wire.MESSAGE_NAMES[wire.MESSAGE_CODES[name]] = name;
+}
@@ -2,6 +2,14 @@ const app = {
     ws: null,
     clientId: Math.floor(Math.random() * 1000000),
     isHost: false,
+    players: [],
+    spectating: false, // Eliminated or watching: updates arrive as snapshots/deltas
+
+    // Session resume: token from LOBBY_CREATED/JOINED, last lobby event seen
+    resumeToken: null,
+    lastSeq: 0,
+    reconnectDelay: 250,
+    reconnectDeadline: 0,
 
     // Config - Try to detect Render URL or fallback to localhost
     // USER: IF DEPLOYED, CHANGE THIS TO YOUR RENDER URL e.g. "wss://your-app.onrender.com"
@@ -23,30 +31,56 @@ const app = {
         this.connect();
     },
 
-    connect: function () {
+    connect: function (resume) {
         // Change status to "Connecting" visual
         document.getElementById('connection-status').className = "status-badge connecting";
 
         const url = `${this.wsUrl}/ws/${this.clientId}`;
-        this.ws = new WebSocket(url);
+        // Offer the compact binary protocol; servers that don't know it fall back to JSON
+        this.ws = new WebSocket(url, [wire.SUBPROTOCOL_BINARY, wire.SUBPROTOCOL_JSON]);
+        this.ws.binaryType = "arraybuffer";
 
         this.ws.onopen = () => {
             document.getElementById('connection-status').innerText = "ONLINE";
             document.getElementById('connection-status').className = "status-badge online";
-            this.showView('view-menu');
+            if (resume) {
+                this.send({ command: "RESUME", token: this.resumeToken, last_seq: this.lastSeq });
+            } else {
+                this.showView('view-menu');
+            }
         };
 
         this.ws.onmessage = (event) => {
-            const msg = JSON.parse(event.data);
+            const msg = (event.data instanceof ArrayBuffer)
+                ? wire.decode(event.data)
+                : JSON.parse(event.data);
             this.handleMessage(msg);
         };
 
         this.ws.onclose = () => {
+            if (this.resumeToken) {
+                this.reconnect();
+                return;
+            }
             alert("Connection Lost!");
             location.reload();
         };
     },
 
+    reconnect: function () {
+        // Retry with backoff while the server still holds our slot
+        const now = Date.now();
+        if (!this.reconnectDeadline) this.reconnectDeadline = now + 30000;
+        if (now > this.reconnectDeadline) {
+            alert("Connection Lost!");
+            location.reload();
+            return;
+        }
+        document.getElementById('connection-status').innerText = "RECONNECTING";
+        setTimeout(() => this.connect(true), this.reconnectDelay);
+        this.reconnectDelay = Math.min(this.reconnectDelay * 2, 4000);
+    },
+
     createLobby: function () {
         this.send({ command: "CREATE", username: this.username });
         this.isHost = true;
@@ -58,26 +92,91 @@ const app = {
         this.send({ command: "JOIN", code: code, username: this.username });
     },
 
+    spectateLobby: function () {
+        const code = document.getElementById('join-code-input').value;
+        if (!code) return alert("Enter Code!");
+        this.spectating = true;
+        this.send({ command: "SPECTATE", code: code });
+    },
+
     startGame: function () {
         this.send({ command: "START_GAME" });
     },
 
     submitInput: function () {
+        if (this.spectating) return;
         const val = document.getElementById('game-input').value;
         this.send({ command: "GAME_INPUT", input: val });
         document.getElementById('game-input').value = "";
     },
 
+    // Carry a seq that isn't a lobby event number
+    sessionMessages: { LOBBY_CREATED: 1, LOBBY_JOINED: 1, RESUMED: 1, SPECTATE_SNAPSHOT: 1, SPECTATE_DELTA: 1 },
+
     send: function (data) {
-        if (this.ws) this.ws.send(JSON.stringify(data));
+        if (!this.ws) return;
+        if (this.ws.protocol === wire.SUBPROTOCOL_BINARY) {
+            this.ws.send(wire.encode(data));
+        } else {
+            this.ws.send(JSON.stringify(data));
+        }
     },
 
     handleMessage: function (msg) {
+        if (msg.type === "PING") {
+            // Echo immediately: the server times answers net of our round trip
+            this.send({ command: "PONG", seq: msg.seq });
+            return;
+        }
+        if (msg.seq !== undefined && !(msg.type in this.sessionMessages)) {
+            if (msg.seq <= this.lastSeq) return; // Already seen before a resume
+            this.lastSeq = msg.seq;
+        }
         console.log("RX:", msg);
 
         switch (msg.type) {
+            case "RESUMED":
+                this.resumeToken = msg.token;
+                this.reconnectDelay = 250;
+                this.reconnectDeadline = 0;
+                // With a gap the roster follows and replay starts from now
+                if (msg.gap) this.lastSeq = msg.seq;
+                break;
+
+            case "ERROR":
+                if (this.resumeToken) {
+                    this.resumeToken = null; // Slot expired: start over
+                    alert(msg.msg);
+                    location.reload();
+                }
+                break;
+
+            case "SPECTATE_SNAPSHOT":
+                // Full state: players are [id, username, alive, score]
+                this.spectating = true;
+                this.lastSeq = Math.max(this.lastSeq, msg.seq);
+                this.players = msg.players.map(([id, username, alive]) => ({ id: id, username: username, alive: alive }));
+                document.getElementById('launcher-container').style.display = 'none';
+                document.getElementById('game-container').style.display = 'flex';
+                document.getElementById('round-display').innerText = "Round " + msg.round + " (spectating)";
+                document.getElementById('instruction-display').innerText = msg.instruction || "Waiting for the game...";
+                this.renderStandings(msg.top);
+                break;
+
+            case "SPECTATE_DELTA":
+                // Lobby events since the last tick, each with its own seq
+                msg.events.forEach(event => this.handleMessage(event));
+                break;
+
+            case "REJECTED":
+                // A malformed or out-of-place command; the connection stays up
+                console.warn("Command rejected:", msg.reason);
+                break;
+
             case "LOBBY_CREATED":
             case "LOBBY_JOINED":
+                this.resumeToken = msg.token;
+                this.lastSeq = msg.seq;
                 this.lobbyCode = msg.code;
                 document.getElementById('lobby-code-display').innerText = msg.code;
                 this.showView('view-lobby');
@@ -85,10 +184,37 @@ const app = {
                 break;
 
             case "PLAYER_LIST":
-                const list = document.getElementById('player-list');
-                list.innerHTML = msg.players.map(p =>
-                    `<div class="player-item ${p.is_host ? 'host' : ''}">${p.username}</div>`
-                ).join('');
+                this.players = msg.players;
+                this.renderPlayers();
+                break;
+
+            case "PLAYER_JOINED":
+                this.players.push(msg.player);
+                this.renderPlayers();
+                break;
+
+            case "PLAYER_LEFT":
+                this.players = this.players.filter(p => p.id !== msg.id);
+                if (msg.host_id !== null) {
+                    this.players.forEach(p => { p.is_host = (p.id === msg.host_id); });
+                    if (msg.host_id === this.clientId) {
+                        this.isHost = true;
+                        document.getElementById('host-controls').style.display = "block";
+                    }
+                }
+                this.renderPlayers();
+                break;
+
+            case "PLAYER_STATUS":
+                this.players.forEach(p => {
+                    if (p.id === msg.id) p.connected = msg.connected;
+                    if (msg.host_id !== null) p.is_host = (p.id === msg.host_id);
+                });
+                if (msg.host_id === this.clientId) {
+                    this.isHost = true;
+                    document.getElementById('host-controls').style.display = "block";
+                }
+                this.renderPlayers();
                 break;
 
             case "GAME_START":
@@ -100,6 +226,7 @@ const app = {
             case "ROUND_START":
                 document.getElementById('round-display').innerText = "Round " + msg.round;
                 document.getElementById('instruction-display').innerText = msg.instruction;
+                if (this.spectating) break;
 
                 // Popup
                 document.getElementById('popup-title').innerText = "Round " + msg.round;
@@ -107,14 +234,24 @@ const app = {
                 document.getElementById('game-popup').classList.add('active');
                 break;
 
+            case "ANSWER_BATCH":
+                // Results for everyone who answered this tick: [id, correct, score, rank]
+                const mine = msg.results.find(r => r[0] === this.clientId);
+                if (mine) {
+                    document.getElementById('feedback-display').innerText = mine[1] ? "Correct! (#" + mine[3] + ")" : "Wrong!";
+                }
+                this.renderStandings(msg.top);
+                break;
+
             case "gamestate":
                 document.getElementById('feedback-display').innerText = msg.msg;
                 // Visual feedback
                 break;
 
             case "ELIMINATED":
-                alert("YOU DIED! Game Over.");
-                location.reload();
+                // Stay on to watch: the server switches us to the spectator feed
+                this.spectating = true;
+                document.getElementById('feedback-display').innerText = "Eliminated! Now spectating.";
                 break;
 
             case "GAME_OVER":
@@ -124,6 +261,22 @@ const app = {
         }
     },
 
+    renderPlayers: function () {
+        const list = document.getElementById('player-list');
+        list.innerHTML = this.players.map(p =>
+            `<div class="player-item ${p.is_host ? 'host' : ''} ${p.connected === false ? 'away' : ''}">${p.username}</div>`
+        ).join('');
+    },
+
+    renderStandings: function (top) {
+        // top: [[id, score], ...] in rank order
+        const names = {};
+        this.players.forEach(p => { names[p.id] = p.username; });
+        document.getElementById('standings-display').innerHTML = top.map(([id, score]) =>
+            `<li class="${id === this.clientId ? 'me' : ''}">${names[id] || id}: ${score}</li>`
+        ).join('');
+    },
+
     showView: function (viewId) {
         document.querySelectorAll('.view').forEach(el => el.classList.remove('active'));
         document.getElementById(viewId).classList.add('active');